@@ -7,6 +7,8 @@ ROUTE_TABLE = {
         "retries": 5,
         "retry_delay": 0.2,
         "timeout": 2.0,
+        "priority": "high",
+        "rate_limit": {"limit": 20, "window_ms": 60000, "key": "ip"},
         "header_policy": {
             "remove": ["x-remove-this"],
             "set": {"x-api": "auth-service"},
@@ -0,0 +1,130 @@
+import math
+from typing import Optional
+
+
+class AdaptiveLimit:
+    """
+    A concurrency limit that moves with observed latency. Acquire and
+    release are plain int updates with no await in between, which is
+    atomic on the event loop, so no lock is needed.
+    """
+
+    kind = "static"
+
+    def __init__(self, initial: int = 20, min_limit: int = 1, max_limit: int = 1000) -> None:
+        self.limit = float(initial)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.in_flight = 0
+
+    def try_acquire(self) -> bool:
+        if self.in_flight >= int(self.limit):
+            return False
+        self.in_flight += 1
+        return True
+
+    def release(self, latency: float, dropped: bool) -> None:
+        # `dropped`: the request failed in a way that signals overload (5xx, timeout)
+        in_flight = self.in_flight
+        self.in_flight -= 1
+        self.limit = min(self.max_limit, max(self.min_limit,
+                                             self._update(latency, dropped, in_flight)))
+
+    def _update(self, latency: float, dropped: bool, in_flight: int) -> float:
+        return self.limit
+
+    def describe(self) -> dict:
+        return {"type": self.kind, "limit": int(self.limit), "in_flight": self.in_flight}
+
+
+class AIMDLimit(AdaptiveLimit):
+    # additive increase (about +1 per limit's worth of good requests),
+    # multiplicative decrease on drops or latency over `latency_threshold`
+    kind = "aimd"
+
+    def __init__(
+        self,
+        initial: int = 20,
+        min_limit: int = 1,
+        max_limit: int = 1000,
+        backoff_ratio: float = 0.9,
+        latency_threshold: float = 1.0,
+    ) -> None:
+        super().__init__(initial, min_limit, max_limit)
+        self.backoff_ratio = backoff_ratio
+        self.latency_threshold = latency_threshold
+
+    def _update(self, latency: float, dropped: bool, in_flight: int) -> float:
+        if dropped or latency > self.latency_threshold:
+            return self.limit * self.backoff_ratio
+        # only grow when the limit is actually being used
+        if in_flight * 2 >= self.limit:
+            return self.limit + 1 / self.limit
+        return self.limit
+
+
+class GradientLimit(AdaptiveLimit):
+    """
+    Netflix "gradient2": compares a short-term latency average against a
+    slow long-term one. While they agree the limit grows by a queue
+    allowance of sqrt(limit); as short-term latency rises (queueing) the
+    ratio drops below 1 and the limit shrinks in proportion.
+    """
+
+    kind = "gradient"
+
+    def __init__(
+        self,
+        initial: int = 20,
+        min_limit: int = 1,
+        max_limit: int = 1000,
+        short_window: int = 10,
+        long_window: int = 600,
+        smoothing: float = 0.2,
+        tolerance: float = 1.5,
+    ) -> None:
+        super().__init__(initial, min_limit, max_limit)
+        self.smoothing = smoothing
+        self.tolerance = tolerance
+        self._short_factor = 2 / (short_window + 1)
+        self._long_factor = 2 / (long_window + 1)
+        self._short_rtt: Optional[float] = None
+        self._long_rtt: Optional[float] = None
+
+    def _update(self, latency: float, dropped: bool, in_flight: int) -> float:
+        if self._short_rtt is None:
+            self._short_rtt = self._long_rtt = latency
+            return self.limit
+        self._short_rtt += (latency - self._short_rtt) * self._short_factor
+        self._long_rtt += (latency - self._long_rtt) * self._long_factor
+
+        # let the baseline recover quickly after latency drops
+        if self._long_rtt / self._short_rtt > 2:
+            self._long_rtt *= 0.95
+
+        if in_flight * 2 < self.limit and not dropped:
+            return self.limit  # app-limited: latency says nothing about capacity
+
+        gradient = max(0.5, min(1.0, self.tolerance * self._long_rtt / self._short_rtt))
+        if dropped:
+            gradient = 0.5
+        new_limit = self.limit * gradient + math.sqrt(self.limit)
+        return self.limit * (1 - self.smoothing) + new_limit * self.smoothing
+
+
+LIMITS = {
+    "static": AdaptiveLimit,
+    "aimd": AIMDLimit,
+    "gradient": GradientLimit,
+}
+
+
+def build_limit(config: Optional[dict]) -> Optional[AdaptiveLimit]:
+    # {"type": "gradient", "initial": 20, "min_limit": 1, "max_limit": 200, ...}
+    if not config:
+        return None
+    options = dict(config)
+    kind = options.pop("type", "gradient")
+    if kind not in LIMITS:
+        raise ValueError(f"Unknown concurrency limit {kind!r}")
+    return LIMITS[kind](**options)
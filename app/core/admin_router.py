@@ -4,6 +4,7 @@ import logging
 import json
 from redis.asyncio import Redis
 from typing import Any
+from urllib.parse import parse_qs
 from starlette.types import ASGIApp, Scope, Receive, Send
 from starlette.responses import PlainTextResponse, JSONResponse, Response
 from prometheus_client import CONTENT_TYPE_LATEST
@@ -27,6 +28,10 @@ class AdminRouter:
             await self.circuit(scope, receive, send)
         elif path == "/__limits":
             await self.limits(scope, receive, send)
+        elif path == "/__cache":
+            await self.cache(scope, receive, send)
+        elif path == "/__cache/purge" and scope.get("method", "") == "POST":
+            await self.purge_cache(scope, receive, send)
         elif path == "/__metrics":
             await self.metrics(scope, receive, send)
         elif path == "/__reload" and scope.get("method", "") == "POST":
@@ -42,6 +47,9 @@ class AdminRouter:
 
     async def circuit(self, scope: Scope, receive: Receive, send: Send) -> None:
         circuit_state = self.router.circuit_breaker.get_status()
+        for host, state in self.router.health_checker.status().items():
+            if state != "healthy" and circuit_state.get(host) != "open":
+                circuit_state[host] = state
         await JSONResponse(circuit_state)(scope, receive, send)
 
     async def limits(self, scope: Scope, receive: Receive, send: Send) -> None:
@@ -50,11 +58,16 @@ class AdminRouter:
 
         if hasattr(self.router, "rate_limiter") and hasattr(self.router.rate_limiter, "stats"):
             rate_data = self.router.rate_limiter.stats()
+        else:
+            for route in self.router.path_router.routes():
+                if route.rate_limit is False:
+                    rate_data[route.prefix] = "disabled"
+                elif route.rate_limit is not None:
+                    rate_data[route.prefix] = route.rate_limit.describe()
 
-        if hasattr(self.router, "concurrency_limit"):
-            concurrency_data["max"] = getattr(self.router, "concurrency_limit")
-        if hasattr(self.router, "in_flight"):
-            concurrency_data["in_flight"] = getattr(self.router, "in_flight")
+        for route in self.router.path_router.routes():
+            if route.concurrency is not None:
+                concurrency_data[route.prefix] = route.concurrency.describe()
 
         data = {
             "rate_limit": rate_data,
@@ -64,6 +77,16 @@ class AdminRouter:
         await JSONResponse(data)(scope, receive, send)
     
 
+    async def cache(self, scope: Scope, receive: Receive, send: Send) -> None:
+        await JSONResponse(self.router.response_cache.stats())(scope, receive, send)
+
+    async def purge_cache(self, scope: Scope, receive: Receive, send: Send) -> None:
+        # POST /__cache/purge?prefix=/api drops that route's entries; no prefix drops all
+        query = parse_qs(scope.get("query_string", b"").decode())
+        prefix = query.get("prefix", [None])[0]
+        purged = self.router.response_cache.purge(prefix)
+        await JSONResponse({"purged": purged, "prefix": prefix})(scope, receive, send)
+
     async def metrics(self, scope: Scope, receive: Receive, send: Send) -> None:
         data, content_type = render_prometheus_metrics()
         await Response( content=data, media_type=content_type)(scope, receive, send)
@@ -0,0 +1,150 @@
+import time
+import asyncio
+from collections import deque
+from typing import Optional
+from app.core.metrics import ADMISSION_QUEUE_DEPTH, ADMISSION_WAIT, ADMISSION_SHED
+
+# route "priority" names; lower is served first
+PRIORITIES = {"critical": 0, "high": 1, "normal": 2, "low": 3}
+DEFAULT_PRIORITY = PRIORITIES["normal"]
+
+
+def priority_of(value: Optional[str | int]) -> int:
+    if value is None:
+        return DEFAULT_PRIORITY
+    if isinstance(value, int):
+        return max(0, min(value, len(PRIORITIES) - 1))
+    if value not in PRIORITIES:
+        raise ValueError(f"Unknown priority {value!r}, expected one of {list(PRIORITIES)}")
+    return PRIORITIES[value]
+
+
+class _Waiter:
+    __slots__ = ("future", "enqueued_at")
+
+    def __init__(self, future: asyncio.Future, enqueued_at: float) -> None:
+        self.future = future
+        self.enqueued_at = enqueued_at
+
+
+class AdmissionQueue:
+    """
+    Up to `max_concurrent` requests run; up to `max_queue` more wait for a
+    slot instead of being rejected outright, each for at most
+    `queue_timeout` seconds.
+
+    Shedding follows the CoDel variant used for server queues: if the
+    queue has not drained once in the last `codel_interval` (every waiter
+    admitted in that interval waited over `codel_target`), the queue is
+    considered standing and anyone who has waited longer than
+    `codel_target` is shed. While overloaded, adaptive LIFO serves the
+    newest waiter first: it is the one most likely to still have a client
+    waiting for it. Waiters of a higher priority class always go first.
+    """
+
+    def __init__(
+        self,
+        max_concurrent: int = 100,
+        max_queue: int = 0,
+        queue_timeout: float = 1.0,
+        codel_target: float = 0.005,
+        codel_interval: float = 0.1,
+        adaptive_lifo: bool = True,
+    ) -> None:
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.codel_target = codel_target
+        self.codel_interval = codel_interval
+        self.adaptive_lifo = adaptive_lifo
+        self.in_flight = 0
+        self.waiting = 0
+        self._queues: list[deque[_Waiter]] = [deque() for _ in PRIORITIES]
+        self._overloaded = False
+        self._interval_end = 0.0
+        self._min_sojourn = 0.0
+
+    @property
+    def overloaded(self) -> bool:
+        return self._overloaded
+
+    async def acquire(self, priority: int = DEFAULT_PRIORITY) -> bool:
+        if self.in_flight < self.max_concurrent and not self.waiting:
+            self.in_flight += 1
+            return True
+        if self.waiting >= self.max_queue:
+            ADMISSION_SHED.labels(reason="queue_full").inc()
+            return False
+
+        now = time.monotonic()
+        waiter = _Waiter(asyncio.get_running_loop().create_future(), now)
+        self._queues[priority].append(waiter)
+        self._set_waiting(self.waiting + 1)
+        try:
+            await asyncio.wait((waiter.future,), timeout=self.queue_timeout)
+        except BaseException:
+            # cancelled while queued (client went away); give back a slot handed to us
+            if waiter.future.done() and waiter.future.result():
+                self.release()
+            else:
+                self._abandon(waiter, priority)
+            raise
+
+        if waiter.future.done():
+            admitted = waiter.future.result()
+        else:
+            self._abandon(waiter, priority)
+            ADMISSION_SHED.labels(reason="timeout").inc()
+            admitted = False
+        ADMISSION_WAIT.observe(time.monotonic() - now)
+        return admitted
+
+    def release(self) -> None:
+        # the slot goes straight to the next waiter, if any
+        now = time.monotonic()
+        if self._overloaded:
+            self._shed_stale(now)
+        if self.waiting:
+            waiter = self._next_waiter()
+            self._track(now, now - waiter.enqueued_at)
+            waiter.future.set_result(True)
+            return
+        self.in_flight -= 1
+        self._min_sojourn = 0.0  # queue drained
+
+    def _shed_stale(self, now: float) -> None:
+        # queues are in arrival order, so the stale waiters are at the front
+        for queue in self._queues:
+            while queue and now - queue[0].enqueued_at > self.codel_target:
+                ADMISSION_SHED.labels(reason="codel").inc()
+                queue.popleft().future.set_result(False)
+                self._set_waiting(self.waiting - 1)
+
+    def _next_waiter(self) -> _Waiter:
+        for queue in self._queues:
+            if queue:
+                waiter = queue.pop() if self._overloaded and self.adaptive_lifo else queue.popleft()
+                self._set_waiting(self.waiting - 1)
+                return waiter
+        raise RuntimeError("no waiter to admit")
+
+    def _track(self, now: float, sojourn: float) -> None:
+        # the standing-queue test: did any admission in the last interval wait < target?
+        if now >= self._interval_end:
+            self._overloaded = self._min_sojourn > self.codel_target
+            self._min_sojourn = sojourn
+            self._interval_end = now + self.codel_interval
+        else:
+            self._min_sojourn = min(self._min_sojourn, sojourn)
+
+    def _abandon(self, waiter: _Waiter, priority: int) -> None:
+        waiter.future.cancel()
+        try:
+            self._queues[priority].remove(waiter)
+        except ValueError:
+            return  # already handed a result
+        self._set_waiting(self.waiting - 1)
+
+    def _set_waiting(self, waiting: int) -> None:
+        self.waiting = waiting
+        ADMISSION_QUEUE_DEPTH.set(waiting)
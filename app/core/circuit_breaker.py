@@ -1,38 +1,190 @@
 import time
-from collections import defaultdict
+from collections import OrderedDict
+from typing import Optional
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+
+class _BackendState:
+    __slots__ = ("state", "failure_count", "open_until", "probes", "probe_successes",
+                 "bucket_ids", "calls", "failures", "slow")
+
+    def __init__(self, buckets: int = 0) -> None:
+        self.state = CLOSED
+        self.failure_count = 0
+        self.open_until = 0.0
+        self.probes = 0
+        self.probe_successes = 0
+        # ring of per-bucket counters, only used by the sliding window breaker
+        self.bucket_ids = [-1] * buckets
+        self.calls = [0] * buckets
+        self.failures = [0] * buckets
+        self.slow = [0] * buckets
+
 
 class CircuitBreaker:
-    def __init__(self, failure_threshold: int = 3, recovery_time: int = 30):
+    """
+    Opens a backend's circuit after `failure_threshold` consecutive
+    failures. After `recovery_time` the circuit is half-open: up to
+    `half_open_max_calls` probe requests are let through, and it closes once
+    they all succeed or re-opens on the first failure, so a still-sick
+    backend never sees the full traffic at once.
+
+    State is kept for at most `max_backends` backends (least recently used
+    first out); a forgotten backend simply starts closed again.
+    """
+
+    def __init__(
+        self,
+        failure_threshold: int = 3,
+        recovery_time: float = 30,
+        half_open_max_calls: int = 1,
+        max_backends: int = 1024,
+    ):
         self.failure_threshold = failure_threshold
         self.recovery_time = recovery_time
-        self.failure_count = defaultdict(int)
-        self.last_failure_time = defaultdict(float)
-        self.open_until = defaultdict(float)
+        self.half_open_max_calls = half_open_max_calls
+        self.max_backends = max_backends
+        self._backends: OrderedDict[str, _BackendState] = OrderedDict()
+
+    def available(self, backend: str) -> bool:
+        # side-effect free: would allow_request() let a request through?
+        state = self._backends.get(backend)
+        if state is None or state.state == CLOSED:
+            return True
+        now = time.monotonic()
+        if state.state == OPEN:
+            return state.open_until <= now
+        # half-open probes that never reported back are given up on after recovery_time
+        return state.probes < self.half_open_max_calls or state.open_until <= now
 
     def allow_request(self, backend: str) -> bool:
-        now = time.time()
-        if self.open_until[backend] > now:
-            return False  # circuit is open
+        state = self._backends.get(backend)
+        if state is None or state.state == CLOSED:
+            return True
+        if not self.available(backend):
+            return False
+        if state.state == OPEN or state.open_until <= time.monotonic():
+            state.state = HALF_OPEN
+            state.probes = 0
+            state.probe_successes = 0
+        state.probes += 1
+        state.open_until = time.monotonic() + self.recovery_time
         return True
 
-    def record_success(self, backend: str):
-        self.failure_count[backend] = 0
-        self.open_until[backend] = 0
-
-    def record_failure(self, backend: str):
-        now = time.time()
-        self.failure_count[backend] += 1
-        self.last_failure_time[backend] = now
-        if self.failure_count[backend] >= self.failure_threshold:
-            self.open_until[backend] = now + self.recovery_time
-    
+    def record_success(self, backend: str, duration: Optional[float] = None):
+        state = self._state(backend)
+        if state.state == HALF_OPEN:
+            state.probe_successes += 1
+            if state.probe_successes >= self.half_open_max_calls:
+                self._close(state)
+            return
+        if self._record(state, ok=True, duration=duration):
+            self._open(state)
+
+    def record_failure(self, backend: str, duration: Optional[float] = None):
+        state = self._state(backend)
+        if state.state == HALF_OPEN:
+            self._open(state)
+            return
+        if self._record(state, ok=False, duration=duration):
+            self._open(state)
+
     def get_status(self) -> dict[str, str]:
-        now = time.time()
+        now = time.monotonic()
         status = {}
-        for backend in set(self.failure_count.keys()) | set(self.open_until.keys()):
-            if self.open_until[backend] > now:
-                status[backend] = "open"
+        for backend, state in self._backends.items():
+            if state.state == OPEN and state.open_until <= now:
+                status[backend] = HALF_OPEN
             else:
-                status[backend] = "closed"
+                status[backend] = state.state
         return status
 
+    def _record(self, state: _BackendState, ok: bool, duration: Optional[float]) -> bool:
+        # returns True when the circuit should open
+        if ok:
+            state.failure_count = 0
+            return False
+        state.failure_count += 1
+        return state.failure_count >= self.failure_threshold
+
+    def _state(self, backend: str) -> _BackendState:
+        state = self._backends.get(backend)
+        if state is None:
+            state = self._backends[backend] = self._new_state()
+            if len(self._backends) > self.max_backends:
+                self._backends.popitem(last=False)
+        else:
+            self._backends.move_to_end(backend)
+        return state
+
+    def _new_state(self) -> _BackendState:
+        return _BackendState()
+
+    def _open(self, state: _BackendState) -> None:
+        state.state = OPEN
+        state.open_until = time.monotonic() + self.recovery_time
+        state.failure_count = 0
+
+    def _close(self, state: _BackendState) -> None:
+        state.state = CLOSED
+        state.failure_count = 0
+        state.bucket_ids = [-1] * len(state.bucket_ids)
+
+
+class SlidingWindowCircuitBreaker(CircuitBreaker):
+    """
+    Opens on the failure rate or slow-call rate over the last `window`
+    seconds rather than on a streak of failures, so an intermittently
+    failing backend trips it too. The window is a ring of `buckets` counter
+    slots per backend (constant memory), and nothing is decided until the
+    window holds at least `minimum_calls` calls.
+    """
+
+    def __init__(
+        self,
+        failure_rate_threshold: float = 0.5,
+        slow_call_rate_threshold: float = 1.0,
+        slow_call_duration: float = 1.0,
+        window: float = 10.0,
+        buckets: int = 10,
+        minimum_calls: int = 20,
+        recovery_time: float = 30,
+        half_open_max_calls: int = 3,
+        max_backends: int = 1024,
+    ):
+        super().__init__(recovery_time=recovery_time, half_open_max_calls=half_open_max_calls,
+                         max_backends=max_backends)
+        self.failure_rate_threshold = failure_rate_threshold
+        self.slow_call_rate_threshold = slow_call_rate_threshold
+        self.slow_call_duration = slow_call_duration
+        self.minimum_calls = minimum_calls
+        self.buckets = buckets
+        self._bucket_width = window / buckets
+
+    def _new_state(self) -> _BackendState:
+        return _BackendState(self.buckets)
+
+    def _record(self, state: _BackendState, ok: bool, duration: Optional[float]) -> bool:
+        bucket = int(time.monotonic() / self._bucket_width)
+        slot = bucket % self.buckets
+        if state.bucket_ids[slot] != bucket:
+            state.bucket_ids[slot] = bucket
+            state.calls[slot] = state.failures[slot] = state.slow[slot] = 0
+        state.calls[slot] += 1
+        if not ok:
+            state.failures[slot] += 1
+        if duration is not None and duration >= self.slow_call_duration:
+            state.slow[slot] += 1
+
+        oldest = bucket - self.buckets
+        calls = failures = slow = 0
+        for i in range(self.buckets):
+            if state.bucket_ids[i] > oldest:
+                calls += state.calls[i]
+                failures += state.failures[i]
+                slow += state.slow[i]
+        if calls < self.minimum_calls:
+            return False
+        return (failures / calls >= self.failure_rate_threshold
+                or slow / calls >= self.slow_call_rate_threshold)
@@ -0,0 +1,148 @@
+from typing import Any, Optional
+from prometheus_client import Counter
+from app.core.metrics import REQUEST_COUNT, REQUEST_DURATION
+from .header_rewriter import HeaderRewriter
+from .rate_limit_policy import RateLimitPolicy
+from .load_balancer import Endpoint, build_balancer, origin_of
+from .retry_policy import RetryPolicy
+from .hedging import HedgePolicy
+from .adaptive_concurrency import build_limit
+from .admission_queue import priority_of
+from .upstream_pool import PoolConfig, load_asgi_app
+from .response_cache import CachePolicy
+from .singleflight import CoalescePolicy
+from .compression import CompressionPolicy
+
+
+class CompiledRoute:
+    """
+    Everything the gateway needs to proxy a route, resolved once when the
+    route table is loaded. Instances are read-only; reloading the table
+    builds new ones.
+    """
+
+    __slots__ = (
+        "prefix", "config", "backend", "backend_host", "backend_origin",
+        "endpoints", "balancer", "timeout", "retries", "retry_delay", "retry_policy",
+        "hedge", "deadline", "concurrency", "retry_body_limit", "response_buffer_limit", "header_rewriter", "rate_limit",
+        "priority", "cache", "coalesce", "compression", "duration_metric", "_count_metrics",
+    )
+
+    def __init__(self, prefix: str, config: dict, **resolved: Any) -> None:
+        set_ = object.__setattr__
+        set_(self, "prefix", prefix)
+        set_(self, "config", config)
+        for name, value in resolved.items():
+            set_(self, name, value)
+        set_(self, "duration_metric", REQUEST_DURATION.labels(route=prefix))
+        set_(self, "_count_metrics", {})
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        raise AttributeError(f"CompiledRoute is read-only (tried to set {name!r})")
+
+    def count_metric(self, method: str, status: int | str) -> Counter:
+        key = (method, status)
+        child = self._count_metrics.get(key)
+        if child is None:
+            child = self._count_metrics[key] = REQUEST_COUNT.labels(
+                method=method, route=self.prefix, status=str(status))
+        return child
+
+    def target_url(self, path: str, query: str, endpoint: Optional[Endpoint] = None) -> str:
+        url = (endpoint.base_url if endpoint else self.backend_origin) + path
+        return f"{url}?{query}" if query else url
+
+
+class RouteCompiler:
+    """
+    Resolves raw route table entries against the gateway defaults.
+    """
+
+    def __init__(
+        self,
+        timeout: float = 5.0,
+        retries: int = 2,
+        retry_delay: float = 0.1,
+        retry_body_limit: int = 1024 * 1024,
+        response_buffer_limit: int = 0,
+        header_rewriter: Optional[HeaderRewriter] = None,
+        deadline: Optional[float] = None,
+        concurrency: Optional[dict] = None,
+    ) -> None:
+        self.timeout = timeout
+        self.deadline = deadline
+        self.concurrency = concurrency
+        self.retries = retries
+        self.retry_delay = retry_delay
+        self.retry_body_limit = retry_body_limit
+        self.response_buffer_limit = response_buffer_limit
+        self.header_rewriter = header_rewriter or HeaderRewriter(
+            remove=["authorization", "cookie"],
+            set_={"x-gateway": "my-api-gateway"}
+        )
+        # shared by all routes (and kept across reloads) so load stats are per upstream
+        self.endpoints: dict[str, Endpoint] = {}
+
+    def compile(self, prefix: str, config: dict) -> CompiledRoute:
+        backend = config["backend"]
+        endpoints, weights = self._endpoints(backend)
+        pool = PoolConfig.from_config(config.get("pool"))
+        for endpoint in endpoints:
+            # pools belong to the upstream: the last route to configure one wins;
+            # unix/asgi upstreams always get a client (and pool) of their own
+            if pool is not None:
+                endpoint.pool = pool
+            elif endpoint.pool is None and endpoint.transport != "tcp":
+                endpoint.pool = PoolConfig()
+        retries = config.get("retries", self.retries)
+        retry_delay = config.get("retry_delay", self.retry_delay)
+        return CompiledRoute(
+            prefix,
+            config,
+            backend=backend,
+            backend_host=endpoints[0].host,
+            backend_origin=endpoints[0].base_url,
+            endpoints=tuple(endpoints),
+            balancer=build_balancer(config.get("balancer"), endpoints, weights),
+            timeout=config.get("timeout") or self.timeout,
+            retries=retries,
+            retry_delay=retry_delay,
+            retry_policy=RetryPolicy.from_config(retries, retry_delay, config.get("retry_policy")),
+            hedge=HedgePolicy.from_config(config.get("hedge")),
+            deadline=config.get("deadline", self.deadline),
+            concurrency=build_limit(config.get("concurrency", self.concurrency)),
+            retry_body_limit=config.get("retry_body_limit", self.retry_body_limit),
+            response_buffer_limit=config.get("response_buffer_limit",
+                                             self.response_buffer_limit),
+            header_rewriter=self._header_rewriter(config.get("header_policy")),
+            rate_limit=RateLimitPolicy.from_config(config.get("rate_limit")),
+            priority=priority_of(config.get("priority")),
+            cache=CachePolicy.from_config(config.get("cache")),
+            coalesce=CoalescePolicy.from_config(config.get("coalesce")),
+            compression=CompressionPolicy.from_config(config.get("compression")),
+        )
+
+    def _endpoints(self, backend: str | list) -> tuple[list[Endpoint], list[int]]:
+        # "http://a" or ["http://a", {"url": "http://b", "weight": 2}]
+        entries = [backend] if isinstance(backend, str) else backend
+        if not entries:
+            raise ValueError("Route has no backend")
+        endpoints, weights = [], []
+        for entry in entries:
+            url, weight = (entry, 1) if isinstance(entry, str) else (entry["url"], entry.get("weight", 1))
+            origin = origin_of(url)
+            endpoint = self.endpoints.get(origin)
+            if endpoint is None:
+                endpoint = Endpoint(url)
+                if endpoint.transport == "asgi":
+                    load_asgi_app(endpoint.address)  # fail at load time, not on first request
+                self.endpoints[origin] = endpoint
+            endpoints.append(endpoint)
+            weights.append(weight)
+        return endpoints, weights
+
+    def _header_rewriter(self, policy: Optional[dict]) -> HeaderRewriter:
+        if not policy:
+            return self.header_rewriter
+        mod = {k if k != "set" else "set_": v for k, v in policy.items()}
+        return HeaderRewriter(**mod)
@@ -0,0 +1,163 @@
+import zlib
+import asyncio
+from typing import Callable, Optional
+from starlette.types import Message, Scope, Send
+
+try:
+    import brotli
+except ImportError:  # optional: gzip only
+    brotli = None
+
+DEFAULT_CONTENT_TYPES = (
+    "text/*", "application/json", "application/*+json", "application/javascript",
+    "application/xml", "application/*+xml", "image/svg+xml",
+)
+# partial content and bodiless statuses are never re-encoded
+_SKIP_STATUSES = frozenset({204, 206, 304})
+
+
+def _type_matches(media_type: str, pattern: str) -> bool:
+    if pattern.endswith("/*"):
+        return media_type.startswith(pattern[:-1])
+    if "/*+" in pattern:
+        kind, _, suffix = pattern.partition("/*")
+        return media_type.startswith(kind + "/") and media_type.endswith(suffix)
+    return media_type == pattern
+
+
+class CompressionPolicy:
+    """
+    A route's "compression" block. Responses of an allowed content type
+    and at least `min_size` bytes are compressed with the best encoding the
+    client accepts (brotli when installed, then gzip), at levels chosen for
+    throughput rather than ratio. Chunks of `offload_size` bytes or more are
+    compressed in a worker thread so the event loop keeps serving.
+    """
+
+    __slots__ = ("min_size", "content_types", "gzip_level", "brotli_quality",
+                 "offload_size", "encodings")
+
+    def __init__(
+        self,
+        min_size: int = 1024,
+        content_types: Optional[list[str]] = None,
+        gzip_level: int = 4,
+        brotli_quality: int = 4,
+        offload_size: int = 256 * 1024,
+        encodings: Optional[list[str]] = None,
+    ) -> None:
+        encodings = list(encodings or ("br", "gzip"))
+        unknown = set(encodings) - {"br", "gzip"}
+        if unknown:
+            raise ValueError(f"Unsupported compression encodings {sorted(unknown)}")
+        self.min_size = min_size
+        self.content_types = tuple(t.lower() for t in (content_types or DEFAULT_CONTENT_TYPES))
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+        self.offload_size = offload_size
+        self.encodings = tuple(e for e in encodings if e != "br" or brotli is not None)
+
+    @classmethod
+    def from_config(cls, config: Optional[dict | bool]) -> "Optional[CompressionPolicy]":
+        if not config:
+            return None
+        return cls() if config is True else cls(**config)
+
+    def negotiate(self, scope: Scope) -> Optional[str]:
+        accept = ""
+        for name, value in scope.get("headers", []):
+            if name == b"accept-encoding":
+                accept = value.decode("latin-1").lower()
+                break
+        accepted: dict[str, float] = {}
+        for part in accept.split(","):
+            coding, _, params = part.strip().partition(";")
+            q = 1.0
+            params = params.strip()
+            if params.startswith("q="):
+                try:
+                    q = float(params[2:])
+                except ValueError:
+                    q = 0.0
+            accepted[coding.strip()] = q
+        wildcard = accepted.get("*", 0.0)
+        for encoding in self.encodings:
+            if accepted.get(encoding, wildcard) > 0:
+                return encoding
+        return None
+
+    def compressible(self, content_type: bytes) -> bool:
+        media_type = content_type.decode("latin-1").partition(";")[0].strip().lower()
+        return any(_type_matches(media_type, pattern) for pattern in self.content_types)
+
+    def compressor(self, encoding: str) -> tuple[Callable[[bytes], bytes], Callable[[], bytes]]:
+        # (compress a chunk, finish the stream)
+        if encoding == "br":
+            compressor = brotli.Compressor(quality=self.brotli_quality)
+            return compressor.process, compressor.finish
+        compressor = zlib.compressobj(self.gzip_level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+        return compressor.compress, compressor.flush
+
+
+class CompressingSend:
+    """
+    Wraps an ASGI `send` and compresses the response body chunk by chunk.
+    Bodies the upstream already encoded pass through untouched.
+    """
+
+    def __init__(self, send: Send, policy: CompressionPolicy, encoding: Optional[str]) -> None:
+        self.send = send
+        self.policy = policy
+        self.encoding = encoding
+        self.compressor = None
+
+    async def __call__(self, message: Message) -> None:
+        if message["type"] == "http.response.start":
+            await self.send(self._start(message))
+            return
+        if message["type"] != "http.response.body" or self.compressor is None:
+            await self.send(message)
+            return
+
+        compress, finish = self.compressor
+        more_body = message.get("more_body", False)
+        body = await self._run(compress, message.get("body", b""))
+        if not more_body:
+            body += finish()
+        elif not body:
+            return  # nothing came out of the compressor's buffer yet
+        await self.send({"type": "http.response.body", "body": body, "more_body": more_body})
+
+    def _start(self, message: Message) -> Message:
+        headers = list(message.get("headers", []))
+        values = {k.lower(): v for k, v in headers}
+        if (message["status"] in _SKIP_STATUSES or message["status"] < 200
+                or b"content-encoding" in values or b"content-range" in values
+                or b"no-transform" in values.get(b"cache-control", b"").lower()
+                or not self.policy.compressible(values.get(b"content-type", b""))):
+            return message
+
+        # the representation now depends on Accept-Encoding, compressed or not
+        vary = values.get(b"vary")
+        if vary is None:
+            headers.append((b"vary", b"Accept-Encoding"))
+        elif b"accept-encoding" not in vary.lower() and vary.strip() != b"*":
+            headers = [(k, v + b", Accept-Encoding" if k.lower() == b"vary" else v) for k, v in headers]
+
+        try:
+            length = int(values.get(b"content-length", b""))
+        except ValueError:
+            length = None  # streamed: size unknown, compress
+        if self.encoding is None or (length is not None and length < self.policy.min_size):
+            return {**message, "headers": headers}
+
+        self.compressor = self.policy.compressor(self.encoding)
+        headers = [(k, v) for k, v in headers if k.lower() != b"content-length"]
+        headers.append((b"content-encoding", self.encoding.encode()))
+        return {**message, "headers": headers}
+
+    async def _run(self, compress, chunk: bytes) -> bytes:
+        if len(chunk) >= self.policy.offload_size:
+            # zlib and brotli release the GIL, so this runs in parallel with the loop
+            return await asyncio.to_thread(compress, chunk)
+        return compress(chunk)
@@ -1,41 +1,78 @@
-import asyncio
 import logging
+from typing import Optional
 from starlette.types import ASGIApp, Scope, Receive, Send
 from starlette.responses import PlainTextResponse
+from app.core.admission_queue import AdmissionQueue, DEFAULT_PRIORITY
+from app.core.path_router import PathRouter
 
 logger = logging.getLogger("gateway.concurrency.limiter")
 
 class ConcurrencyLimiterMiddleware:
-    def __init__(self, app: ASGIApp, max_concurrent: int = 100):
+    """
+    Gateway-wide ceiling on in-flight requests. Per-route limits that adapt
+    to latency live on the routes themselves (see adaptive_concurrency).
+
+    With `max_queue` > 0, requests over the ceiling wait in an admission
+    queue (see admission_queue) instead of failing at once; a route's
+    "priority" decides its place in line when `path_router` is given.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        max_concurrent: int = 100,
+        max_queue: int = 0,
+        queue_timeout: float = 1.0,
+        codel_target: float = 0.005,
+        codel_interval: float = 0.1,
+        adaptive_lifo: bool = True,
+        path_router: Optional[PathRouter] = None,
+    ):
         self.app = app
         self.max_concurrent = max_concurrent
-        self._in_flight = 0
-        self._lock = asyncio.Lock()
+        self.path_router = path_router
+        self.queue = AdmissionQueue(
+            max_concurrent,
+            max_queue=max_queue,
+            queue_timeout=queue_timeout,
+            codel_target=codel_target,
+            codel_interval=codel_interval,
+            adaptive_lifo=adaptive_lifo,
+        )
+
+    @property
+    def in_flight(self) -> int:
+        return self.queue.in_flight
 
     async def __call__(self, scope: Scope, receive: Receive, send: Send):
         if scope["type"] != "http":
             await self.app(scope, receive, send)
             return
 
-        # fail fast admission control
-        async with self._lock:
-            if self._in_flight >= self.max_concurrent:
-                await PlainTextResponse(
-                    "Too many concurrent requests",
-                    status_code=503,
-                    headers={
-                        "X-Concurrency-Limit": str(self.max_concurrent),
-                        "X-Concurrency-Remaining": "0",
-                    },
-                )(scope, receive, send)
-                return
-            self._in_flight += 1
+        priority = DEFAULT_PRIORITY
+        if self.path_router is not None:
+            route = self.path_router.resolve(scope.get("path", "/"))
+            if route is not None:
+                priority = route.priority
+
+        # with no queue this fails fast; the check-and-increment has no
+        # await in between, so it is atomic on the event loop without a lock
+        if not await self.queue.acquire(priority):
+            await PlainTextResponse(
+                "Too many concurrent requests",
+                status_code=503,
+                headers={
+                    "X-Concurrency-Limit": str(self.max_concurrent),
+                    "X-Concurrency-Remaining": "0",
+                },
+            )(scope, receive, send)
+            return
 
         try:
             # optionally add headers on success as well
             async def send_with_headers(message):
                 if message["type"] == "http.response.start":
-                    remaining = max(0, self.max_concurrent - self._in_flight)
+                    remaining = max(0, self.max_concurrent - self.queue.in_flight)
                     headers = message.setdefault("headers", [])
                     headers.append((b"x-concurrency-limit", str(self.max_concurrent).encode()))
                     headers.append((b"x-concurrency-remaining", str(remaining).encode()))
@@ -43,5 +80,4 @@ class ConcurrencyLimiterMiddleware:
 
             await self.app(scope, receive, send_with_headers)
         finally:
-            async with self._lock:
-                self._in_flight -= 1
+            self.queue.release()
@@ -0,0 +1,46 @@
+import time
+from typing import Optional
+from starlette.types import Scope
+
+# Milliseconds the caller is still willing to wait. Read from clients and
+# set on every upstream attempt, so services further down can give up too.
+DEADLINE_HEADER = "x-request-timeout-ms"
+_DEADLINE_HEADER_RAW = DEADLINE_HEADER.encode()
+
+
+class Deadline:
+    """
+    Absolute point (monotonic clock) by which a request must have its
+    response headers, shared by all of its attempts.
+    """
+
+    __slots__ = ("expires_at",)
+
+    def __init__(self, timeout: float) -> None:
+        self.expires_at = time.monotonic() + timeout
+
+    @classmethod
+    def for_request(cls, scope: Scope, route_deadline: Optional[float]) -> "Optional[Deadline]":
+        # the tighter of the route's total deadline and the client's header
+        timeout = route_deadline
+        for name, value in scope.get("headers", []):
+            if name == _DEADLINE_HEADER_RAW:
+                try:
+                    inbound = int(value) / 1000
+                except ValueError:
+                    break
+                timeout = inbound if timeout is None else min(timeout, inbound)
+                break
+        return cls(timeout) if timeout is not None else None
+
+    def remaining(self) -> float:
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def expired(self) -> bool:
+        return self.expires_at <= time.monotonic()
+
+    def clamp(self, timeout: float) -> float:
+        return min(timeout, self.remaining())
+
+    def header_value(self) -> str:
+        return str(int(self.remaining() * 1000))
@@ -0,0 +1,43 @@
+import time
+from collections import OrderedDict
+from typing import Optional
+from app.core.metrics import DENY_CACHE_HITS, DENY_CACHE_MISSES
+
+
+class DenyCache:
+    """
+    Remembers until when a rate-limited identity is denied, so repeat
+    requests inside that window are rejected without a Redis round trip.
+    Bounded to `max_entries` with LRU eviction.
+    """
+
+    def __init__(self, max_entries: int = 10000) -> None:
+        self.max_entries = max_entries
+        self._deadlines: OrderedDict[str, float] = OrderedDict()
+
+    def retry_after(self, identity: str) -> Optional[float]:
+        # Seconds until `identity` may retry, or None if it isn't denied.
+        deadline = self._deadlines.get(identity)
+        if deadline is not None:
+            remaining = deadline - time.monotonic()
+            if remaining > 0:
+                self._deadlines.move_to_end(identity)
+                DENY_CACHE_HITS.inc()
+                return remaining
+            del self._deadlines[identity]
+        DENY_CACHE_MISSES.inc()
+        return None
+
+    def deny(self, identity: str, retry_after: float) -> None:
+        if retry_after <= 0 or not self.max_entries:
+            return
+        self._deadlines[identity] = time.monotonic() + retry_after
+        self._deadlines.move_to_end(identity)
+        if len(self._deadlines) > self.max_entries:
+            self._deadlines.popitem(last=False)
+
+    def forget(self, identity: str) -> None:
+        self._deadlines.pop(identity, None)
+
+    def __len__(self) -> int:
+        return len(self._deadlines)
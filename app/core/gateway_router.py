@@ -3,19 +3,48 @@ import httpx
 import time
 import logging
 from starlette.types import Scope, Receive, Send, Message
+from starlette.requests import ClientDisconnect
 from starlette.responses import PlainTextResponse, Response
-from typing import Optional, Any
-from urllib.parse import urljoin
-from app.core.metrics import REQUEST_COUNT, REQUEST_DURATION, ACTIVE_REQUESTS
+from typing import Optional, Any, AsyncIterator, NamedTuple
+from app.core.metrics import ACTIVE_REQUESTS, RETRIES, HEDGES, COALESCED
 from app.config.routes import ROUTE_TABLE
 from .path_router import PathRouter
+from .compiled_route import CompiledRoute, RouteCompiler
+from .load_balancer import Endpoint
 from .circuit_breaker import CircuitBreaker
-from .header_rewriter import HeaderRewriter
+from .health_checker import HealthChecker
+from .retry_policy import RetryBudget, RetryState
+from .hedging import HedgePolicy
+from .upstream_pool import UpstreamPools
+from .response_cache import ResponseCache, CachedResponse
+from .singleflight import SingleFlight
+from .compression import CompressingSend
+from .deadline import Deadline, DEADLINE_HEADER
+from .header_rewriter import HeaderRewriter, HOP_BY_HOP_HEADERS
 from .trace import trace_id_var
 
 
 logger = logging.getLogger(__name__)
 
+_DEADLINE_HEADER_RAW = DEADLINE_HEADER.encode()
+
+
+class SharedResponse(NamedTuple):
+    # a buffered upstream response fanned out to coalesced requests
+    status: int
+    headers: list[tuple[bytes, bytes]]
+    body: bytes
+
+
+# the shared response was over the coalescing max_body
+_TOO_LARGE = object()
+
+
+def _close_late_response(task: asyncio.Task) -> None:
+    # a cancelled attempt that still produced a response must release its connection
+    if not task.cancelled() and isinstance(task.result(), httpx.Response):
+        asyncio.ensure_future(task.result().aclose())
+
 
 class GatewayRouter:
     def __init__(
@@ -27,20 +56,51 @@ class GatewayRouter:
         client: Optional[httpx.AsyncClient] = None,
         circuit_breaker: Optional[CircuitBreaker] = None,
         header_rewriter: Optional[HeaderRewriter] = None,
+        retry_body_limit: int = 1024 * 1024,
+        response_buffer_limit: int = 0,
+        route_cache_size: int = 0,
+        health_checker: Optional[HealthChecker] = None,
+        retry_budget: Optional[RetryBudget] = None,
+        deadline: Optional[float] = None,
+        concurrency: Optional[dict] = None,
+        response_cache: Optional[ResponseCache] = None,
     ):
-        self.path_router = path_router or PathRouter(ROUTE_TABLE)
         self.default_retries = retries
         self.default_retry_delay = retry_delay
         self.default_timeout = timeout
-        self.default_header_rewriter = header_rewriter or HeaderRewriter(
-            remove=["authorization", "cookie"],
-            set_={"x-gateway": "my-api-gateway"}
+        self.compiler = RouteCompiler(
+            timeout=timeout,
+            retries=retries,
+            retry_delay=retry_delay,
+            retry_body_limit=retry_body_limit,
+            response_buffer_limit=response_buffer_limit,
+            header_rewriter=header_rewriter,
+            deadline=deadline,
+            concurrency=concurrency,
         )
+        self.default_header_rewriter = self.compiler.header_rewriter
+        if path_router is None:
+            path_router = PathRouter(ROUTE_TABLE, cache_size=route_cache_size,
+                                     compiler=self.compiler)
+        else:
+            path_router.use_compiler(self.compiler)
+        self.path_router = path_router
         self.client = client or httpx.AsyncClient(timeout=timeout)
+        self.pools = UpstreamPools(self.client)
         self.circuit_breaker = circuit_breaker or CircuitBreaker()
+        self.health_checker = health_checker or HealthChecker(
+            self.path_router, self.client, pools=self.pools)
+        self.retry_budget = retry_budget or RetryBudget()
+        # only routes with a "cache" block use it
+        self.response_cache = response_cache or ResponseCache()
+        self._refreshes: set[asyncio.Task] = set()
+        self.singleflight = SingleFlight()
 
         self.cleanup_callbacks: list[callable] = []
+        self.add_cleanup_callback(self.health_checker.stop)
         self.add_cleanup_callback(self.client.aclose)
+        self.add_cleanup_callback(self.pools.aclose)
+        self.add_cleanup_callback(self._cancel_refreshes)
 
     async def __call__(self, scope: Scope, receive: Receive, send: Send):
         if scope["type"] == "lifespan":
@@ -59,143 +119,714 @@ class GatewayRouter:
         query = scope.get("query_string", b"").decode()
         logger.info(f"Incoming request: {method} {path}?{query}")
 
-        backend_base, config = self.path_router.match(path)
-        if not backend_base:
+        route = self.path_router.resolve(path)
+        if route is None:
             logger.warning(f"No route match for {path}")
             await PlainTextResponse("Route not found", status_code=404)(scope, receive, send)
             return
 
-        retries = config.get("retries", self.default_retries)
-        retry_delay = config.get("retry_delay", self.default_retry_delay)
-        timeout = config.get("timeout", self.default_timeout)
-        header_policy = config.get("header_policy", None)
+        target = f"{path}?{query}" if query else path
+        logger.info(f"Proxying request to route {route.prefix}")
 
-        header_rewriter = self._get_header_rewriter(header_policy)
-        target_url = self._construct_target_url(backend_base, path, query)
-        logger.info(f"Proxying request to: {target_url}")
+        limit = route.concurrency
+        if limit is not None and not limit.try_acquire():
+            route.count_metric(method, "503").inc()
+            logger.warning(f"Concurrency limit {int(limit.limit)} reached for {route.prefix}")
+            await PlainTextResponse(
+                "Too many concurrent requests",
+                status_code=503,
+                headers={
+                    "X-Concurrency-Limit": str(int(limit.limit)),
+                    "X-Concurrency-Remaining": "0",
+                },
+            )(scope, receive, send)
+            return
 
-        headers = self._extract_headers(scope, header_rewriter)
-        body = await self._read_body(receive)
+        headers = self._extract_headers(scope, route.header_rewriter)
 
         ACTIVE_REQUESTS.inc()
         start = time.time()
+        status = 500
         try:
-            backend_response = await self._send_with_retries(
-                method, target_url, headers, body,
-                retries=retries, retry_delay=retry_delay, timeout=timeout
-            )
+            # Streamed responses stay active until the last body chunk is sent,
+            # so the duration covers the whole exchange, not just the headers.
+            status = await self._proxy(scope, receive, send, route, method, target, headers)
         finally:
             duration = time.time() - start
             ACTIVE_REQUESTS.dec()
-            REQUEST_DURATION.labels(route=path).observe(duration)
+            route.duration_metric.observe(duration)
+            if limit is not None:
+                limit.release(duration, dropped=status >= 500)
+
+    async def _proxy(
+        self,
+        scope: Scope,
+        receive: Receive,
+        send: Send,
+        route: CompiledRoute,
+        method: str,
+        target: str,
+        headers: list[tuple[bytes, bytes]]
+    ) -> int:
+        # returns the status the client got, for the concurrency limiter
+        if route.compression is not None and method != "HEAD":
+            send = CompressingSend(send, route.compression, route.compression.negotiate(scope))
+
+        cache_mode, cached = None, None
+        if route.cache is not None and method == "GET":
+            cache_mode = self.response_cache.request_mode(scope)
+            if cache_mode is None:
+                self.response_cache.record(route.prefix, "bypass")
+            elif cache_mode == "use":
+                cached = self.response_cache.get(route.prefix, target, scope)
+            if cached is not None:
+                now = time.monotonic()
+                if cached.fresh(now):
+                    return await self._send_cached(send, route, method, cached, "hit")
+                if now < cached.revalidate_until:
+                    self._revalidate(scope, route, target, headers)
+                    return await self._send_cached(send, route, method, cached, "stale")
+
+        if route.coalesce is not None:
+            key = route.coalesce.key(scope, method, target)
+            if key is not None:
+                status = await self._proxy_coalesced(scope, receive, send, route, method, target,
+                                                     headers, key, cache_mode, cached)
+                if status is not None:
+                    return status
+
+        retries = route.retry_policy.retries_for(method)
+        deadline = Deadline.for_request(scope, route.deadline)
+        try:
+            body, replayable = await self._prepare_body(scope, receive, retries,
+                                                        route.retry_body_limit)
+            retry = RetryState(route.retry_policy, retries if replayable else 0)
+            if not replayable and retries:
+                logger.info(f"Request body over {route.retry_body_limit} bytes, "
+                            f"streaming with a single attempt for {target}")
+            backend_response, endpoint = await self._send_with_retries(
+                scope, route, method, target, headers, body, retry, deadline
+            )
+        except ClientDisconnect:
+            # nginx's "client closed request" status, so aborted uploads stay visible
+            route.count_metric(method, "499").inc()
+            logger.warning(f"Client disconnected while sending body for {target}")
+            return 499
+
+        if cached is not None and time.monotonic() < cached.error_until and (
+                backend_response is None or backend_response.status_code >= 500):
+            if isinstance(backend_response, httpx.Response):
+                await backend_response.aclose()
+                endpoint.in_flight -= 1
+            logger.warning(f"Upstream failed, serving stale cached response for {target}")
+            return await self._send_cached(send, route, method, cached, "stale")
+        if cache_mode is not None:
+            self.response_cache.record(route.prefix, "miss")
+
+        if backend_response is None and deadline is not None and deadline.expired():
+            route.count_metric(method, "504").inc()
+            message = f"Gateway timeout: deadline exceeded after {retry.retried} retries"
+            logger.error(f"{message} for {target}")
+            await PlainTextResponse(message, status_code=504)(scope, receive, send)
+            return 504
 
         if backend_response is None:
-            REQUEST_COUNT.labels(method=method, route=path, status="502").inc()
-            logger.error(f"Upstream failure after {retries} retries for {target_url}")
-            await PlainTextResponse(
-                f"Upstream error after {retries} retries",
-                status_code=502
-            )(scope, receive, send)
-            return
+            route.count_metric(method, "502").inc()
+            if not replayable:
+                message = "Upstream error (streamed request body, not retried)"
+            elif retry.budget_denied:
+                message = f"Upstream error after {retry.retried} retries (retry budget exhausted)"
+            else:
+                message = f"Upstream error after {retry.retried} retries"
+            logger.error(f"{message} for {target}")
+            await PlainTextResponse(message, status_code=502)(scope, receive, send)
+            return 502
 
         if isinstance(backend_response, Response):  # circuit breaker shortcut
-            status_code = backend_response.status_code
-            REQUEST_COUNT.labels(method=method, route=path, status=str(status_code)).inc()
-            logger.warning(f"Circuit breaker blocked request to {target_url}")
+            route.count_metric(method, backend_response.status_code).inc()
+            logger.warning(f"Circuit breaker blocked request for {target}")
             await backend_response(scope, receive, send)
-            return
+            return backend_response.status_code
 
-        REQUEST_COUNT.labels(method=method, route=path,
-                             status=str(backend_response.status_code)).inc()
+        route.count_metric(method, backend_response.status_code).inc()
         logger.info(f"Successful response from backend: \
-                    {target_url} ({backend_response.status_code})")
-        await self._send_response(scope, receive, send, backend_response)
-
-    def _get_header_rewriter(self, policy: dict | None) -> HeaderRewriter:
-        if not policy:
-            return self.default_header_rewriter
-        mod = {k if k != "set" else "set_": v for k, v in policy.items()}
-        return HeaderRewriter(**mod)
-    
-    def _construct_target_url(self, base: str, path: str, query: str) -> str:
-        url = urljoin(base, path)
-        return f"{url}?{query}" if query else url
-
-    def _extract_headers(self, scope: Scope, header_rewriter: HeaderRewriter) -> dict[str, str]:
-        raw_headers = scope.get("headers", [])
-        rewritten = header_rewriter.rewrite(raw_headers, scope, trace_id_var.get())
-        rewritten.pop("host", None)
-        return rewritten
-
-    async def _read_body(self, receive: Receive) -> bytes:
-        body = b""
-        more_body = True
-        while more_body:
-            message = await receive()
-            body += message.get("body", b"")
-            more_body = message.get("more_body", False)
-        return body
+                    {backend_response.request.url} ({backend_response.status_code})")
+        try:
+            if cache_mode is not None and self.response_cache.storable(
+                    route.cache, backend_response.status_code, backend_response.headers):
+                await self._send_and_cache(scope, receive, send, route, target, backend_response)
+            else:
+                await self._send_response(scope, receive, send, backend_response,
+                                          route.response_buffer_limit)
+        finally:
+            await backend_response.aclose()
+            endpoint.in_flight -= 1
+        return backend_response.status_code
 
-    async def _send_with_retries(
+    async def _proxy_coalesced(
         self,
+        scope: Scope,
+        receive: Receive,
+        send: Send,
+        route: CompiledRoute,
         method: str,
-        url: str,
-        headers: dict[str, str],
-        body: bytes,
+        target: str,
+        headers: list[tuple[bytes, bytes]],
+        key: tuple,
+        cache_mode: Optional[str],
+        cached: Optional[CachedResponse]
+    ) -> Optional[int]:
+        # None: the response was too large to share, so proxy this request on its own
+        deadline = Deadline.for_request(scope, route.deadline)
+        call = self.singleflight.do(key, lambda: self._fetch_shared(
+            scope, route, method, target, headers, cache_mode))
+        try:
+            # each request keeps its own deadline; giving up never cancels the shared call
+            if deadline is None:
+                shared, joined = await call
+            else:
+                shared, joined = await asyncio.wait_for(call, deadline.remaining())
+        except asyncio.TimeoutError:
+            route.count_metric(method, "504").inc()
+            message = "Gateway timeout: deadline exceeded waiting for a coalesced request"
+            await PlainTextResponse(message, status_code=504)(scope, receive, send)
+            return 504
+
+        if joined:
+            COALESCED.labels(route=route.prefix).inc()
+        if shared is _TOO_LARGE:
+            return None
+        if cached is not None and time.monotonic() < cached.error_until and (
+                shared is None or shared.status >= 500):
+            logger.warning(f"Upstream failed, serving stale cached response for {target}")
+            return await self._send_cached(send, route, method, cached, "stale")
+        if cache_mode is not None:
+            self.response_cache.record(route.prefix, "miss")
+        if shared is None:
+            route.count_metric(method, "502").inc()
+            await PlainTextResponse("Upstream error", status_code=502)(scope, receive, send)
+            return 502
+
+        route.count_metric(method, shared.status).inc()
+        await send({"type": "http.response.start", "status": shared.status, "headers": shared.headers})
+        await send({"type": "http.response.body", "body": shared.body})
+        return shared.status
+
+    async def _fetch_shared(
+        self,
+        scope: Scope,
+        route: CompiledRoute,
+        method: str,
+        target: str,
+        headers: list[tuple[bytes, bytes]],
+        cache_mode: Optional[str]
+    ) -> SharedResponse | object | None:
+        # runs once for every request coalesced on it, with the first one's scope and headers
+        retry = RetryState(route.retry_policy, route.retry_policy.retries_for(method))
+        deadline = Deadline.for_request(scope, route.deadline)
+        backend_response, endpoint = await self._send_with_retries(
+            scope, route, method, target, headers, b"", retry, deadline)
+        if backend_response is None:
+            logger.error(f"Coalesced request for {target} failed")
+            return None
+        if isinstance(backend_response, Response):  # circuit breaker shortcut
+            return SharedResponse(backend_response.status_code, backend_response.raw_headers,
+                                  backend_response.body)
+
+        try:
+            length = self._content_length(backend_response)
+            if length != float("inf") and length > route.coalesce.max_body:
+                return _TOO_LARGE  # unknown lengths are read up to the limit below
+            body, size = [], 0
+            async for chunk in backend_response.aiter_raw():
+                body.append(chunk)
+                size += len(chunk)
+                if size > route.coalesce.max_body:
+                    return _TOO_LARGE
+            raw_headers = self._response_headers(backend_response)
+            if cache_mode is not None and self.response_cache.storable(
+                    route.cache, backend_response.status_code, backend_response.headers):
+                self.response_cache.store(
+                    route.prefix, target, scope, route.cache, backend_response.status_code,
+                    backend_response.headers, raw_headers, b"".join(body))
+            return SharedResponse(backend_response.status_code, raw_headers, b"".join(body))
+        except httpx.HTTPError as e:
+            logger.error(f"Upstream body read failed for coalesced {target}: {e}")
+            return None
+        finally:
+            await backend_response.aclose()
+            endpoint.in_flight -= 1
+
+    async def _send_cached(
+        self,
+        send: Send,
+        route: CompiledRoute,
+        method: str,
+        cached: CachedResponse,
+        result: str
+    ) -> int:
+        self.response_cache.record(route.prefix, result)
+        route.count_metric(method, cached.status).inc()
+        headers = cached.headers + [
+            (b"age", str(cached.age(time.monotonic())).encode()),
+            (b"x-cache", b"HIT" if result == "hit" else b"STALE"),
+        ]
+        await send({"type": "http.response.start", "status": cached.status, "headers": headers})
+        await send({"type": "http.response.body", "body": cached.body})
+        return cached.status
+
+    async def _send_and_cache(
+        self,
+        scope: Scope,
+        receive: Receive,
+        send: Send,
+        route: CompiledRoute,
+        target: str,
+        backend_response: httpx.Response
+    ):
+        # storable() capped Content-Length at max_entry_bytes, so buffering is bounded
+        try:
+            body = await self._cache_response(scope, route, target, backend_response)
+        except httpx.HTTPError as e:
+            logger.error(f"Upstream body read failed: {e}")
+            await PlainTextResponse("Upstream error", status_code=502)(scope, receive, send)
+            return
+        headers = self._response_headers(backend_response) + [(b"x-cache", b"MISS")]
+        await send({"type": "http.response.start", "status": backend_response.status_code,
+                    "headers": headers})
+        await send({"type": "http.response.body", "body": body})
+
+    async def _cache_response(
+        self,
+        scope: Scope,
+        route: CompiledRoute,
+        target: str,
+        backend_response: httpx.Response
+    ) -> bytes:
+        # raw (still encoded) bytes, like every other response path
+        body = b"".join([chunk async for chunk in backend_response.aiter_raw()])
+        self.response_cache.store(
+            route.prefix, target, scope, route.cache, backend_response.status_code,
+            backend_response.headers, self._response_headers(backend_response), body)
+        return body
+
+    def _revalidate(self, scope: Scope, route: CompiledRoute, target: str, headers: list[tuple[bytes, bytes]]):
+        if not self.response_cache.begin_refresh(route.prefix, target):
+            return
+        task = asyncio.create_task(self._refresh(scope, route, target, headers))
+        self._refreshes.add(task)
+
+        def done(task: asyncio.Task) -> None:
+            self._refreshes.discard(task)
+            self.response_cache.end_refresh(route.prefix, target)
+        task.add_done_callback(done)
+
+    async def _refresh(self, scope: Scope, route: CompiledRoute, target: str, headers: list[tuple[bytes, bytes]]):
+        # a stale-while-revalidate fetch; the client has already been answered
+        retry = RetryState(route.retry_policy, route.retry_policy.retries_for("GET"))
+        deadline = Deadline.for_request(scope, route.deadline)
+        backend_response, endpoint = await self._send_with_retries(
+            scope, route, "GET", target, headers, b"", retry, deadline)
+        if not isinstance(backend_response, httpx.Response):
+            logger.warning(f"Background refresh of {target} failed")
+            return
+        try:
+            if self.response_cache.storable(route.cache, backend_response.status_code,
+                                            backend_response.headers):
+                await self._cache_response(scope, route, target, backend_response)
+        except httpx.HTTPError as e:
+            logger.warning(f"Background refresh of {target} failed: {e}")
+        finally:
+            await backend_response.aclose()
+            endpoint.in_flight -= 1
+
+    async def _cancel_refreshes(self):
+        for task in list(self._refreshes):
+            task.cancel()
+        await asyncio.gather(*self._refreshes, return_exceptions=True)
+
+    def _extract_headers(self, scope: Scope, header_rewriter: HeaderRewriter) -> list[tuple[bytes, bytes]]:
+        return header_rewriter.rewrite(scope.get("headers", []), scope, trace_id_var.get())
+
+    async def _prepare_body(
+        self,
+        scope: Scope,
+        receive: Receive,
         retries: int,
-        retry_delay: float,
-        timeout: float
-    ) -> Optional[httpx.Response]:
-
-        backend = url.split("/")[2]
-
-        if not self.circuit_breaker.allow_request(backend):
-            logger.warning(f"Circuit breaker is OPEN for {backend}, request blocked.")
-            return PlainTextResponse(
-                "Upstream error after circuit breaker opened",
-                status_code=502,
-                headers={"X-Circuit-Open": "true"}
-            )
+        limit: int
+    ) -> tuple[bytes | AsyncIterator[bytes], bool]:
+        # Returns the upstream content and whether it can be replayed on retry.
+        # Headers are only a hint (HTTP/2 bodies may carry neither
+        # Content-Length nor Transfer-Encoding): the body is always read up to
+        # the budget and whatever is left is streamed.
+        budget = limit if retries else 0
+        for name, value in scope.get("headers", []):
+            if name == b"content-length":
+                try:
+                    if int(value) > budget:
+                        budget = 0
+                except ValueError:
+                    pass
+                break
 
+        buffered: list[bytes] = []
+        size = 0
+        while True:
+            message = await receive()
+            if message["type"] == "http.disconnect":
+                raise ClientDisconnect()
+            chunk = message.get("body", b"")
+            buffered.append(chunk)
+            size += len(chunk)
+            if not message.get("more_body", False):
+                return b"".join(buffered), True
+            if size > budget:
+                return self._stream_body(receive, buffered), False
+
+    async def _stream_body(self, receive: Receive, buffered: list[bytes]) -> AsyncIterator[bytes]:
+        for chunk in buffered:
+            if chunk:
+                yield chunk
+        while True:
+            message = await receive()
+            if message["type"] == "http.disconnect":
+                raise ClientDisconnect()
+            chunk = message.get("body", b"")
+            if chunk:
+                yield chunk
+            if not message.get("more_body", False):
+                return
+
+    async def _send_with_retries(
+        self,
+        scope: Scope,
+        route: CompiledRoute,
+        method: str,
+        target: str,
+        headers: list[tuple[bytes, bytes]],
+        body: bytes | AsyncIterator[bytes],
+        retry: RetryState,
+        deadline: Optional[Deadline] = None
+    ) -> tuple[Optional[httpx.Response | Response], Optional[Endpoint]]:
+        # On success the endpoint is returned still counted as in flight; the
+        # caller releases it once the response body has been relayed.
+        policy = retry.policy
+        hedge = route.hedge
+        if hedge is not None and not (isinstance(body, bytes) and hedge.applies(method)):
+            hedge = None
+        if hedge is not None:
+            hedge.deposit()
+        tried: set[Endpoint] = set()
         attempt = 0
-        while attempt <= retries:
+        while True:
+            if deadline is not None and deadline.expired():
+                logger.warning(f"Deadline exhausted before attempt {attempt+1} for {target}")
+                break
+            endpoint = self._pick_endpoint(scope, route, tried)
+            if endpoint is None:
+                if attempt == 0:
+                    logger.warning(f"Circuit breaker is OPEN for {route.backend_host}, "
+                                   "request blocked.")
+                    return PlainTextResponse(
+                        "Upstream error after circuit breaker opened",
+                        status_code=502,
+                        headers={"X-Circuit-Open": "true"}
+                    ), None
+                logger.warning(f"Circuit breaker opened for every upstream of {route.prefix}")
+                break
+            if attempt == 0:
+                self.retry_budget.deposit(endpoint.host)
+
+            endpoint.in_flight += 1
+            started = time.monotonic()
+            response = None
             try:
-                logger.info(f"Attempt {attempt+1} to {url}")
-                response = await self.client.request(
-                    method=method,
-                    url=url,
-                    headers=headers,
-                    content=body,
-                    timeout=timeout or self.default_timeout
-                )
-                if response.status_code < 500:
-                    self.circuit_breaker.record_success(backend)
-                    return response
-            except httpx.RequestError as e:
-                logger.error(f"Request error to {url}: {str(e)}")
-
-            self.circuit_breaker.record_failure(backend)
+                logger.info(f"Attempt {attempt+1} to {endpoint.origin}{target}")
+                if hedge is None:
+                    outcome = await self._send_once(route, endpoint, method, target,
+                                                    headers, body, deadline)
+                else:
+                    outcome, winner, started = await self._send_hedged(
+                        scope, route, hedge, endpoint, tried, method, target, headers, body,
+                        deadline)
+                    if winner is not endpoint:
+                        endpoint.in_flight -= 1
+                        endpoint = winner
+            except BaseException:
+                endpoint.in_flight -= 1
+                raise
+
+            elapsed = time.monotonic() - started
+            if isinstance(outcome, httpx.RequestError):
+                # a fast failure must not make the endpoint look fast
+                endpoint.observe(max(elapsed, route.timeout))
+                self.health_checker.record(endpoint, None)
+                logger.error(f"Request error to {endpoint.origin}{target}: {str(outcome)}")
+                failed = True
+                retryable = policy.retryable_error(outcome)
+            else:
+                response = outcome
+                endpoint.observe(elapsed)
+                if hedge is not None:
+                    hedge.observe(elapsed)
+                self.health_checker.record(endpoint, response.status_code)
+                failed = response.status_code >= 500
+                retryable = policy.retryable_status(response.status_code)
+
+            if failed:
+                self.circuit_breaker.record_failure(endpoint.host, elapsed)
+            else:
+                self.circuit_breaker.record_success(endpoint.host, elapsed)
+
+            # the backoff is drawn first so a retry that can't fit the deadline is never granted
+            delay = retry.next_delay() if retryable else 0.0
+            if deadline is not None and deadline.remaining() <= delay:
+                retryable = False
+            if not (retryable and self._grant_retry(route, endpoint, retry)):
+                if not failed:
+                    return response, endpoint
+                if response is not None:
+                    await response.aclose()
+                endpoint.in_flight -= 1
+                break
+
+            if response is not None:
+                await response.aclose()
+            endpoint.in_flight -= 1
+            tried.add(endpoint)
             attempt += 1
-            if attempt <= retries:
-                logger.info(f"Retrying after delay ({retry_delay}s)")
-                await asyncio.sleep(retry_delay)
+            logger.info(f"Retrying after delay ({delay:.3f}s)")
+            await asyncio.sleep(delay)
+
+        logger.error(f"All retries failed for {target}")
+        return None, None
+
+    async def _send_once(
+        self,
+        route: CompiledRoute,
+        endpoint: Endpoint,
+        method: str,
+        target: str,
+        headers: list[tuple[bytes, bytes]],
+        body: bytes | AsyncIterator[bytes],
+        deadline: Optional[Deadline] = None
+    ) -> httpx.Response | httpx.RequestError:
+        timeout = route.timeout
+        if deadline is not None:
+            # a new list: the rewritten headers are shared by every attempt
+            headers = headers + [(_DEADLINE_HEADER_RAW, deadline.header_value().encode())]
+            timeout = deadline.clamp(timeout)
+        client = self.pools.client_for(endpoint)
+        request = client.build_request(
+            method=method,
+            url=endpoint.base_url + target,
+            headers=headers,
+            content=body,
+            timeout=timeout
+        )
+        try:
+            if deadline is None:
+                return await client.send(request, stream=True)
+            # enforced here too: not every transport applies httpx timeouts
+            return await asyncio.wait_for(client.send(request, stream=True), timeout)
+        except asyncio.TimeoutError:
+            return httpx.TimeoutException(f"No response within {timeout:.3f}s", request=request)
+        except httpx.RequestError as e:
+            return e
+
+    async def _send_hedged(
+        self,
+        scope: Scope,
+        route: CompiledRoute,
+        hedge: HedgePolicy,
+        endpoint: Endpoint,
+        tried: set[Endpoint],
+        method: str,
+        target: str,
+        headers: list[tuple[bytes, bytes]],
+        body: bytes,
+        deadline: Optional[Deadline] = None
+    ) -> tuple[httpx.Response | httpx.RequestError, Endpoint, float]:
+        # Sends to `endpoint` and, if it is slow to answer, races a copy on
+        # another endpoint. Returns the first good outcome (or the last bad
+        # one) with its endpoint and start time. `endpoint` stays counted in
+        # flight for the caller; a hedge endpoint is counted here and is
+        # only left counted when it is the one returned.
+        started = time.monotonic()
+        first = asyncio.ensure_future(
+            self._send_once(route, endpoint, method, target, headers, body, deadline))
+        attempts = {first: (endpoint, started)}
+        try:
+            delay = hedge.delay()
+            if delay is not None:
+                await asyncio.wait((first,), timeout=delay)
+            if first.done() or delay is None or not hedge.try_acquire():
+                attempts.clear()
+                return await first, endpoint, started
+            backup = self._pick_endpoint(scope, route, tried | {endpoint})
+            if backup is None or backup is endpoint:
+                attempts.clear()
+                return await first, endpoint, started
+
+            backup.in_flight += 1
+            HEDGES.labels(route=route.prefix, outcome="sent").inc()
+            logger.info(f"Hedging {target} to {backup.origin} after {delay:.3f}s")
+            second = asyncio.ensure_future(
+                self._send_once(route, backup, method, target, headers, body, deadline))
+            attempts[second] = (backup, time.monotonic())
 
-        logger.error(f"All retries failed for {url}")
-        return None
+            while True:
+                done, _ = await asyncio.wait(attempts, return_when=asyncio.FIRST_COMPLETED)
+                # on a tie the original attempt wins
+                for task in sorted(done, key=lambda t: t is not first):
+                    owner, owner_started = attempts.pop(task)
+                    outcome = task.result()
+                    good = isinstance(outcome, httpx.Response) and outcome.status_code < 500
+                    if good or not attempts:
+                        if owner is backup:
+                            HEDGES.labels(route=route.prefix, outcome="won").inc()
+                        return outcome, owner, owner_started
+                    # a bad answer while the other attempt is still out: wait for that one
+                    if isinstance(outcome, httpx.Response):
+                        await outcome.aclose()
+                    if owner is backup:
+                        backup.in_flight -= 1
+        finally:
+            for task, (owner, owner_started) in attempts.items():
+                # the loser; its elapsed time is a lower bound on its latency
+                task.cancel()
+                task.add_done_callback(_close_late_response)
+                owner.observe(time.monotonic() - owner_started)
+                if owner is not endpoint:
+                    owner.in_flight -= 1
+
+    def _grant_retry(self, route: CompiledRoute, endpoint: Endpoint, retry: RetryState) -> bool:
+        if retry.retried >= retry.max_retries:
+            return False
+        if not self.retry_budget.withdraw(endpoint.host):
+            RETRIES.labels(route=route.prefix, decision="denied").inc()
+            logger.warning(f"Retry budget for {endpoint.host} exhausted, not retrying")
+            retry.budget_denied = True
+            return False
+        RETRIES.labels(route=route.prefix, decision="granted").inc()
+        retry.retried += 1
+        return True
+
+    def _pick_endpoint(
+        self,
+        scope: Scope,
+        route: CompiledRoute,
+        tried: set[Endpoint]
+    ) -> Optional[Endpoint]:
+        now = time.monotonic()
+        blocked = {e for e in route.endpoints if not e.available(now)}
+        if len(blocked) == len(route.endpoints):
+            # panic mode: with every upstream marked down, health data is
+            # likely wrong (or the probe path is) so it is ignored
+            blocked.clear()
+        blocked.update(e for e in route.endpoints if not self.circuit_breaker.available(e.host))
+        # prefer an upstream that has not failed this request yet
+        endpoint = route.balancer.pick(scope, blocked | tried) if tried else None
+        if endpoint is None:
+            endpoint = route.balancer.pick(scope, blocked)
+        # claims a half-open probe slot if the circuit is recovering
+        if endpoint is not None and not self.circuit_breaker.allow_request(endpoint.host):
+            return None
+        return endpoint
 
     async def _send_response(
         self,
         scope: Scope,
         receive: Receive,
         send: Send,
-        backend_response: httpx.Response
+        backend_response: httpx.Response,
+        buffer_limit: int = 0
     ):
-        await Response(
-            content=backend_response.content,
-            status_code=backend_response.status_code,
-            headers=dict(backend_response.headers),
-            media_type=backend_response.headers.get("content-type"),
-        )(scope, receive, send)
+        start_message = {
+            "type": "http.response.start",
+            "status": backend_response.status_code,
+            "headers": self._response_headers(backend_response),
+        }
+
+        # Raw (still encoded) bytes are forwarded, so upstream Content-Length
+        # and Content-Encoding stay valid for what the client receives.
+        if buffer_limit and self._content_length(backend_response) <= buffer_limit:
+            try:
+                body = b"".join([chunk async for chunk in backend_response.aiter_raw()])
+            except httpx.HTTPError as e:
+                logger.error(f"Upstream body read failed: {e}")
+                await PlainTextResponse("Upstream error", status_code=502)(scope, receive, send)
+                return
+            await send(start_message)
+            await send({"type": "http.response.body", "body": body})
+            return
+
+        spec_version = tuple(map(int, scope.get("asgi", {}).get("spec_version", "2.0").split(".")))
+        if spec_version >= (2, 4):
+            # ASGI 2.4 servers raise OSError from send() once the client is gone
+            try:
+                await self._stream_body_to_client(send, backend_response, start_message)
+            except OSError:
+                logger.warning("Client disconnected, closed upstream stream early")
+            except httpx.HTTPError as e:
+                logger.error(f"Upstream stream failed mid-response: {e}")
+            return
+
+        pump = asyncio.create_task(
+            self._stream_body_to_client(send, backend_response, start_message))
+        disconnect = asyncio.create_task(self._wait_for_disconnect(receive))
+        try:
+            await asyncio.wait((pump, disconnect), return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            pump.cancel()
+            disconnect.cancel()
+            await asyncio.gather(pump, disconnect, return_exceptions=True)
+
+        if pump.cancelled():
+            logger.warning("Client disconnected, closed upstream stream early")
+            return
+        try:
+            pump.result()
+        except httpx.HTTPError as e:
+            # The response has already started; leaving it unfinished makes the
+            # server drop the connection so the client sees a truncated body.
+            logger.error(f"Upstream stream failed mid-response: {e}")
+
+    def _response_headers(self, response: httpx.Response) -> list[tuple[bytes, bytes]]:
+        # The ASGI server does its own framing, so hop-by-hop headers from the
+        # upstream connection (and any named in its Connection header) are dropped.
+        drop = HOP_BY_HOP_HEADERS
+        connection = response.headers.get("connection")
+        if connection:
+            drop = drop | {t.strip().lower().encode() for t in connection.split(",")}
+        return [(k.lower(), v) for k, v in response.headers.raw if k.lower() not in drop]
+
+    def _content_length(self, response: httpx.Response) -> float:
+        try:
+            return int(response.headers["content-length"])
+        except (KeyError, ValueError):
+            return float("inf")
+
+    async def _stream_body_to_client(
+        self,
+        send: Send,
+        backend_response: httpx.Response,
+        start_message: Message
+    ):
+        await send(start_message)
+        async for chunk in backend_response.aiter_raw():
+            if chunk:
+                await send({"type": "http.response.body", "body": chunk, "more_body": True})
+        await send({"type": "http.response.body", "body": b"", "more_body": False})
+
+    async def _wait_for_disconnect(self, receive: Receive):
+        while True:
+            message = await receive()
+            if message["type"] == "http.disconnect":
+                return
+            # Leftover body messages (e.g. the upstream answered early) are
+            # discarded; yield so a receive() that never blocks can't spin.
+            await asyncio.sleep(0)
 
     def add_cleanup_callback(self, cb: callable) -> None:
         self.cleanup_callbacks.append(cb)
@@ -204,6 +835,8 @@ class GatewayRouter:
         while True:
             message = await receive()
             if message["type"] == "lifespan.startup":
+                self.health_checker.start()
+                await self.pools.prewarm(self.compiler.endpoints.values())
                 await send({"type": "lifespan.startup.complete"})
             elif message["type"] == "lifespan.shutdown":
                 for cb in self.cleanup_callbacks:
@@ -1,29 +1,83 @@
 from typing import Optional
 from starlette.types import Scope
+from .deadline import DEADLINE_HEADER
+
+HOP_BY_HOP_HEADERS = frozenset({
+    b"connection", b"keep-alive", b"proxy-authenticate", b"proxy-authorization",
+    b"te", b"trailer", b"transfer-encoding", b"upgrade",
+})
+# set by the gateway itself: httpx writes Host from the upstream URL, the
+# deadline is re-stamped on every attempt and the trace id comes from the context
+_GATEWAY_HEADERS = frozenset({b"host", DEADLINE_HEADER.encode(), b"x-trace-id"})
+_FORWARDED_FOR = b"x-forwarded-for"
+
+
+def _encode(headers: Optional[dict[str, str]]) -> tuple[tuple[bytes, bytes], ...]:
+    return tuple((k.lower().encode("latin-1"), v.encode("latin-1")) for k, v in (headers or {}).items())
+
 
 class HeaderRewriter:
+    """
+    Turns the client's request headers into the upstream's, as raw ASGI
+    (name, value) pairs so repeated headers are kept in order. Hop-by-hop
+    headers are stripped, `remove` and `set_` names dropped, `set_` and
+    `append` (only when the client sent none) added, and, with `forwarded`,
+    X-Forwarded-For/-Proto/-Host describe the client connection.
+    """
+
     def __init__(
         self,
         remove: Optional[list[str]] = None,
         set_: Optional[dict[str, str]] = None,
-        append: Optional[dict[str, str]] = None
+        append: Optional[dict[str, str]] = None,
+        forwarded: bool = True,
     ) -> None:
-        self.remove = set(h.lower() for h in (remove or []))
-        self.set = {k.lower(): v for k, v in (set_ or {}).items()}
-        self.append = {k.lower(): v for k, v in (append or {}).items()}
-
-    def rewrite(self, headers: list[tuple[bytes, bytes]], scope: Scope, trace_id: Optional[str] = None) -> dict[str, str]:
-        hdict = {k.decode().lower(): v.decode() for k, v in headers}
-        for h in self.remove:
-            hdict.pop(h, None)
-        for k, v in self.set.items():
-            hdict[k] = v
-        for k, v in self.append.items():
-            hdict.setdefault(k, v)
+        self.remove = frozenset(h.lower().encode("latin-1") for h in (remove or []))
+        self.set = _encode(set_)
+        self.append = _encode(append)
+        self.forwarded = forwarded
+        self._drop = (HOP_BY_HOP_HEADERS | _GATEWAY_HEADERS | self.remove
+                      | {name for name, _ in self.set})
+        if forwarded:
+            self._drop |= {_FORWARDED_FOR, b"x-forwarded-proto", b"x-forwarded-host"}
 
-        if trace_id:
-            hdict["x-trace-id"] = trace_id
+    def rewrite(
+        self,
+        headers: list[tuple[bytes, bytes]],
+        scope: Scope,
+        trace_id: Optional[str] = None
+    ) -> list[tuple[bytes, bytes]]:
+        # ASGI servers lowercase header names, so they are compared as given
+        drop = self._drop
+        host = forwarded_for = None
+        out = []
+        for name, value in headers:
+            if name not in drop:
+                out.append((name, value))
+            elif name == b"connection":
+                # the client's Connection header can name more hop-by-hop headers
+                drop = drop | {t.strip().lower() for t in value.split(b",")}
+            elif name == b"host":
+                host = value
+            elif name == _FORWARDED_FOR:
+                forwarded_for = value if forwarded_for is None else forwarded_for + b", " + value
+        if drop is not self._drop:
+            out = [(name, value) for name, value in out if name not in drop]
 
-        return hdict
-    
-    
+        out.extend(self.set)
+        for name, value in self.append:
+            if not any(n == name for n, _ in out):
+                out.append((name, value))
+        if self.forwarded:
+            client = scope.get("client")
+            if client:
+                address = client[0].encode("latin-1")
+                forwarded_for = address if forwarded_for is None else forwarded_for + b", " + address
+            if forwarded_for is not None:
+                out.append((_FORWARDED_FOR, forwarded_for))
+            out.append((b"x-forwarded-proto", scope.get("scheme", "http").encode("latin-1")))
+            if host is not None:
+                out.append((b"x-forwarded-host", host))
+        if trace_id:
+            out.append((b"x-trace-id", trace_id.encode("latin-1")))
+        return out
@@ -0,0 +1,182 @@
+import time
+import random
+import asyncio
+import logging
+import statistics
+from typing import Optional
+import httpx
+from app.core.metrics import UPSTREAM_AVAILABLE, UPSTREAM_EJECTIONS
+from .path_router import PathRouter
+from .load_balancer import Endpoint
+from .upstream_pool import UpstreamPools
+
+logger = logging.getLogger(__name__)
+
+
+class HealthChecker:
+    """
+    Keeps dead or misbehaving upstreams out of rotation before user requests
+    find them.
+
+    Active: every endpoint of a route with a `health_check` block
+    ({"path", "interval", "timeout", "unhealthy_threshold",
+    "healthy_threshold"}) is probed on its own jittered schedule; after
+    `unhealthy_threshold` failed probes it is marked unhealthy until
+    `healthy_threshold` probes pass again.
+
+    Passive (Envoy-style outlier detection, on for every endpoint):
+    `consecutive_5xx` failed responses in a row, or an EWMA latency above
+    `latency_factor` x the median of the route's other endpoints, ejects the
+    endpoint for `base_ejection_time` x the number of times it has been
+    ejected (capped at `max_ejection_time`).
+    """
+
+    def __init__(
+        self,
+        path_router: PathRouter,
+        client: httpx.AsyncClient,
+        consecutive_5xx: int = 5,
+        base_ejection_time: float = 30.0,
+        max_ejection_time: float = 300.0,
+        latency_factor: float = 3.0,
+        min_latency_hosts: int = 3,
+        sweep_interval: float = 1.0,
+        pools: Optional[UpstreamPools] = None,
+    ) -> None:
+        self.path_router = path_router
+        self.client = client
+        # probes go through the upstream's own client (unix/asgi transports) when given
+        self.pools = pools
+        self.consecutive_5xx = consecutive_5xx
+        self.base_ejection_time = base_ejection_time
+        self.max_ejection_time = max_ejection_time
+        self.latency_factor = latency_factor
+        self.min_latency_hosts = min_latency_hosts
+        self.sweep_interval = sweep_interval
+        self._failures: dict[Endpoint, int] = {}
+        self._ejections: dict[Endpoint, int] = {}
+        self._probe_streak: dict[Endpoint, int] = {}
+        self._probes: dict[Endpoint, asyncio.Task] = {}
+        self._scheduler: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        if self._scheduler is None:
+            self._scheduler = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self) -> None:
+        tasks = list(self._probes.values())
+        if self._scheduler is not None:
+            tasks.append(self._scheduler)
+            self._scheduler = None
+        self._probes.clear()
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def record(self, endpoint: Endpoint, status: Optional[int]) -> None:
+        # status None: the request never got a response (connect error, timeout)
+        if status is not None and status < 500:
+            self._failures[endpoint] = 0
+            return
+        failures = self._failures.get(endpoint, 0) + 1
+        self._failures[endpoint] = failures
+        if failures >= self.consecutive_5xx:
+            self.eject(endpoint, "consecutive_5xx")
+
+    def eject(self, endpoint: Endpoint, reason: str) -> None:
+        now = time.monotonic()
+        if endpoint.ejected_until > now:
+            return
+        count = self._ejections.get(endpoint, 0) + 1
+        self._ejections[endpoint] = count
+        self._failures[endpoint] = 0
+        endpoint.ejected_until = now + min(self.base_ejection_time * count,
+                                           self.max_ejection_time)
+        UPSTREAM_EJECTIONS.labels(upstream=endpoint.host, reason=reason).inc()
+        UPSTREAM_AVAILABLE.labels(upstream=endpoint.host).set(0)
+        logger.warning(f"Ejected {endpoint.host} ({reason}) "
+                       f"for {endpoint.ejected_until - now:.0f}s")
+
+    def status(self) -> dict[str, str]:
+        now = time.monotonic()
+        return {e.host: e.state(now) for e in self._endpoints()}
+
+    def _endpoints(self) -> dict[Endpoint, Optional[dict]]:
+        # every routed endpoint, with the first health_check block that names it
+        found: dict[Endpoint, Optional[dict]] = {}
+        for route in self.path_router.routes():
+            check = route.config.get("health_check")
+            for endpoint in route.endpoints:
+                if found.get(endpoint) is None:
+                    found[endpoint] = check
+        return found
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                self._sweep()
+            except Exception as e:
+                logger.error(f"Health check sweep failed: {e}")
+            await asyncio.sleep(self.sweep_interval)
+
+    def _sweep(self) -> None:
+        # keep one probe task per checked endpoint in step with route reloads
+        endpoints = self._endpoints()
+        for endpoint, check in endpoints.items():
+            if check and endpoint not in self._probes:
+                self._probes[endpoint] = asyncio.get_running_loop().create_task(
+                    self._probe_forever(endpoint, check))
+        for endpoint in list(self._probes):
+            if not endpoints.get(endpoint):
+                self._probes.pop(endpoint).cancel()
+                endpoint.healthy = True
+
+        for route in self.path_router.routes():
+            self._eject_latency_outliers(route.endpoints)
+
+        now = time.monotonic()
+        for endpoint in endpoints:
+            UPSTREAM_AVAILABLE.labels(upstream=endpoint.host).set(int(endpoint.available(now)))
+
+    def _eject_latency_outliers(self, endpoints: tuple[Endpoint, ...]) -> None:
+        now = time.monotonic()
+        sampled = [e for e in endpoints if e.ewma > 0 and e.available(now)]
+        if len(sampled) < self.min_latency_hosts:
+            return
+        median = statistics.median(e.ewma for e in sampled)
+        for endpoint in sampled:
+            if endpoint.ewma > median * self.latency_factor:
+                self.eject(endpoint, "latency")
+
+    async def _probe_forever(self, endpoint: Endpoint, check: dict) -> None:
+        interval = check.get("interval", 5.0)
+        jitter = check.get("jitter", 0.1)
+        # spread the first probes so upstreams aren't all hit at once
+        await asyncio.sleep(random.uniform(0, interval))
+        while True:
+            await self._probe(endpoint, check)
+            await asyncio.sleep(interval * random.uniform(1 - jitter, 1 + jitter))
+
+    async def _probe(self, endpoint: Endpoint, check: dict) -> None:
+        try:
+            client = self.client if self.pools is None else self.pools.client_for(endpoint)
+            response = await client.get(endpoint.base_url + check.get("path", "/health"),
+                                        timeout=check.get("timeout", 1.0))
+            ok = 200 <= response.status_code < 400
+        except httpx.HTTPError as e:
+            logger.info(f"Health check to {endpoint.host} failed: {e}")
+            ok = False
+
+        # streak > 0 counts passes, < 0 counts failures
+        streak = self._probe_streak.get(endpoint, 0)
+        streak = max(streak, 0) + 1 if ok else min(streak, 0) - 1
+        self._probe_streak[endpoint] = streak
+        if endpoint.healthy and -streak >= check.get("unhealthy_threshold", 2):
+            endpoint.healthy = False
+            UPSTREAM_EJECTIONS.labels(upstream=endpoint.host, reason="health_check").inc()
+            UPSTREAM_AVAILABLE.labels(upstream=endpoint.host).set(0)
+            logger.warning(f"Upstream {endpoint.host} failed health checks")
+        elif not endpoint.healthy and streak >= check.get("healthy_threshold", 1):
+            endpoint.healthy = True
+            UPSTREAM_AVAILABLE.labels(upstream=endpoint.host).set(1)
+            logger.info(f"Upstream {endpoint.host} is healthy again")
@@ -0,0 +1,79 @@
+from collections import deque
+from typing import Optional
+from .retry_policy import RetryBudget, IDEMPOTENT_METHODS
+
+_BUDGET_KEY = "hedge"
+
+
+class HedgePolicy:
+    """
+    Per-route request hedging: when an attempt has not produced response
+    headers after `delay` seconds, a second copy goes to another endpoint
+    and whichever answers first is used.
+
+    `delay` is a number of seconds, or "p95" to follow the 95th percentile
+    of the route's recent time-to-headers (no hedging until `min_samples`
+    have been seen). Hedges draw from a token bucket refilled by
+    `budget_ratio` per request, so they add at most that share of load.
+    """
+
+    __slots__ = ("static_delay", "quantile", "min_delay", "min_samples", "methods",
+                 "budget", "_samples", "_since_update", "_delay")
+
+    def __init__(
+        self,
+        delay: float | str = "p95",
+        min_delay: float = 0.005,
+        budget_ratio: float = 0.1,
+        min_per_second: float = 1.0,
+        min_samples: int = 20,
+        window: int = 512,
+        methods: Optional[list[str]] = None,
+    ) -> None:
+        if isinstance(delay, str):
+            if not (delay.startswith("p") and delay[1:].isdigit()):
+                raise ValueError(f"Hedge delay must be seconds or a percentile like 'p95', not {delay!r}")
+            self.static_delay = None
+            self.quantile = int(delay[1:]) / 100
+        else:
+            self.static_delay = delay
+            self.quantile = None
+        self.min_delay = min_delay
+        self.min_samples = min_samples
+        self.methods = IDEMPOTENT_METHODS if methods is None else frozenset(
+            m.upper() for m in methods)
+        self.budget = RetryBudget(ratio=budget_ratio, min_per_second=min_per_second)
+        self._samples: deque[float] = deque(maxlen=window)
+        self._since_update = 0
+        self._delay: Optional[float] = None
+
+    @classmethod
+    def from_config(cls, config: Optional[dict]) -> "Optional[HedgePolicy]":
+        return cls(**config) if config else None
+
+    def applies(self, method: str) -> bool:
+        return method.upper() in self.methods
+
+    def delay(self) -> Optional[float]:
+        # None: not enough data to hedge yet
+        if self.static_delay is not None:
+            return self.static_delay
+        return self._delay
+
+    def observe(self, latency: float) -> None:
+        if self.quantile is None:
+            return
+        self._samples.append(latency)
+        self._since_update += 1
+        # re-sorting the window on every request would cost more than it saves
+        if len(self._samples) >= self.min_samples and self._since_update >= self.min_samples:
+            self._since_update = 0
+            ordered = sorted(self._samples)
+            value = ordered[min(len(ordered) - 1, int(len(ordered) * self.quantile))]
+            self._delay = max(self.min_delay, value)
+
+    def deposit(self) -> None:
+        self.budget.deposit(_BUDGET_KEY)
+
+    def try_acquire(self) -> bool:
+        return self.budget.withdraw(_BUDGET_KEY)
@@ -1,34 +1,121 @@
 import time
+import math
+import asyncio
+import logging
+from collections import OrderedDict
+from typing import Optional
+from app.core.rate_limit_decision import RateLimitDecision
+
+logger = logging.getLogger(__name__)
+
+_EPSILON = 1e-9
+
 
 class InMemoryRateLimiter:
-    def __init__(self, limit: int, window_ms: int = 10000):
+    """
+    In-process GCRA limiter on the monotonic clock, the same algorithm the
+    Redis script runs. Each identity costs one float (its theoretical arrival
+    time) in a sharded LRU. An entry whose arrival time has passed is
+    equivalent to a full bucket, so dropping it loses nothing; that is what
+    the background sweeper removes. `max_entries` is a hard cap enforced on
+    insert, so memory stays bounded under a high-cardinality flood (the
+    least recently seen identity is evicted first).
+    """
+
+    def __init__(
+        self,
+        limit: int,
+        window_ms: int = 10000,
+        max_entries: int = 100_000,
+        shards: int = 16,
+        sweep_interval: float = 1.0,
+        sweep_batch: int = 256,
+    ):
         self.limit = limit
-        self.window = window_ms
-        self.buckets = {}  # identity -> [start_time, count]
+        self.window_ms = window_ms
+        self.max_entries = max_entries
+        self.sweep_interval = sweep_interval
+        self.sweep_batch = sweep_batch
+        self._window = window_ms / 1000
+        self._interval = self._window / limit
+        self._shards: list[OrderedDict[str, float]] = [OrderedDict() for _ in range(shards)]
+        self._shard_budget = max(1, max_entries // shards)
+        self._sweeper: Optional[asyncio.Task] = None
+
+    def __len__(self) -> int:
+        return sum(len(shard) for shard in self._shards)
 
-    async def allow(self, identity: str) -> bool:
-        now = int(time.time())
-        bucket = self.buckets.get(identity)
+    async def acquire(
+        self,
+        identity: str,
+        cost: int = 1,
+        limit: Optional[int] = None,
+        window_ms: Optional[int] = None
+    ) -> RateLimitDecision:
+        if self._sweeper is None and self.sweep_interval:
+            self._sweeper = asyncio.get_running_loop().create_task(self._sweep_forever())
 
-        if not bucket or now - bucket[0] >= self.window:
-            self.buckets[identity] = [now, 1]
-            return True, self.retry_after(identity)
+        limit = limit or self.limit
+        window = window_ms / 1000 if window_ms else self._window
+        interval = window / limit
 
-        if bucket[1] < self.limit:
-            bucket[1] += 1
-            return True, self.retry_after(identity)
+        now = time.monotonic()
+        shard = self._shards[hash(identity) % len(self._shards)]
+        tat = shard.get(identity)
+        if tat is None or tat < now:
+            tat = now
 
-        return False, self.retry_after(identity)
+        new_tat = tat + interval * cost
+        allow_at = new_tat - window
+        if allow_at > now + _EPSILON:
+            remaining = max(0, int((window - (tat - now)) / interval + _EPSILON))
+            return RateLimitDecision(False, limit, remaining, math.ceil(allow_at - now))
+
+        if cost:
+            if identity not in shard and len(shard) >= self._shard_budget:
+                shard.popitem(last=False)
+            shard[identity] = new_tat
+            shard.move_to_end(identity)
+        remaining = int((window - (new_tat - now)) / interval + _EPSILON)
+        return RateLimitDecision(True, limit, remaining, 0)
+
+    async def allow(self, identity: str) -> tuple[bool, Optional[int]]:
+        decision = await self.acquire(identity)
+        return decision.allowed, decision.retry_after
 
     def retry_after(self, identity: str) -> int:
-        bucket = self.buckets.get(identity)
-        if not bucket:
+        tat = self._shards[hash(identity) % len(self._shards)].get(identity)
+        if tat is None:
             return 0
-        return max(0, self.window - (int(time.time()) - bucket[0]))
+        return max(0, math.ceil(tat + self._interval - self._window - time.monotonic()))
 
     async def remaining(self, identity: str) -> int:
-        bucket = self.buckets.get(identity)
-        if not bucket:
-            return self.limit
-        return max(0, self.limit - bucket[1])
+        return (await self.acquire(identity, cost=0)).remaining
+
+    async def sweep(self) -> int:
+        # One incremental pass: drop up to sweep_batch expired entries from the
+        # cold end of each shard, yielding to the event loop between shards.
+        removed = 0
+        for shard in self._shards:
+            now = time.monotonic()
+            for _ in range(min(self.sweep_batch, len(shard))):
+                identity, tat = next(iter(shard.items()))
+                if tat > now:
+                    break
+                del shard[identity]
+                removed += 1
+            await asyncio.sleep(0)
+        return removed
+
+    async def _sweep_forever(self) -> None:
+        while True:
+            await asyncio.sleep(self.sweep_interval)
+            try:
+                await self.sweep()
+            except Exception as e:
+                logger.error(f"Rate limiter sweep failed: {e}")
 
+    async def aclose(self) -> None:
+        if self._sweeper is not None:
+            self._sweeper.cancel()
+            self._sweeper = None
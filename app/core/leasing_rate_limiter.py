@@ -0,0 +1,155 @@
+import time
+import asyncio
+import logging
+from collections import OrderedDict
+from typing import Optional
+from app.core.rate_limit_decision import RateLimitDecision
+from app.core.redis_rate_limiter import RedisRateLimiter
+
+logger = logging.getLogger(__name__)
+
+
+class _Lease:
+    __slots__ = ("tokens", "remote_remaining", "expires_at", "refill", "limit", "window_ms")
+
+    def __init__(
+        self,
+        tokens: int,
+        remote_remaining: int,
+        expires_at: float,
+        limit: int,
+        window_ms: Optional[int]
+    ) -> None:
+        self.tokens = tokens
+        self.remote_remaining = remote_remaining
+        self.expires_at = expires_at
+        self.refill: Optional[asyncio.Task] = None
+        self.limit = limit
+        self.window_ms = window_ms
+
+
+class LeasingRateLimiter:
+    """
+    Hybrid limiter: leases batches of `lease_size` tokens per identity from
+    Redis and spends them in process, so a hot key costs one Redis call per
+    lease instead of one per request. A refill is started in the background
+    once a lease drops to `low_water`; unused tokens go back to Redis when a
+    lease expires or is evicted.
+
+    Accuracy trade-off: each process may hold up to `lease_size` tokens it
+    has not spent yet, so keep lease_size well below limit / processes.
+    """
+
+    def __init__(
+        self,
+        limiter: RedisRateLimiter,
+        lease_size: int = 10,
+        low_water: int = 2,
+        lease_ttl_ms: int = 1000,
+        max_leases: int = 10000,
+    ) -> None:
+        self.remote = limiter
+        self.limit = limiter.limit
+        self.window_ms = limiter.window_ms
+        self.lease_size = max(1, min(lease_size, limiter.limit))
+        self.low_water = min(low_water, self.lease_size - 1)
+        self.lease_ttl = lease_ttl_ms / 1000
+        self.max_leases = max_leases
+        self._leases: OrderedDict[str, _Lease] = OrderedDict()
+        self._background: set[asyncio.Task] = set()
+
+    async def acquire(
+        self,
+        identity: str,
+        limit: Optional[int] = None,
+        window_ms: Optional[int] = None
+    ) -> RateLimitDecision:
+        limit = limit or self.limit
+        now = time.monotonic()
+        lease = self._leases.get(identity)
+        if lease is not None and lease.expires_at <= now:
+            self._drop(identity)
+            lease = None
+
+        if lease is not None and lease.tokens <= 0 and lease.refill is not None:
+            await asyncio.shield(lease.refill)
+
+        if lease is None or lease.tokens <= 0:
+            lease, decision = await self._fetch(identity, lease, limit, window_ms)
+            if lease is None:
+                return decision
+
+        lease.tokens -= 1
+        self._leases.move_to_end(identity)
+        if lease.tokens <= self.low_water and lease.refill is None:
+            lease.refill = self._spawn(self._refill(identity, lease))
+        return RateLimitDecision(True, limit, lease.tokens + lease.remote_remaining, 0)
+
+    async def allow(self, identity: str) -> tuple[bool, Optional[int]]:
+        decision = await self.acquire(identity)
+        if not decision.allowed:
+            return False, decision.retry_after
+        return True, None
+
+    async def remaining(self, identity: str) -> int:
+        lease = self._leases.get(identity)
+        local = lease.tokens if lease is not None and lease.expires_at > time.monotonic() else 0
+        return local + await self.remote.remaining(identity)
+
+    async def aclose(self) -> None:
+        for identity in list(self._leases):
+            self._drop(identity)
+        if self._background:
+            await asyncio.gather(*self._background, return_exceptions=True)
+
+    async def _fetch(
+        self,
+        identity: str,
+        lease: Optional[_Lease],
+        limit: int,
+        window_ms: Optional[int]
+    ) -> tuple[Optional[_Lease], RateLimitDecision]:
+        size = max(1, min(self.lease_size, limit))
+        granted, decision = await self.remote.lease(identity, size, limit, window_ms)
+        if not granted:
+            return None, decision
+        expires_at = time.monotonic() + self.lease_ttl
+        if lease is None or self._leases.get(identity) is not lease:
+            lease = _Lease(granted, decision.remaining, expires_at, limit, window_ms)
+            self._leases[identity] = lease
+            if len(self._leases) > self.max_leases:
+                self._drop(next(iter(self._leases)))
+        else:
+            lease.tokens += granted
+            lease.remote_remaining = decision.remaining
+            lease.expires_at = expires_at
+        return lease, decision
+
+    async def _refill(self, identity: str, lease: _Lease) -> None:
+        try:
+            if self._leases.get(identity) is lease:
+                await self._fetch(identity, lease, lease.limit, lease.window_ms)
+        except Exception as e:
+            logger.error(f"Lease refill failed for {identity}: {e}")
+        finally:
+            lease.refill = None
+
+    def _drop(self, identity: str) -> None:
+        lease = self._leases.pop(identity)
+        if lease.refill is not None:
+            lease.refill.cancel()
+        if lease.tokens > 0:
+            self._spawn(self._release(identity, lease, lease.tokens))
+            lease.tokens = 0
+
+    async def _release(self, identity: str, lease: _Lease, tokens: int) -> None:
+        try:
+            await self.remote.release(identity, tokens, lease.limit, lease.window_ms)
+        except Exception as e:
+            logger.error(f"Returning {tokens} leased tokens for {identity} failed: {e}")
+
+    def _spawn(self, coro) -> asyncio.Task:
+        task = asyncio.get_running_loop().create_task(coro)
+        self._background.add(task)
+        task.add_done_callback(self._background.discard)
+        return task
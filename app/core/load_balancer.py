@@ -0,0 +1,214 @@
+import math
+import time
+import random
+import bisect
+import hashlib
+from typing import Collection, Optional
+from urllib.parse import urlsplit
+from starlette.types import Scope
+
+# latency memory of the peak-EWMA, in seconds
+EWMA_DECAY = 10.0
+# cost of an endpoint with no latency sample yet
+_COLD_LATENCY = 0.001
+
+
+# backends reached without TCP: "unix:/run/app.sock", "asgi:package.module:app"
+LOCAL_TRANSPORTS = ("unix", "asgi")
+
+
+def origin_of(url: str) -> str:
+    # what identifies an upstream: scheme://host:port, or the whole local address
+    if url.partition(":")[0] in LOCAL_TRANSPORTS:
+        return url
+    return "{0.scheme}://{0.netloc}".format(urlsplit(url))
+
+
+class Endpoint:
+    """
+    One upstream origin and the load the gateway currently puts on it.
+    Instances are shared by every route that lists the same URL, so
+    in-flight counts and latency reflect the upstream, not the route.
+
+    `transport` is "tcp", or "unix"/"asgi" for a co-located backend at
+    `address`; those have no network origin, so requests go to `base_url`.
+    """
+
+    __slots__ = ("url", "host", "origin", "base_url", "transport", "address",
+                 "in_flight", "ewma", "_stamp", "healthy", "ejected_until", "pool")
+
+    def __init__(self, url: str) -> None:
+        self.url = url
+        kind, _, address = url.partition(":")
+        if kind in LOCAL_TRANSPORTS:
+            if not address:
+                raise ValueError(f"Backend {url!r} has no address")
+            self.transport, self.address = kind, address
+            self.host = self.origin = url
+            self.base_url = "http://localhost"
+        else:
+            parts = urlsplit(url)
+            self.transport, self.address = "tcp", None
+            self.host = parts.netloc
+            self.origin = self.base_url = f"{parts.scheme}://{parts.netloc}"
+        self.in_flight = 0
+        self.ewma = 0.0
+        self._stamp = time.monotonic()
+        # maintained by HealthChecker: active probe verdict, passive ejection
+        self.healthy = True
+        self.ejected_until = 0.0
+        # upstream_pool.PoolConfig from a route's "pool" block; None uses the shared client
+        self.pool = None
+
+    def available(self, now: float) -> bool:
+        return self.healthy and self.ejected_until <= now
+
+    def state(self, now: float) -> str:
+        if self.ejected_until > now:
+            return "ejected"
+        return "healthy" if self.healthy else "unhealthy"
+
+    def observe(self, latency: float) -> None:
+        # peak-EWMA: jumps to a slow sample at once, decays back over EWMA_DECAY
+        now = time.monotonic()
+        weight = math.exp(-(now - self._stamp) / EWMA_DECAY)
+        self._stamp = now
+        if latency > self.ewma:
+            self.ewma = latency
+        else:
+            self.ewma = self.ewma * weight + latency * (1 - weight)
+
+    def cost(self) -> float:
+        return max(self.ewma, _COLD_LATENCY) * (self.in_flight + 1)
+
+    def __repr__(self) -> str:
+        return f"Endpoint({self.url!r}, in_flight={self.in_flight}, ewma={self.ewma:.4f})"
+
+
+class Balancer:
+    """
+    Picks an endpoint for one attempt. `exclude` holds endpoints that must
+    not be used (open circuit, already failed for this request); None is
+    returned when nothing is left.
+    """
+
+    def __init__(self, endpoints: list[Endpoint], weights: list[int]) -> None:
+        self.endpoints = endpoints
+        self.weights = weights
+
+    def pick(self, scope: Scope, exclude: Collection[Endpoint] = ()) -> Optional[Endpoint]:
+        if not exclude:
+            candidates = list(zip(self.endpoints, self.weights))
+        else:
+            candidates = [(e, w) for e, w in zip(self.endpoints, self.weights) if e not in exclude]
+        if not candidates:
+            return None
+        if len(candidates) == 1:
+            return candidates[0][0]
+        return self._choose(candidates, scope)
+
+    def _choose(self, candidates: list[tuple[Endpoint, int]], scope: Scope) -> Endpoint:
+        raise NotImplementedError
+
+
+class RoundRobinBalancer(Balancer):
+    # nginx's smooth weighted round-robin: weights are honoured without bursts
+    def __init__(self, endpoints: list[Endpoint], weights: list[int]) -> None:
+        super().__init__(endpoints, weights)
+        self._current = {endpoint: 0 for endpoint in endpoints}
+
+    def _choose(self, candidates: list[tuple[Endpoint, int]], scope: Scope) -> Endpoint:
+        total = 0
+        best = None
+        for endpoint, weight in candidates:
+            self._current[endpoint] += weight
+            total += weight
+            if best is None or self._current[endpoint] > self._current[best]:
+                best = endpoint
+        self._current[best] -= total
+        return best
+
+
+class LeastOutstandingBalancer(Balancer):
+    def _choose(self, candidates: list[tuple[Endpoint, int]], scope: Scope) -> Endpoint:
+        return min(candidates, key=lambda c: ((c[0].in_flight + 1) / c[1], random.random()))[0]
+
+
+class P2CBalancer(Balancer):
+    # power of two choices over latency-weighted load: O(1) per pick and
+    # avoids the herding a global "least loaded" choice causes
+    def _choose(self, candidates: list[tuple[Endpoint, int]], scope: Scope) -> Endpoint:
+        (a, wa), (b, wb) = random.sample(candidates, 2)
+        return a if a.cost() / wa <= b.cost() / wb else b
+
+
+class ConsistentHashBalancer(Balancer):
+    """
+    Ketama-style ring keyed on a request header, so the same key keeps
+    landing on the same upstream (cache affinity) and only ~1/N of keys
+    move when an endpoint is added or removed. Requests without the header
+    fall back to power of two choices.
+    """
+
+    def __init__(
+        self,
+        endpoints: list[Endpoint],
+        weights: list[int],
+        header: str,
+        replicas: int = 100
+    ) -> None:
+        super().__init__(endpoints, weights)
+        self.header = header.lower().encode()
+        ring = sorted(
+            (_hash(f"{endpoint.url}#{i}".encode()), endpoint)
+            for endpoint, weight in zip(endpoints, weights)
+            for i in range(replicas * weight)
+        )
+        self._points = [point for point, _ in ring]
+        self._owners = [endpoint for _, endpoint in ring]
+        self._fallback = P2CBalancer(endpoints, weights)
+
+    def _choose(self, candidates: list[tuple[Endpoint, int]], scope: Scope) -> Endpoint:
+        key = None
+        for name, value in scope.get("headers", []):
+            if name == self.header:
+                key = value
+                break
+        if key is None:
+            return self._fallback._choose(candidates, scope)
+
+        allowed = {endpoint for endpoint, _ in candidates}
+        start = bisect.bisect(self._points, _hash(key))
+        for i in range(len(self._owners)):
+            endpoint = self._owners[(start + i) % len(self._owners)]
+            if endpoint in allowed:
+                return endpoint
+        return candidates[0][0]
+
+
+def _hash(data: bytes) -> int:
+    return int.from_bytes(hashlib.blake2b(data, digest_size=8).digest(), "big")
+
+
+BALANCERS = {
+    "round_robin": RoundRobinBalancer,
+    "least_outstanding": LeastOutstandingBalancer,
+    "p2c_ewma": P2CBalancer,
+    "consistent_hash": ConsistentHashBalancer,
+}
+
+
+def build_balancer(
+    config: str | dict | None,
+    endpoints: list[Endpoint],
+    weights: list[int]
+) -> Balancer:
+    if config is None:
+        config = "p2c_ewma"
+    if isinstance(config, str):
+        config = {"type": config}
+    options = dict(config)
+    kind = options.pop("type")
+    if kind not in BALANCERS:
+        raise ValueError(f"Unknown balancer {kind!r}")
+    return BALANCERS[kind](endpoints, weights, **options)
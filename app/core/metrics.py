@@ -2,6 +2,7 @@ from prometheus_client import (
     Counter,
     Summary,
     Gauge,
+    Histogram,
     CollectorRegistry,
     generate_latest,
     CONTENT_TYPE_LATEST
@@ -36,6 +37,101 @@ RATE_LIMITED = Counter(
     registry=registry
 )
 
+DENY_CACHE_HITS = Counter(
+    "gateway_rate_limit_deny_cache_hits_total",
+    "Rate-limited requests rejected from the in-process deny cache",
+    registry=registry
+)
+
+DENY_CACHE_MISSES = Counter(
+    "gateway_rate_limit_deny_cache_misses_total",
+    "Rate limit checks that were not answered by the deny cache",
+    registry=registry
+)
+
+UPSTREAM_AVAILABLE = Gauge(
+    "gateway_upstream_available",
+    "1 if the upstream is in rotation, 0 if unhealthy or ejected",
+    ["upstream"],
+    registry=registry
+)
+
+UPSTREAM_EJECTIONS = Counter(
+    "gateway_upstream_ejections_total",
+    "Upstreams taken out of rotation by health checks or outlier detection",
+    ["upstream", "reason"],
+    registry=registry
+)
+
+RETRIES = Counter(
+    "gateway_retries_total",
+    "Retries the retry budget granted or denied",
+    ["route", "decision"],
+    registry=registry
+)
+
+HEDGES = Counter(
+    "gateway_hedged_requests_total",
+    "Hedge attempts sent, and how many of them answered first",
+    ["route", "outcome"],
+    registry=registry
+)
+
+ADMISSION_QUEUE_DEPTH = Gauge(
+    "gateway_admission_queue_depth",
+    "Requests waiting in the admission queue for a concurrency slot",
+    registry=registry
+)
+
+ADMISSION_WAIT = Histogram(
+    "gateway_admission_wait_seconds",
+    "Time requests spent in the admission queue",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5),
+    registry=registry
+)
+
+ADMISSION_SHED = Counter(
+    "gateway_admission_shed_total",
+    "Requests rejected by the admission queue",
+    ["reason"],
+    registry=registry
+)
+
+UPSTREAM_POOL_UTILIZATION = Gauge(
+    "gateway_upstream_pool_utilization",
+    "Share of an upstream's max_connections in use",
+    ["upstream"],
+    registry=registry
+)
+
+UPSTREAM_POOL_WAIT = Histogram(
+    "gateway_upstream_pool_wait_seconds",
+    "Time requests waited for a connection from an upstream's pool",
+    ["upstream"],
+    buckets=(0.0005, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1),
+    registry=registry
+)
+
+CACHE_REQUESTS = Counter(
+    "gateway_cache_requests_total",
+    "Response cache lookups by result (hit, stale, miss, bypass)",
+    ["route", "result"],
+    registry=registry
+)
+
+CACHE_BYTES = Gauge(
+    "gateway_cache_bytes",
+    "Bytes held by the response cache",
+    registry=registry
+)
+
+COALESCED = Counter(
+    "gateway_coalesced_requests_total",
+    "Requests answered by another request's in-flight upstream call",
+    ["route"],
+    registry=registry
+)
+
 
 def render_prometheus_metrics() -> tuple[bytes, str]:
     return generate_latest(registry), CONTENT_TYPE_LATEST
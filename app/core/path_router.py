@@ -1,22 +1,122 @@
 
 from typing import Optional
 from asyncio import Lock
+from collections import OrderedDict
 import time
+from .compiled_route import CompiledRoute, RouteCompiler
+
+_MISS = object()
+
+
+class _TrieNode:
+    __slots__ = ("children", "route")
+
+    def __init__(self) -> None:
+        self.children: dict[str, "_TrieNode"] = {}
+        self.route: Optional[CompiledRoute] = None
+
+
+def _segments(path: str) -> list[str]:
+    return [segment for segment in path.split("/") if segment]
+
+
+def _compile_trie(route_table: dict, compiler: RouteCompiler) -> _TrieNode:
+    root = _TrieNode()
+    for route_prefix, config in route_table.items():
+        # shorthand: "/api": "http://backend" means {"backend": "http://backend"}
+        if isinstance(config, str):
+            config = {"backend": config}
+        node = root
+        for segment in _segments(route_prefix):
+            child = node.children.get(segment)
+            if child is None:
+                child = node.children[segment] = _TrieNode()
+            node = child
+        if node.route is not None:
+            raise ValueError(
+                f"Route prefixes {node.route.prefix!r} and {route_prefix!r} match the same paths")
+        node.route = compiler.compile(route_prefix, config)
+    return root
+
 
 class PathRouter:
-    def __init__(self, route_table: dict[str, str]):
+    """
+    Longest-prefix router. Route prefixes are compiled into a trie keyed by
+    path segment, so "/api" matches "/api" and "/api/users" but never "/api-v2".
+    Each entry is compiled into a CompiledRoute once, at load or reload time.
+    """
+
+    def __init__(
+        self,
+        route_table: dict[str, dict],
+        cache_size: int = 0,
+        compiler: Optional[RouteCompiler] = None
+    ):
         self.route_table = route_table
+        self.cache_size = cache_size
+        self.compiler = compiler or RouteCompiler()
         self.last_reload = 0
         self.lock = Lock()
+        self._root = _compile_trie(route_table, self.compiler)
+        self._cache: OrderedDict[str, Optional[CompiledRoute]] = OrderedDict()
+
+    def use_compiler(self, compiler: RouteCompiler) -> None:
+        root = _compile_trie(self.route_table, compiler)
+        self.compiler = compiler
+        self._swap(root)
 
     def match(self, path: str) -> Optional[tuple[str, dict]]:
-        for route_prefix, config in self.route_table.items():
-            if path.startswith(route_prefix):
-                backend = config["backend"]
-                return backend, config
-        return None, None
+        route = self.resolve(path)
+        if route is None:
+            return None, None
+        return route.backend, route.config
+
+    def resolve(self, path: str) -> Optional[CompiledRoute]:
+        if self.cache_size:
+            cached = self._cache.get(path, _MISS)
+            if cached is not _MISS:
+                self._cache.move_to_end(path)
+                return cached
+
+        route = self._lookup(path)
+
+        if self.cache_size:
+            self._cache[path] = route
+            if len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return route
+
+    def routes(self) -> list[CompiledRoute]:
+        found = []
+        stack = [self._root]
+        while stack:
+            node = stack.pop()
+            if node.route is not None:
+                found.append(node.route)
+            stack.extend(node.children.values())
+        return found
+
+    def _lookup(self, path: str) -> Optional[CompiledRoute]:
+        node = self._root
+        best = node.route
+        for segment in path.split("/"):
+            if not segment:
+                continue
+            node = node.children.get(segment)
+            if node is None:
+                break
+            if node.route is not None:
+                best = node.route
+        return best
+
+    def _swap(self, root: _TrieNode) -> None:
+        # swap the compiled snapshot in one step; resolve() never awaits
+        self._root = root
+        self._cache = OrderedDict()
 
     async def update_route_table(self, new_routes: dict):
         async with self.lock:
+            root = _compile_trie(new_routes, self.compiler)
             self.route_table = new_routes
+            self._swap(root)
             self.last_reload = time.time()
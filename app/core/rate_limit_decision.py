@@ -0,0 +1,8 @@
+from typing import NamedTuple
+
+
+class RateLimitDecision(NamedTuple):
+    allowed: bool
+    limit: int
+    remaining: int
+    retry_after: int  # seconds until the next request would be allowed
@@ -1,46 +1,73 @@
+from typing import Optional
 from starlette.responses import PlainTextResponse
 from starlette.types import ASGIApp, Scope, Receive, Send
+from app.core.metrics import RATE_LIMITED
+from app.core.path_router import PathRouter
+from app.core.rate_limit_policy import RateLimitPolicy
 from app.core.redis_rate_limiter import RedisRateLimiter
 from app.core.inmemory_rate_limiter import InMemoryRateLimiter
+from app.core.leasing_rate_limiter import LeasingRateLimiter
+from app.core.shm_rate_limiter import SharedMemoryRateLimiter
+
+Limiter = RedisRateLimiter | InMemoryRateLimiter | LeasingRateLimiter | SharedMemoryRateLimiter
+
+# identities for paths that match no route share one bucket per client
+UNROUTED = "*"
+
 
 class RateLimitMiddleware:
-    def __init__(self, app: ASGIApp, limiter: RedisRateLimiter | InMemoryRateLimiter):
+    def __init__(
+        self,
+        app: ASGIApp,
+        limiter: Limiter,
+        path_router: Optional[PathRouter] = None,
+        key: str = "ip"
+    ):
         self.app = app
         self.limiter = limiter
+        self.path_router = path_router
+        # applies to routes without a rate_limit block of their own
+        self.default_policy = RateLimitPolicy(limiter.limit, limiter.window_ms, key)
 
     async def __call__(self, scope: Scope, receive: Receive, send: Send):
         if scope["type"] != "http":
             await self.app(scope, receive, send)
             return
 
-        path = scope.get("path", "/")
-        client = scope.get("client")
-        ip = client[0] if client else "unknown"
-        identity = f"{ip}:{path}"
-
-        limit = self.limiter.limit
-        remaining = await self.limiter.remaining(identity)
+        prefix, policy = UNROUTED, self.default_policy
+        if self.path_router is not None:
+            route = self.path_router.resolve(scope.get("path", "/"))
+            if route is not None:
+                prefix = route.prefix
+                if route.rate_limit is False:
+                    await self.app(scope, receive, send)
+                    return
+                if route.rate_limit is not None:
+                    policy = route.rate_limit
 
-        headers = {
-            "RateLimit-Limit": str(limit),
-            "RateLimit-Remaining": str(remaining),
-        }
+        # one limiter call gives the decision and the header values
+        decision = await self.limiter.acquire(
+            policy.identity(scope, prefix), limit=policy.limit, window_ms=policy.window_ms
+        )
+        limit = str(decision.limit).encode()
+        remaining = str(decision.remaining).encode()
 
-        allowed, retry_after = await self.limiter.allow(identity)
-        if not allowed:
-            headers["Retry-After"] = str(retry_after)
+        if not decision.allowed:
+            RATE_LIMITED.labels(route=prefix).inc()
+            headers = {
+                "RateLimit-Limit": limit.decode(),
+                "RateLimit-Remaining": remaining.decode(),
+                "Retry-After": str(decision.retry_after),
+            }
             response = PlainTextResponse("Too Many Requests", status_code=429, headers=headers)
             await response(scope, receive, send)
             return
 
         async def send_with_headers(message):
             if message["type"] == "http.response.start":
-                message.setdefault("headers", [])
-                def add_header(name, value):
-                    message["headers"].append((name.encode(), value.encode()))
-                add_header("RateLimit-Limit", str(limit))
-                remaining = await self.limiter.remaining(identity)
-                add_header("RateLimit-Remaining", str(remaining))
+                headers = message.setdefault("headers", [])
+                headers.append((b"ratelimit-limit", limit))
+                headers.append((b"ratelimit-remaining", remaining))
             await send(message)
 
         await self.app(scope, receive, send_with_headers)
@@ -0,0 +1,46 @@
+from typing import Optional
+from starlette.types import Scope
+
+
+class RateLimitPolicy:
+    """
+    A route's rate limit: `limit` requests per `window_ms`, counted per key.
+    The key is the client IP ("ip"), a request header ("header:x-api-key",
+    falling back to the IP when absent) or the route itself ("route"), and
+    is always scoped by the route prefix, never by the raw request path.
+    """
+
+    __slots__ = ("limit", "window_ms", "key", "_header")
+
+    def __init__(self, limit: int, window_ms: int = 10000, key: str = "ip") -> None:
+        if key not in ("ip", "route") and not key.startswith("header:"):
+            raise ValueError(f"Unknown rate limit key {key!r}")
+        self.limit = limit
+        self.window_ms = window_ms
+        self.key = key
+        self._header = key[len("header:"):].lower().encode() if key.startswith("header:") else None
+
+    @classmethod
+    def from_config(cls, config: dict | bool | None) -> "Optional[RateLimitPolicy | bool]":
+        # None: use the gateway default; False: route is not rate limited
+        if config is None or config is False:
+            return config
+        return cls(
+            limit=config["limit"],
+            window_ms=config.get("window_ms", 10000),
+            key=config.get("key", "ip"),
+        )
+
+    def identity(self, scope: Scope, route_prefix: str) -> str:
+        if self.key == "route":
+            return f"rl:{route_prefix}"
+        if self._header is not None:
+            for name, value in scope.get("headers", []):
+                if name == self._header:
+                    return f"rl:{route_prefix}:key:{value.decode('latin-1')}"
+        client = scope.get("client")
+        ip = client[0] if client else "unknown"
+        return f"rl:{route_prefix}:ip:{ip}"
+
+    def describe(self) -> dict:
+        return {"limit": self.limit, "window_ms": self.window_ms, "key": self.key}
@@ -1,60 +1,153 @@
-import time
+import math
+import hashlib
 import redis.asyncio as redis
+from redis.exceptions import NoScriptError
 from typing import Optional
+from app.core.rate_limit_decision import RateLimitDecision
+from app.core.deny_cache import DenyCache
 
 
+# GCRA: a single "theoretical arrival time" per key replaces the per-request
+# sorted-set log, so memory is O(1) per identity and one EVALSHA returns the
+# decision, the remaining quota and the retry-after together.
 LUA_SCRIPT = """
 local key = KEYS[1]
-local now = tonumber(ARGV[1])
+local limit = tonumber(ARGV[1])
 local window = tonumber(ARGV[2])
-local limit = tonumber(ARGV[3])
+local cost = tonumber(ARGV[3])
+local partial = tonumber(ARGV[4] or "0")
 
--- cleanup old requests
-redis.call("ZREMRANGEBYSCORE", key, "-inf", now - window)
+local time = redis.call("TIME")
+local now = tonumber(time[1]) * 1000 + math.floor(tonumber(time[2]) / 1000)
+local interval = window / limit
 
--- count active
-local count = redis.call("ZCARD", key)
-if count >= limit then
-  local ttl = redis.call("PTTL", key)
-  return ttl
+local tat = tonumber(redis.call("GET", key))
+if not tat or tat < now then
+  tat = now
 end
 
--- add current request
-redis.call("ZADD", key, now, now)
-redis.call("PEXPIRE", key, window)
-return 0
+local available = math.max(math.floor((window - (tat - now)) / interval + 1e-6), 0)
+if partial == 1 and cost > available then
+  if available == 0 then
+    return {0, 0, math.ceil(tat + interval - window - now), 0}
+  end
+  cost = available
+end
+
+-- a negative cost returns unused tokens, never past a full bucket
+local new_tat = math.max(tat + interval * cost, now)
+local allow_at = new_tat - window
+if allow_at > now then
+  return {0, available, math.ceil(allow_at - now), 0}
+end
+
+if cost ~= 0 then
+  if new_tat > now then
+    redis.call("SET", key, tostring(new_tat), "PX", math.ceil(new_tat - now))
+  else
+    redis.call("DEL", key)
+  end
+end
+return {1, math.floor((window - (new_tat - now)) / interval + 1e-6), 0, cost}
 """
 
 class RedisRateLimiter:
-    def __init__(self, redis_client: redis.Redis, limit: int, window_ms: int = 10000):
+    def __init__(
+        self,
+        redis_client: redis.Redis,
+        limit: int,
+        window_ms: int = 10000,
+        deny_cache_size: int = 10000
+    ):
         self.redis = redis_client
         self.limit = limit
         self.window_ms = window_ms
-        self.script_sha = None
-
-    async def _now(self) -> int:
-        return int(time.time() * 1000)
+        self.deny_cache = DenyCache(deny_cache_size)
+        # EVALSHA with the locally computed digest; the script is only loaded
+        # (an extra round trip) when Redis answers NOSCRIPT.
+        self.script_sha = hashlib.sha1(LUA_SCRIPT.encode()).hexdigest()
 
     async def load_script(self):
-        if not self.script_sha:
-            self.script_sha = await self.redis.script_load(LUA_SCRIPT)
+        self.script_sha = await self.redis.script_load(LUA_SCRIPT)
 
-    async def allow(self, identity: str) -> tuple[bool, Optional[int]]:
-        await self.load_script()
-        now = await self._now()
+    async def _eval(
+        self,
+        identity: str,
+        cost: int,
+        partial: bool = False,
+        limit: Optional[int] = None,
+        window_ms: Optional[int] = None
+    ) -> list:
+        args = (self.script_sha, 1, identity, limit or self.limit, window_ms or self.window_ms,
+                cost, int(partial))
         try:
-            ttl = await self.redis.evalsha(self.script_sha,1,identity,now,
-                                            self.window_ms, self.limit)
-            if int(ttl) > 0:
-                return False, int(ttl / 1000)
-            return True, None
-        except redis.ResponseError as e:
-            if "NOSCRIPT" in str(e):
-                self.script_sha = None
-                return await self.allow(identity)
-            raise
+            return await self.redis.evalsha(*args)
+        except NoScriptError:
+            await self.load_script()
+            return await self.redis.evalsha(*args)
+
+    async def acquire(
+        self,
+        identity: str,
+        cost: int = 1,
+        limit: Optional[int] = None,
+        window_ms: Optional[int] = None
+    ) -> RateLimitDecision:
+        limit = limit or self.limit
+        if cost > 0:
+            denied = self._cached_denial(identity, limit)
+            if denied:
+                return denied
+        result = await self._eval(identity, cost, limit=limit, window_ms=window_ms)
+        allowed, remaining, retry_after_ms = (int(x) for x in result[:3])
+        if not allowed:
+            self.deny_cache.deny(identity, retry_after_ms / 1000)
+        return RateLimitDecision(bool(allowed), limit, remaining,
+                                 math.ceil(retry_after_ms / 1000))
+
+    async def lease(
+        self,
+        identity: str,
+        tokens: int,
+        limit: Optional[int] = None,
+        window_ms: Optional[int] = None
+    ) -> tuple[int, RateLimitDecision]:
+        # Takes up to `tokens` at once; returns how many were granted.
+        limit = limit or self.limit
+        denied = self._cached_denial(identity, limit)
+        if denied:
+            return 0, denied
+        result = await self._eval(identity, tokens, partial=True, limit=limit, window_ms=window_ms)
+        allowed, remaining, retry_after_ms, granted = (int(x) for x in result)
+        if not granted:
+            self.deny_cache.deny(identity, retry_after_ms / 1000)
+        decision = RateLimitDecision(granted > 0, limit, remaining,
+                                     math.ceil(retry_after_ms / 1000))
+        return granted, decision
+
+    def _cached_denial(self, identity: str, limit: int) -> Optional[RateLimitDecision]:
+        retry_after = self.deny_cache.retry_after(identity)
+        if retry_after is None:
+            return None
+        return RateLimitDecision(False, limit, 0, math.ceil(retry_after))
+
+    async def release(
+        self,
+        identity: str,
+        tokens: int,
+        limit: Optional[int] = None,
+        window_ms: Optional[int] = None
+    ) -> None:
+        if tokens > 0:
+            await self._eval(identity, -tokens, limit=limit, window_ms=window_ms)
+            self.deny_cache.forget(identity)
+
+    async def allow(self, identity: str) -> tuple[bool, Optional[int]]:
+        decision = await self.acquire(identity)
+        if not decision.allowed:
+            return False, decision.retry_after
+        return True, None
 
     async def remaining(self, identity: str) -> int:
-        now = await self._now()
-        await self.redis.zremrangebyscore(identity, "-inf", now - self.window_ms)
-        return max(0, self.limit - await self.redis.zcard(identity))
+        # cost 0 reads the bucket without consuming from it
+        return (await self.acquire(identity, cost=0)).remaining
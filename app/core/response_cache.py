@@ -0,0 +1,278 @@
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Optional
+from starlette.types import Scope
+from app.core.metrics import CACHE_REQUESTS, CACHE_BYTES
+
+# statuses a shared cache may store without explicit freshness (RFC 9110 15.1)
+CACHEABLE_STATUSES = frozenset({200, 203, 204, 300, 301, 308, 404, 405, 410, 414, 501})
+# bookkeeping per stored response, so tiny bodies still count against the budget
+_ENTRY_OVERHEAD = 256
+
+
+def parse_cache_control(value: Optional[str]) -> dict[str, Optional[str]]:
+    directives: dict[str, Optional[str]] = {}
+    if not value:
+        return directives
+    for part in value.split(","):
+        name, _, arg = part.strip().partition("=")
+        if name:
+            directives[name.lower()] = arg.strip('"') if arg else None
+    return directives
+
+
+def _seconds(value: Optional[str]) -> Optional[int]:
+    try:
+        return max(0, int(value))
+    except (TypeError, ValueError):
+        return None
+
+
+def _http_date(value: Optional[str]) -> Optional[datetime]:
+    try:
+        parsed = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+
+class CachePolicy:
+    """
+    A route's "cache" block. Upstream Cache-Control / Expires decide how
+    long a response stays fresh; `ttl` only applies to responses that say
+    nothing either way. Stale responses may be served for
+    `stale_while_revalidate` seconds while one background request refreshes
+    them, or for `stale_if_error` seconds when the upstream fails; the
+    upstream's own directives of the same name take precedence.
+    """
+
+    __slots__ = ("ttl", "max_entry_bytes", "stale_while_revalidate", "stale_if_error")
+
+    def __init__(
+        self,
+        ttl: float = 0,
+        max_entry_bytes: int = 1024 * 1024,
+        stale_while_revalidate: float = 0,
+        stale_if_error: float = 0,
+    ) -> None:
+        self.ttl = ttl
+        self.max_entry_bytes = max_entry_bytes
+        self.stale_while_revalidate = stale_while_revalidate
+        self.stale_if_error = stale_if_error
+
+    @classmethod
+    def from_config(cls, config: Optional[dict | bool]) -> "Optional[CachePolicy]":
+        if not config:
+            return None
+        return cls() if config is True else cls(**config)
+
+
+class CachedResponse:
+    __slots__ = ("status", "headers", "body", "size", "stored_at", "initial_age",
+                 "fresh_until", "revalidate_until", "error_until")
+
+    def __init__(
+        self,
+        status: int,
+        headers: list[tuple[bytes, bytes]],
+        body: bytes,
+        now: float,
+        initial_age: int,
+        ttl: float,
+        stale_while_revalidate: float,
+        stale_if_error: float,
+    ) -> None:
+        self.status = status
+        self.headers = headers
+        self.body = body
+        self.size = len(body) + sum(len(k) + len(v) for k, v in headers) + _ENTRY_OVERHEAD
+        self.stored_at = now
+        self.initial_age = initial_age
+        self.fresh_until = now + ttl
+        self.revalidate_until = self.fresh_until + stale_while_revalidate
+        self.error_until = self.fresh_until + stale_if_error
+
+    def age(self, now: float) -> int:
+        return self.initial_age + int(now - self.stored_at)
+
+    def fresh(self, now: float) -> bool:
+        return now < self.fresh_until
+
+    def expired(self, now: float) -> bool:
+        # nothing left it can be served for
+        return now >= self.revalidate_until and now >= self.error_until
+
+
+class _Variants:
+    # all stored responses for one URL, told apart by the request headers its Vary names
+    __slots__ = ("vary", "responses", "size")
+
+    def __init__(self, vary: tuple[bytes, ...]) -> None:
+        self.vary = vary
+        self.responses: dict[tuple[bytes, ...], CachedResponse] = {}
+        self.size = 0
+
+
+class ResponseCache:
+    """
+    Shared in-memory cache for routes with a "cache" block, keyed by route
+    prefix and target. Only GET responses with a known Content-Length are
+    stored; the total size is kept under `max_bytes` by evicting the least
+    recently used URLs.
+    """
+
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024) -> None:
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._entries: OrderedDict[tuple[str, str], _Variants] = OrderedDict()
+        self._refreshing: set[tuple[str, str]] = set()
+        self.results: dict[str, int] = {}
+
+    @staticmethod
+    def request_mode(scope: Scope) -> Optional[str]:
+        # "use" the cache, "refresh" it (client sent no-cache), or None to bypass
+        headers = dict(scope.get("headers", []))
+        if b"authorization" in headers:
+            return None
+        directives = parse_cache_control(headers.get(b"cache-control", b"").decode("latin-1"))
+        if "no-store" in directives:
+            return None
+        if "no-cache" in directives or headers.get(b"pragma") == b"no-cache":
+            return "refresh"
+        return "use"
+
+    def get(self, prefix: str, target: str, scope: Scope) -> Optional[CachedResponse]:
+        key = (prefix, target)
+        variants = self._entries.get(key)
+        if variants is None:
+            return None
+        response = variants.responses.get(self._vary_values(variants.vary, scope))
+        if response is None:
+            return None
+        if response.expired(time.monotonic()):
+            return None
+        self._entries.move_to_end(key)
+        return response
+
+    def storable(self, policy: CachePolicy, status: int, headers) -> bool:
+        # a cheap check on the response headers before its body is read
+        if status not in CACHEABLE_STATUSES or "set-cookie" in headers:
+            return False
+        if headers.get("vary", "").strip() == "*":
+            return False
+        directives = parse_cache_control(headers.get("cache-control"))
+        if {"no-store", "no-cache", "private"} & directives.keys():
+            return False
+        length = _seconds(headers.get("content-length"))
+        return length is not None and length <= policy.max_entry_bytes
+
+    def store(
+        self,
+        prefix: str,
+        target: str,
+        scope: Scope,
+        policy: CachePolicy,
+        status: int,
+        headers,
+        raw_headers: list[tuple[bytes, bytes]],
+        body: bytes,
+    ) -> Optional[CachedResponse]:
+        directives = parse_cache_control(headers.get("cache-control"))
+        ttl = _seconds(directives.get("s-maxage"))
+        if ttl is None:
+            ttl = _seconds(directives.get("max-age"))
+        if ttl is None and "expires" in headers:
+            expires = _http_date(headers["expires"])
+            date = _http_date(headers.get("date")) or datetime.now(timezone.utc)
+            ttl = max(0.0, (expires - date).total_seconds()) if expires else 0
+        if ttl is None:
+            ttl = policy.ttl
+        initial_age = _seconds(headers.get("age")) or 0
+        revalidate = _seconds(directives.get("stale-while-revalidate"))
+        error = _seconds(directives.get("stale-if-error"))
+
+        now = time.monotonic()
+        response = CachedResponse(
+            status,
+            [(k, v) for k, v in raw_headers if k != b"age"],
+            body,
+            now,
+            initial_age,
+            ttl - initial_age,
+            policy.stale_while_revalidate if revalidate is None else revalidate,
+            policy.stale_if_error if error is None else error,
+        )
+        if response.expired(now) or response.size > self.max_bytes:
+            return None
+
+        vary = tuple(sorted({
+            name.strip().lower().encode("latin-1")
+            for name in headers.get("vary", "").split(",") if name.strip()
+        }))
+        key = (prefix, target)
+        variants = self._entries.get(key)
+        if variants is None or variants.vary != vary:
+            self._remove(key)
+            variants = self._entries[key] = _Variants(vary)
+        values = self._vary_values(vary, scope)
+        previous = variants.responses.get(values)
+        if previous is not None:
+            variants.size -= previous.size
+            self.size -= previous.size
+        variants.responses[values] = response
+        variants.size += response.size
+        self.size += response.size
+        self._entries.move_to_end(key)
+
+        while self.size > self.max_bytes:
+            self._remove(next(iter(self._entries)))
+        CACHE_BYTES.set(self.size)
+        return response
+
+    def begin_refresh(self, prefix: str, target: str) -> bool:
+        # only one background refresh per URL at a time
+        key = (prefix, target)
+        if key in self._refreshing:
+            return False
+        self._refreshing.add(key)
+        return True
+
+    def end_refresh(self, prefix: str, target: str) -> None:
+        self._refreshing.discard((prefix, target))
+
+    def purge(self, prefix: Optional[str] = None) -> int:
+        keys = [key for key in self._entries if prefix is None or key[0] == prefix]
+        for key in keys:
+            self._remove(key)
+        CACHE_BYTES.set(self.size)
+        return len(keys)
+
+    def record(self, prefix: str, result: str) -> None:
+        # result: "hit", "stale" (served stale), "miss" or "bypass"
+        self.results[result] = self.results.get(result, 0) + 1
+        CACHE_REQUESTS.labels(route=prefix, result=result).inc()
+
+    def stats(self) -> dict:
+        served = self.results.get("hit", 0) + self.results.get("stale", 0)
+        lookups = served + self.results.get("miss", 0)
+        return {
+            "entries": len(self._entries),
+            "bytes": self.size,
+            "max_bytes": self.max_bytes,
+            "hit_ratio": served / lookups if lookups else 0.0,
+            **self.results,
+        }
+
+    def _remove(self, key: tuple[str, str]) -> None:
+        variants = self._entries.pop(key, None)
+        if variants is not None:
+            self.size -= variants.size
+
+    @staticmethod
+    def _vary_values(vary: tuple[bytes, ...], scope: Scope) -> tuple[bytes, ...]:
+        if not vary:
+            return ()
+        headers = dict(scope.get("headers", []))
+        return tuple(headers.get(name, b"") for name in vary)
@@ -0,0 +1,117 @@
+import time
+import random
+from typing import Iterable, Optional
+import httpx
+
+IDEMPOTENT_METHODS = frozenset({"GET", "HEAD", "OPTIONS", "TRACE", "PUT", "DELETE"})
+RETRYABLE_STATUSES = frozenset({500, 502, 503, 504})
+
+# names usable in a route's retry_policy "exceptions" list
+RETRYABLE_ERRORS: dict[str, type[httpx.RequestError]] = {
+    "connect": httpx.ConnectError,
+    "connect_timeout": httpx.ConnectTimeout,
+    "timeout": httpx.TimeoutException,
+    "read": httpx.ReadError,
+    "write": httpx.WriteError,
+    "protocol": httpx.RemoteProtocolError,
+    "any": httpx.RequestError,
+}
+
+
+class RetryBudget:
+    """
+    Per-upstream token buckets that cap retries at a fraction of recent
+    traffic. Every request deposits `ratio` tokens and every retry withdraws
+    one, so a brownout cannot multiply load by more than ~(1 + ratio). A
+    trickle of `min_per_second` keeps low-traffic upstreams retryable.
+    """
+
+    def __init__(self, ratio: float = 0.2, min_per_second: float = 10.0, capacity: float = 100.0):
+        self.ratio = ratio
+        self.min_per_second = min_per_second
+        self.capacity = capacity
+        self._buckets: dict[str, list[float]] = {}  # host -> [tokens, last refill]
+
+    def deposit(self, host: str) -> None:
+        bucket = self._refill(host)
+        bucket[0] = min(self.capacity, bucket[0] + self.ratio)
+
+    def withdraw(self, host: str) -> bool:
+        bucket = self._refill(host)
+        if bucket[0] < 1:
+            return False
+        bucket[0] -= 1
+        return True
+
+    def _refill(self, host: str) -> list[float]:
+        now = time.monotonic()
+        bucket = self._buckets.get(host)
+        if bucket is None:
+            bucket = self._buckets[host] = [self.min_per_second, now]
+        else:
+            bucket[0] = min(self.capacity, bucket[0] + (now - bucket[1]) * self.min_per_second)
+            bucket[1] = now
+        return bucket
+
+
+class RetryState:
+    """
+    Retry bookkeeping for one request: how many retries it may still make
+    and the last backoff, which decorrelated jitter builds on.
+    """
+
+    __slots__ = ("policy", "max_retries", "retried", "budget_denied", "_delay")
+
+    def __init__(self, policy: "RetryPolicy", max_retries: int) -> None:
+        self.policy = policy
+        self.max_retries = max_retries
+        self.retried = 0
+        self.budget_denied = False
+        self._delay = policy.base_delay
+
+    def next_delay(self) -> float:
+        # "decorrelated jitter": spreads retries out so they don't arrive in waves
+        self._delay = min(self.policy.max_delay,
+                          random.uniform(self.policy.base_delay, self._delay * 3))
+        return self._delay
+
+
+class RetryPolicy:
+    """
+    Which failures a route retries and how long it waits. Only idempotent
+    methods are retried unless `methods` says otherwise.
+    """
+
+    def __init__(
+        self,
+        retries: int = 2,
+        base_delay: float = 0.1,
+        max_delay: float = 2.0,
+        methods: Optional[Iterable[str]] = None,
+        statuses: Optional[Iterable[int]] = None,
+        exceptions: Optional[Iterable[str]] = None,
+    ) -> None:
+        self.retries = retries
+        self.base_delay = base_delay
+        self.max_delay = max(max_delay, base_delay)
+        self.methods = IDEMPOTENT_METHODS if methods is None else frozenset(
+            m.upper() for m in methods)
+        self.statuses = RETRYABLE_STATUSES if statuses is None else frozenset(statuses)
+        names = ["any"] if exceptions is None else list(exceptions)
+        unknown = set(names) - RETRYABLE_ERRORS.keys()
+        if unknown:
+            raise ValueError(f"Unknown retryable exceptions: {sorted(unknown)}")
+        self.exceptions = tuple(RETRYABLE_ERRORS[name] for name in names)
+
+    @classmethod
+    def from_config(cls, retries: int, retry_delay: float, config: Optional[dict]) -> "RetryPolicy":
+        return cls(retries=retries, base_delay=retry_delay, **(config or {}))
+
+    def retries_for(self, method: str) -> int:
+        return self.retries if method.upper() in self.methods else 0
+
+    def retryable_status(self, status: int) -> bool:
+        return status in self.statuses
+
+    def retryable_error(self, error: Exception) -> bool:
+        return isinstance(error, self.exceptions)
@@ -0,0 +1,134 @@
+import os
+import mmap
+import time
+import math
+import fcntl
+import struct
+import hashlib
+from typing import Optional
+from app.core.rate_limit_decision import RateLimitDecision
+
+_MAGIC = b"GWRL"
+_HEADER = struct.Struct("<4sIQ")        # magic, version, slots
+_SLOT = struct.Struct("<Qq")            # key fingerprint, theoretical arrival time (ns)
+_VERSION = 1
+
+
+class SharedMemoryRateLimiter:
+    """
+    GCRA limiter whose state lives in a fixed-size, mmap-backed hash table
+    shared by every worker process on the host. Workers started separately
+    (e.g. `uvicorn --workers N`) open the same file and enforce one limit
+    between them with no network hop.
+
+    Slots are found by linear probing over `max_probe` entries. The probe
+    window is locked with an fcntl byte-range lock for the read-modify-write,
+    which works between unrelated processes (unlike a multiprocessing.Lock).
+    Expired slots are reused; if the window is full, the slot closest to
+    expiring is overwritten.
+    """
+
+    def __init__(
+        self,
+        limit: int,
+        window_ms: int = 10000,
+        path: str = "/dev/shm/api-gateway-ratelimit",
+        slots: int = 65536,
+        max_probe: int = 8,
+    ):
+        self.limit = limit
+        self.window_ms = window_ms
+        self.path = path
+        self.slots = slots
+        self.max_probe = max_probe
+        self._window = window_ms * 1_000_000
+        self._interval = self._window // limit
+        self._fd, self._mm = self._open(path, slots + max_probe)
+
+    def _open(self, path: str, capacity: int) -> tuple[int, mmap.mmap]:
+        size = _HEADER.size + capacity * _SLOT.size
+        fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            fcntl.lockf(fd, fcntl.LOCK_EX, _HEADER.size, 0)
+            try:
+                if os.fstat(fd).st_size == 0:
+                    os.ftruncate(fd, size)
+                    os.pwrite(fd, _HEADER.pack(_MAGIC, _VERSION, capacity), 0)
+                magic, version, existing = _HEADER.unpack(os.pread(fd, _HEADER.size, 0))
+                if magic != _MAGIC or version != _VERSION or existing != capacity:
+                    raise ValueError(f"{path} holds an incompatible rate limit table")
+            finally:
+                fcntl.lockf(fd, fcntl.LOCK_UN, _HEADER.size, 0)
+            return fd, mmap.mmap(fd, size)
+        except BaseException:
+            os.close(fd)
+            raise
+
+    @staticmethod
+    def _fingerprint(identity: str) -> int:
+        # stable across processes, unlike hash(); 0 marks an empty slot
+        digest = hashlib.blake2b(identity.encode(), digest_size=8).digest()
+        return int.from_bytes(digest, "little") or 1
+
+    async def acquire(
+        self,
+        identity: str,
+        cost: int = 1,
+        limit: Optional[int] = None,
+        window_ms: Optional[int] = None
+    ) -> RateLimitDecision:
+        limit = limit or self.limit
+        window = window_ms * 1_000_000 if window_ms else self._window
+        interval = window // limit
+        key = self._fingerprint(identity)
+        start = _HEADER.size + (key % self.slots) * _SLOT.size
+        length = self.max_probe * _SLOT.size
+
+        fcntl.lockf(self._fd, fcntl.LOCK_EX, length, start)
+        try:
+            now = time.monotonic_ns()
+            offset, tat = self._find_slot(key, start, now)
+            if tat < now:
+                tat = now
+
+            new_tat = tat + interval * cost
+            allow_at = new_tat - window
+            if allow_at > now:
+                remaining = max(0, (window - (tat - now)) // interval)
+                return RateLimitDecision(False, limit, remaining,
+                                         math.ceil((allow_at - now) / 1e9))
+            if cost:
+                _SLOT.pack_into(self._mm, offset, key, new_tat)
+        finally:
+            fcntl.lockf(self._fd, fcntl.LOCK_UN, length, start)
+
+        remaining = (window - (new_tat - now)) // interval
+        return RateLimitDecision(True, limit, remaining, 0)
+
+    def _find_slot(self, key: int, start: int, now: int) -> tuple[int, int]:
+        free: Optional[int] = None
+        victim, victim_tat = start, None
+        for i in range(self.max_probe):
+            offset = start + i * _SLOT.size
+            slot_key, tat = _SLOT.unpack_from(self._mm, offset)
+            if slot_key == key:
+                return offset, tat
+            if free is None and (slot_key == 0 or tat <= now):
+                free = offset
+            if victim_tat is None or tat < victim_tat:
+                victim, victim_tat = offset, tat
+        # a new (or evicted) entry starts from a full bucket
+        return (free if free is not None else victim), now
+
+    async def allow(self, identity: str) -> tuple[bool, Optional[int]]:
+        decision = await self.acquire(identity)
+        if not decision.allowed:
+            return False, decision.retry_after
+        return True, None
+
+    async def remaining(self, identity: str) -> int:
+        return (await self.acquire(identity, cost=0)).remaining
+
+    def close(self) -> None:
+        self._mm.close()
+        os.close(self._fd)
@@ -0,0 +1,74 @@
+import asyncio
+from functools import partial
+from typing import Any, Awaitable, Callable, Hashable, Optional
+from starlette.types import Scope
+
+# always part of the key, so one client's response never reaches another
+_PRIVATE_HEADERS = (b"authorization", b"cookie")
+_DEFAULT_KEY_HEADERS = ("accept", "accept-encoding", "accept-language")
+
+
+class CoalescePolicy:
+    """
+    A route's "coalesce" block: concurrent requests with the same method,
+    target and `headers` values share one upstream call. The shared
+    response is buffered to fan it out, up to `max_body` bytes; larger
+    ones fall back to one upstream call per request.
+    """
+
+    __slots__ = ("methods", "headers", "max_body")
+
+    def __init__(
+        self,
+        headers: Optional[list[str]] = None,
+        methods: Optional[list[str]] = None,
+        max_body: int = 1024 * 1024,
+    ) -> None:
+        names = (n.lower().encode("latin-1") for n in (_DEFAULT_KEY_HEADERS if headers is None else headers))
+        self.headers = _PRIVATE_HEADERS + tuple(n for n in names if n not in _PRIVATE_HEADERS)
+        self.methods = frozenset(m.upper() for m in (methods or ("GET", "HEAD")))
+        self.max_body = max_body
+
+    @classmethod
+    def from_config(cls, config: Optional[dict | bool]) -> "Optional[CoalescePolicy]":
+        if not config:
+            return None
+        return cls() if config is True else cls(**config)
+
+    def key(self, scope: Scope, method: str, target: str) -> Optional[tuple]:
+        # None: this request can't share a call (method, or it has a body)
+        if method not in self.methods:
+            return None
+        headers = dict(scope.get("headers", []))
+        if b"transfer-encoding" in headers or headers.get(b"content-length", b"0") != b"0":
+            return None
+        return (method, target) + tuple(headers.get(name) for name in self.headers)
+
+
+class SingleFlight:
+    """
+    Runs at most one call per key at a time; callers that arrive while it
+    is in flight wait for the same result. A caller being cancelled (client
+    gone, deadline hit) never cancels the shared call.
+    """
+
+    def __init__(self) -> None:
+        self._calls: dict[Hashable, asyncio.Task] = {}
+
+    def __len__(self) -> int:
+        return len(self._calls)
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> tuple[Any, bool]:
+        # returns the result and whether it was shared with an earlier caller
+        task = self._calls.get(key)
+        joined = task is not None
+        if task is None:
+            task = self._calls[key] = asyncio.ensure_future(fn())
+            task.add_done_callback(partial(self._forget, key))
+        return await asyncio.shield(task), joined
+
+    def _forget(self, key: Hashable, task: asyncio.Task) -> None:
+        if self._calls.get(key) is task:
+            del self._calls[key]
+        if not task.cancelled():
+            task.exception()  # retrieved even if every caller has gone
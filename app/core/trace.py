@@ -1,16 +1,70 @@
-import uuid
-import logging
+import os
+import itertools
 import contextvars
-from starlette.types import ASGIApp, Scope, Receive, Send
-from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.types import ASGIApp, Message, Scope, Receive, Send
 
 trace_id_var = contextvars.ContextVar("trace_id", default=None)
 
-class TraceMiddleware(BaseHTTPMiddleware):
-    async def dispatch(self, request, call_next):
-        trace_id = request.headers.get("X-Trace-ID") or str(uuid.uuid4())
-        trace_id_var.set(trace_id)
+# longer client-supplied ids are replaced rather than echoed
+MAX_TRACE_ID_LENGTH = 128
 
-        response = await call_next(request)
-        response.headers["X-Trace-ID"] = trace_id
-        return response
+_prefix = ""
+_counter = itertools.count()
+
+
+def _reseed() -> None:
+    # a random half per process (and per forked worker), a counter for the rest
+    global _prefix, _counter
+    _prefix = os.urandom(8).hex()
+    _counter = itertools.count()
+
+
+_reseed()
+os.register_at_fork(after_in_child=_reseed)
+
+
+def new_trace_id() -> str:
+    # 32 hex digits, the W3C trace-id shape, without uuid4()'s urandom call per request
+    return f"{_prefix}{next(_counter) & 0xFFFFFFFFFFFFFFFF:016x}"
+
+
+class TraceMiddleware:
+    """
+    Gives every request a trace id (the client's X-Trace-ID, or a new one),
+    exposes it through `trace_id_var` and echoes it on the response. Plain
+    ASGI, so responses stream through untouched.
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        trace_id = None
+        for name, value in scope.get("headers", []):
+            if name == b"x-trace-id":
+                if 0 < len(value) <= MAX_TRACE_ID_LENGTH:
+                    trace_id = value.decode("latin-1")
+                break
+        if trace_id is None:
+            trace_id = new_trace_id()
+        header = (b"x-trace-id", trace_id.encode("latin-1"))
+
+        async def send_with_trace_id(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                headers = message.get("headers")
+                if not isinstance(headers, list):
+                    headers = message["headers"] = list(headers or [])
+                elif any(k.lower() == b"x-trace-id" for k, _ in headers):
+                    headers[:] = [h for h in headers if h[0].lower() != b"x-trace-id"]
+                headers.append(header)
+            await send(message)
+
+        token = trace_id_var.set(trace_id)
+        try:
+            await self.app(scope, receive, send_with_trace_id)
+        finally:
+            trace_id_var.reset(token)
@@ -0,0 +1,176 @@
+import time
+import asyncio
+import logging
+import importlib
+import importlib.util
+from typing import Iterable, Optional
+import httpx
+from starlette.types import ASGIApp
+from app.core.metrics import UPSTREAM_POOL_UTILIZATION, UPSTREAM_POOL_WAIT
+from .load_balancer import Endpoint
+
+logger = logging.getLogger(__name__)
+
+# a down upstream must not hold up startup for long
+PREWARM_TIMEOUT = 2.0
+
+
+def load_asgi_app(address: str) -> ASGIApp:
+    # "package.module:app"
+    module_name, _, attr = address.partition(":")
+    if not attr:
+        raise ValueError(f"ASGI backend must look like 'asgi:module:app', not 'asgi:{address}'")
+    try:
+        return getattr(importlib.import_module(module_name), attr)
+    except (ImportError, AttributeError) as e:
+        raise ValueError(f"Cannot load ASGI backend {address!r}: {e}") from e
+
+
+class PoolConfig:
+    """
+    Connection pool settings for one upstream, from a route's "pool" block:
+    {"max_connections": 100, "max_keepalive": 20, "keepalive_expiry": 5,
+     "http2": false, "prewarm": 0}
+
+    `prewarm` connections are opened at startup so the first requests
+    after a deploy don't pay for TCP/TLS setup.
+    """
+
+    __slots__ = ("max_connections", "max_keepalive", "keepalive_expiry", "http2", "prewarm")
+
+    def __init__(
+        self,
+        max_connections: int = 100,
+        max_keepalive: int = 20,
+        keepalive_expiry: float = 5.0,
+        http2: bool = False,
+        prewarm: int = 0,
+    ) -> None:
+        if http2 and importlib.util.find_spec("h2") is None:
+            raise ValueError("HTTP/2 upstream pools need the 'h2' package (pip install httpx[http2])")
+        if prewarm > max_connections:
+            raise ValueError(f"Cannot prewarm {prewarm} connections with max_connections={max_connections}")
+        self.max_connections = max_connections
+        self.max_keepalive = max_keepalive
+        self.keepalive_expiry = keepalive_expiry
+        self.http2 = http2
+        self.prewarm = prewarm
+
+    @classmethod
+    def from_config(cls, config: Optional[dict]) -> "Optional[PoolConfig]":
+        return cls(**config) if config else None
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, PoolConfig):
+            return NotImplemented
+        return all(getattr(self, name) == getattr(other, name) for name in self.__slots__)
+
+    __hash__ = None
+
+    def limits(self) -> httpx.Limits:
+        return httpx.Limits(
+            max_connections=self.max_connections,
+            max_keepalive_connections=self.max_keepalive,
+            keepalive_expiry=self.keepalive_expiry,
+        )
+
+
+class _MeteredTransport(httpx.AsyncBaseTransport):
+    # the first connection event of a request marks the moment it got a
+    # connection from the pool; everything before that was queueing
+    def __init__(self, transport: httpx.AsyncBaseTransport, upstream: str) -> None:
+        self.transport = transport
+        self.wait_metric = UPSTREAM_POOL_WAIT.labels(upstream=upstream)
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        started = time.perf_counter()
+        inner = request.extensions.get("trace")
+        waiting = True
+
+        async def trace(event: str, info: dict) -> None:
+            nonlocal waiting
+            if waiting:
+                waiting = False
+                self.wait_metric.observe(time.perf_counter() - started)
+            if inner is not None:
+                await inner(event, info)
+
+        request.extensions = {**request.extensions, "trace": trace}
+        return await self.transport.handle_async_request(request)
+
+    async def aclose(self) -> None:
+        await self.transport.aclose()
+
+
+class UpstreamPools:
+    """
+    One httpx client per upstream that has its own pool settings, so a
+    chatty backend can only exhaust its own connections. Upstreams without
+    a "pool" block share `default`.
+
+    unix: upstreams get a pool over their socket, and asgi: upstreams are
+    called in-process through httpx.ASGITransport, skipping TCP entirely.
+    """
+
+    def __init__(self, default: httpx.AsyncClient) -> None:
+        self.default = default
+        self._clients: dict[str, tuple[PoolConfig, httpx.AsyncClient]] = {}
+        # replaced on reload; requests may still be streaming through them
+        self._retired: list[httpx.AsyncClient] = []
+
+    def client_for(self, endpoint: Endpoint) -> httpx.AsyncClient:
+        pool = endpoint.pool
+        if pool is None:
+            return self.default
+        entry = self._clients.get(endpoint.origin)
+        if entry is None or entry[0] is not pool:
+            entry = self._open(endpoint, pool, entry)
+        return entry[1]
+
+    def _open(
+        self,
+        endpoint: Endpoint,
+        pool: PoolConfig,
+        previous: Optional[tuple[PoolConfig, httpx.AsyncClient]],
+    ) -> tuple[PoolConfig, httpx.AsyncClient]:
+        if previous is not None:
+            if previous[0] == pool:
+                # reloaded with the same settings: keep the warm connections
+                entry = self._clients[endpoint.origin] = (pool, previous[1])
+                return entry
+            self._retired.append(previous[1])
+        client = httpx.AsyncClient(transport=self._transport(endpoint, pool))
+        UPSTREAM_POOL_UTILIZATION.labels(upstream=endpoint.origin).set_function(
+            lambda: endpoint.in_flight / pool.max_connections)
+        entry = self._clients[endpoint.origin] = (pool, client)
+        return entry
+
+    def _transport(self, endpoint: Endpoint, pool: PoolConfig) -> httpx.AsyncBaseTransport:
+        if endpoint.transport == "asgi":
+            return httpx.ASGITransport(app=load_asgi_app(endpoint.address))
+        transport = httpx.AsyncHTTPTransport(limits=pool.limits(), http2=pool.http2,
+                                             uds=endpoint.address)
+        return _MeteredTransport(transport, endpoint.origin)
+
+    async def prewarm(self, endpoints: Iterable[Endpoint]) -> None:
+        # concurrent requests force the pool to open that many connections,
+        # which then stay in keep-alive; failures only cost a cold start
+        attempts = []
+        for endpoint in endpoints:
+            if endpoint.pool is not None and endpoint.pool.prewarm and endpoint.transport != "asgi":
+                client = self.client_for(endpoint)
+                attempts += [self._warm(client, endpoint) for _ in range(endpoint.pool.prewarm)]
+        if attempts:
+            await asyncio.gather(*attempts)
+
+    async def _warm(self, client: httpx.AsyncClient, endpoint: Endpoint) -> None:
+        try:
+            await client.head(endpoint.base_url + "/", timeout=PREWARM_TIMEOUT)
+        except httpx.HTTPError as e:
+            logger.warning(f"Could not prewarm a connection to {endpoint.origin}: {e!r}")
+
+    async def aclose(self) -> None:
+        clients = [client for _, client in self._clients.values()] + self._retired
+        self._clients.clear()
+        self._retired = []
+        await asyncio.gather(*(client.aclose() for client in clients))
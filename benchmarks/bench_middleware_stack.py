@@ -0,0 +1,126 @@
+"""
+Per-request cost of each layer of the main.py stack
+(MountAdminFirst -> Trace -> Concurrency -> RateLimit -> GatewayRouter),
+with the old BaseHTTPMiddleware TraceMiddleware alongside for comparison.
+
+    python -m benchmarks.bench_middleware_stack [--requests 5000]
+
+Requests are driven through the ASGI interface directly (no HTTP client
+or server) against an in-process upstream, and the in-memory limiter
+stands in for Redis, so the numbers are the gateway's own overhead.
+"""
+import time
+import uuid
+import timeit
+import asyncio
+import argparse
+import httpx
+from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.responses import PlainTextResponse
+from app.core.admin_router import AdminRouter
+from app.core.concurrency_limiter import ConcurrencyLimiterMiddleware
+from app.core.gateway_router import GatewayRouter
+from app.core.inmemory_rate_limiter import InMemoryRateLimiter
+from app.core.mount_admin_first import MountAdminFirst
+from app.core.path_router import PathRouter
+from app.core.rate_limit_middleware import RateLimitMiddleware
+from app.core.trace import TraceMiddleware, trace_id_var, new_trace_id
+
+WARMUP = 200
+
+
+class LegacyTraceMiddleware(BaseHTTPMiddleware):
+    async def dispatch(self, request, call_next):
+        trace_id = request.headers.get("X-Trace-ID") or str(uuid.uuid4())
+        trace_id_var.set(trace_id)
+        response = await call_next(request)
+        response.headers["X-Trace-ID"] = trace_id
+        return response
+
+
+async def upstream(scope, receive, send):
+    await PlainTextResponse("OK")(scope, receive, send)
+
+
+def build_stacks() -> tuple[list[tuple[str, object]], GatewayRouter]:
+    client = httpx.AsyncClient(transport=httpx.ASGITransport(app=upstream))
+    gateway = GatewayRouter(PathRouter({"/api": {"backend": "http://upstream"}}), client=client)
+    rate_limited = RateLimitMiddleware(gateway, InMemoryRateLimiter(limit=10**9),
+                                       path_router=gateway.path_router)
+    concurrency = ConcurrencyLimiterMiddleware(rate_limited, max_concurrent=100,
+                                               path_router=gateway.path_router)
+    traced = TraceMiddleware(concurrency)
+    stacks = [
+        ("GatewayRouter", gateway),
+        ("+ RateLimitMiddleware", rate_limited),
+        ("+ ConcurrencyLimiterMiddleware", concurrency),
+        ("+ TraceMiddleware", traced),
+        ("+ MountAdminFirst (= main.py)", MountAdminFirst(AdminRouter(gateway), traced)),
+        ("  (BaseHTTPMiddleware trace instead)",
+         MountAdminFirst(AdminRouter(gateway), LegacyTraceMiddleware(concurrency))),
+    ]
+    return stacks, gateway
+
+
+async def one_request(app) -> None:
+    scope = {
+        "type": "http", "asgi": {"version": "3.0", "spec_version": "2.4"},
+        "http_version": "1.1", "method": "GET", "scheme": "http", "path": "/api/items",
+        "raw_path": b"/api/items", "query_string": b"", "root_path": "",
+        "headers": [(b"host", b"bench"), (b"accept", b"*/*")],
+        "client": ("127.0.0.1", 50000), "server": ("bench", 80),
+    }
+    done = asyncio.Event()
+    sent_body = False
+
+    async def receive():
+        nonlocal sent_body
+        if not sent_body:
+            sent_body = True
+            return {"type": "http.request", "body": b"", "more_body": False}
+        await done.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        if message["type"] == "http.response.body" and not message.get("more_body", False):
+            done.set()
+
+    await app(scope, receive, send)
+
+
+async def measure(app, requests: int) -> float:
+    for _ in range(WARMUP):
+        await one_request(app)
+    started = time.perf_counter()
+    for _ in range(requests):
+        await one_request(app)
+    return (time.perf_counter() - started) / requests * 1e6
+
+
+async def run(requests: int) -> None:
+    stacks, gateway = build_stacks()
+    print(f"{'stack':<40} {'us/req':>8} {'layer':>8}")
+    costs: list[float] = []
+    for name, app in stacks:
+        cost = await measure(app, requests)
+        # the last row swaps out the trace layer, so it is compared with the row below trace
+        base = costs[2] if name.startswith("  (") else (costs[-1] if costs else None)
+        layer = f"{cost - base:+8.1f}" if base is not None else f"{'':>8}"
+        print(f"{name:<40} {cost:>8.1f} {layer}")
+        costs.append(cost)
+    await gateway.client.aclose()
+
+    ids = 100_000
+    uuid_ns = timeit.timeit(lambda: str(uuid.uuid4()), number=ids) / ids * 1e9
+    new_ns = timeit.timeit(new_trace_id, number=ids) / ids * 1e9
+    print(f"\ntrace ids: uuid4() {uuid_ns:.0f} ns, new_trace_id() {new_ns:.0f} ns")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=5000)
+    asyncio.run(run(parser.parse_args().requests))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""
+Compare the compiled trie in PathRouter against the old linear prefix scan.
+
+    python -m benchmarks.bench_path_router
+"""
+import random
+import timeit
+from app.core.path_router import PathRouter
+
+SIZES = (10, 100, 1000)
+LOOKUPS = 20_000
+
+
+def linear_scan_match(route_table: dict, path: str):
+    for route_prefix, config in route_table.items():
+        if path.startswith(route_prefix):
+            return config["backend"], config
+    return None, None
+
+
+def build_route_table(size: int) -> dict:
+    return {
+        f"/svc{i}/v{i % 3}": {"backend": f"http://backend-{i}.local"}
+        for i in range(size)
+    }
+
+
+def build_paths(route_table: dict, count: int) -> list[str]:
+    rng = random.Random(42)
+    prefixes = list(route_table)
+    return [f"{rng.choice(prefixes)}/items/{rng.randint(1, 10_000)}" for _ in range(count)]
+
+
+def bench(size: int) -> dict[str, float]:
+    route_table = build_route_table(size)
+    paths = build_paths(route_table, LOOKUPS)
+    trie = PathRouter(route_table)
+    trie_lru = PathRouter(route_table, cache_size=1024)
+    hot_paths = paths[:512] * (LOOKUPS // 512)
+
+    def run_scan():
+        for path in paths:
+            linear_scan_match(route_table, path)
+
+    def run_trie():
+        for path in paths:
+            trie.match(path)
+
+    def run_trie_lru():
+        for path in hot_paths:
+            trie_lru.match(path)
+
+    results = {}
+    for name, fn, n in (("scan", run_scan, len(paths)),
+                        ("trie", run_trie, len(paths)),
+                        ("trie+lru (hot)", run_trie_lru, len(hot_paths))):
+        best = min(timeit.repeat(fn, number=1, repeat=5))
+        results[name] = best / n * 1e9
+    return results
+
+
+def main():
+    print(f"{'routes':>8} {'scan ns/op':>12} {'trie ns/op':>12} {'trie+lru ns/op':>16}")
+    for size in SIZES:
+        r = bench(size)
+        print(f"{size:>8} {r['scan']:>12.0f} {r['trie']:>12.0f} {r['trie+lru (hot)']:>16.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""
+Round trips and latency per proxied request for the old sliding-window flow
+(remaining -> allow -> remaining) versus the single-EVALSHA GCRA limiter.
+
+    python -m benchmarks.bench_redis_rate_limiter [--rtt-ms 0.5]
+
+fakeredis has no network, so --rtt-ms adds a simulated round-trip time to
+every command to show what the call count costs against a real Redis.
+"""
+import time
+import asyncio
+import argparse
+import fakeredis
+from app.core.redis_rate_limiter import RedisRateLimiter
+
+REQUESTS = 2_000
+
+LEGACY_LUA_SCRIPT = """
+local key = KEYS[1]
+local now = tonumber(ARGV[1])
+local window = tonumber(ARGV[2])
+local limit = tonumber(ARGV[3])
+redis.call("ZREMRANGEBYSCORE", key, "-inf", now - window)
+local count = redis.call("ZCARD", key)
+if count >= limit then
+  return redis.call("PTTL", key)
+end
+redis.call("ZADD", key, now, now)
+redis.call("PEXPIRE", key, window)
+return 0
+"""
+
+
+class LegacySlidingWindowLimiter:
+    def __init__(self, redis_client, limit: int, window_ms: int):
+        self.redis = redis_client
+        self.limit = limit
+        self.window_ms = window_ms
+        self.script_sha = None
+
+    async def allow(self, identity: str):
+        if not self.script_sha:
+            self.script_sha = await self.redis.script_load(LEGACY_LUA_SCRIPT)
+        now = int(time.time() * 1000)
+        ttl = await self.redis.evalsha(self.script_sha, 1, identity, now,
+                                       self.window_ms, self.limit)
+        return int(ttl) <= 0
+
+    async def remaining(self, identity: str) -> int:
+        now = int(time.time() * 1000)
+        await self.redis.zremrangebyscore(identity, "-inf", now - self.window_ms)
+        return max(0, self.limit - await self.redis.zcard(identity))
+
+
+class CountingRedis(fakeredis.FakeAsyncRedis):
+    def __init__(self, *args, rtt: float = 0.0, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.calls = 0
+        self.rtt = rtt
+
+    async def execute_command(self, *args, **options):
+        self.calls += 1
+        if self.rtt:
+            await asyncio.sleep(self.rtt)
+        return await super().execute_command(*args, **options)
+
+
+async def legacy_request(limiter: LegacySlidingWindowLimiter, identity: str):
+    await limiter.remaining(identity)
+    await limiter.allow(identity)
+    await limiter.remaining(identity)
+
+
+async def gcra_request(limiter: RedisRateLimiter, identity: str):
+    await limiter.acquire(identity)
+
+
+async def run(name, limiter_cls, request_fn, rtt: float):
+    client = CountingRedis(decode_responses=True, rtt=rtt)
+    limiter = limiter_cls(client, limit=1_000_000, window_ms=60_000)
+    await request_fn(limiter, "warmup")
+    client.calls = 0
+
+    start = time.perf_counter()
+    for i in range(REQUESTS):
+        await request_fn(limiter, f"10.0.0.{i % 50}:/api")
+    elapsed = time.perf_counter() - start
+    print(f"{name:<16} {client.calls / REQUESTS:>12.1f} {elapsed / REQUESTS * 1e6:>14.1f}")
+
+
+async def main(rtt_ms: float):
+    print(f"{REQUESTS} requests, simulated rtt {rtt_ms}ms")
+    print(f"{'limiter':<16} {'calls/req':>12} {'us/req':>14}")
+    await run("sliding-window", LegacySlidingWindowLimiter, legacy_request, rtt_ms / 1000)
+    await run("gcra", RedisRateLimiter, gcra_request, rtt_ms / 1000)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rtt-ms", type=float, default=0.0)
+    asyncio.run(main(parser.parse_args().rtt_ms))
@@ -3,7 +3,7 @@ import os
 from dotenv import load_dotenv
 from redis import asyncio as redis
 from app.core.gateway_router import GatewayRouter
-from app.core.inmemory_rate_limiter import RateLimitMiddleware
+from app.core.rate_limit_middleware import RateLimitMiddleware
 from app.core.redis_rate_limiter import RedisRateLimiter
 from app.core.trace import TraceMiddleware
 from app.core.logging_setup import configure_logging
@@ -18,18 +18,31 @@ configure_logging()
 # Access the variables
 redis_host = os.getenv("REDIS_HOST")
 redis_port = os.getenv("REDIS_PORT")
+route_cache_size = int(os.getenv("ROUTE_CACHE_SIZE", "0"))
 
 redis_client = redis.Redis(host=redis_host, port=redis_port, decode_responses=True)
-rate_rate_limiter = RedisRateLimiter(redis_client, limit=5, window_ms=10000)
 
 # Base gateway app
-core_gateway = GatewayRouter()
-
-# Apply middlewares to a wrapped version
+# Each route gets its own latency-driven concurrency limit, so one slow
+# backend can't take every slot; routes may override it with "concurrency"
+core_gateway = GatewayRouter(
+    route_cache_size=route_cache_size,
+    concurrency={"type": "gradient", "initial": 20, "max_limit": 100},
+)
+
+# Apply middlewares to a wrapped version; routes without a rate_limit
+# block fall back to this limiter's default of 5 requests per 10s per IP
 rate_limiter = RedisRateLimiter(redis_client, limit=5, window_ms=10000)
 
-gateway_app = RateLimitMiddleware(core_gateway, rate_rate_limiter)
-gateway_app = ConcurrencyLimiterMiddleware(gateway_app, max_concurrent=100)
+gateway_app = RateLimitMiddleware(core_gateway, rate_limiter, path_router=core_gateway.path_router)
+# short bursts over the ceiling wait (briefly) in line; "priority" routes go first
+gateway_app = ConcurrencyLimiterMiddleware(
+    gateway_app,
+    max_concurrent=100,
+    max_queue=200,
+    queue_timeout=1.0,
+    path_router=core_gateway.path_router,
+)
 gateway_app = TraceMiddleware(gateway_app)
 
 # Admin gets direct access to the unwrapped GatewayRouter instance
@@ -0,0 +1,80 @@
+import pytest
+import asyncio
+import httpx
+from httpx import ASGITransport
+from asgi_lifespan import LifespanManager
+from starlette.responses import PlainTextResponse
+from app.core.gateway_router import GatewayRouter
+from app.core.admin_router import AdminRouter
+from app.core.mount_admin_first import MountAdminFirst
+from app.core.path_router import PathRouter
+from app.core.adaptive_concurrency import AIMDLimit, GradientLimit, build_limit
+
+
+async def backend(scope, receive, send):
+    if scope["path"].startswith("/slow"):
+        await asyncio.sleep(0.2)
+    await PlainTextResponse("OK")(scope, receive, send)
+
+
+@pytest.mark.anyio
+async def test_slow_route_cannot_starve_other_routes():
+    client = httpx.AsyncClient(transport=ASGITransport(app=backend))
+    path_router = PathRouter({
+        "/slow": {"backend": "http://slow", "concurrency": {"type": "aimd", "initial": 2}},
+        "/fast": {"backend": "http://fast", "concurrency": {"type": "gradient", "initial": 2}},
+    })
+    gateway = GatewayRouter(path_router, client=client)
+    app = MountAdminFirst(AdminRouter(gateway), gateway)
+
+    async with LifespanManager(app):
+        http = httpx.AsyncClient(transport=ASGITransport(app=app), base_url="http://test")
+        slow = [asyncio.create_task(http.get("/slow")) for _ in range(2)]
+        await asyncio.sleep(0.02)
+
+        res = await http.get("/slow")
+        assert res.status_code == 503
+        assert res.headers["X-Concurrency-Limit"] == "2"
+        assert (await http.get("/fast")).status_code == 200
+
+        limits = (await http.get("/__limits")).json()["concurrency_limit"]
+        assert limits["/slow"] == {"type": "aimd", "limit": 2, "in_flight": 2}
+        assert limits["/fast"]["in_flight"] == 0
+
+        assert all(r.status_code == 200 for r in await asyncio.gather(*slow))
+        assert (await http.get("/__limits")).json()["concurrency_limit"]["/slow"]["in_flight"] == 0
+
+
+def test_aimd_grows_when_saturated_and_backs_off_on_drops():
+    limit = AIMDLimit(initial=10, latency_threshold=0.5)
+    for _ in range(100):
+        assert limit.try_acquire()
+        limit.in_flight = 10  # saturated
+        limit.release(0.01, dropped=False)
+    assert limit.limit > 15
+
+    grown = limit.limit
+    limit.in_flight = 1
+    limit.release(0.01, dropped=True)
+    assert limit.limit == pytest.approx(grown * 0.9)
+    limit.in_flight = 1
+    limit.release(0.9, dropped=False)  # too slow counts as a drop
+    assert limit.limit == pytest.approx(grown * 0.81)
+
+
+def test_gradient_shrinks_when_latency_rises():
+    limit = GradientLimit(initial=50, max_limit=200)
+    for _ in range(200):
+        limit.in_flight = int(limit.limit)
+        limit.release(0.010, dropped=False)
+    steady = limit.limit
+    assert steady > 50
+
+    for _ in range(30):
+        limit.in_flight = int(limit.limit)
+        limit.release(0.100, dropped=False)  # queueing: 10x the baseline
+    assert limit.limit < steady / 2
+
+    with pytest.raises(ValueError):
+        build_limit({"type": "vegas"})
+    assert build_limit(None) is None
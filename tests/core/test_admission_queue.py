@@ -0,0 +1,137 @@
+import time
+import pytest
+import asyncio
+import httpx
+from httpx import ASGITransport
+from asgi_lifespan import LifespanManager
+from starlette.responses import PlainTextResponse
+from app.core.admission_queue import AdmissionQueue, PRIORITIES, priority_of
+from app.core.concurrency_limiter import ConcurrencyLimiterMiddleware
+from app.core.gateway_router import GatewayRouter
+from app.core.path_router import PathRouter
+
+
+async def backend(scope, receive, send):
+    await asyncio.sleep(0.05)
+    await PlainTextResponse("OK")(scope, receive, send)
+
+
+def build_app(route_table, **options):
+    client = httpx.AsyncClient(transport=ASGITransport(app=backend))
+    gateway = GatewayRouter(PathRouter(route_table), client=client)
+    return ConcurrencyLimiterMiddleware(gateway, path_router=gateway.path_router, **options)
+
+
+@pytest.mark.anyio
+async def test_burst_waits_in_queue_instead_of_503():
+    app = build_app({"/api": {"backend": "http://fake-backend"}},
+                    max_concurrent=2, max_queue=10, queue_timeout=1.0)
+
+    async with LifespanManager(app):
+        client = httpx.AsyncClient(transport=ASGITransport(app=app), base_url="http://test")
+        results = await asyncio.gather(*(client.get("/api") for _ in range(6)))
+
+    assert [r.status_code for r in results] == [200] * 6
+    assert app.in_flight == 0
+
+
+@pytest.mark.anyio
+async def test_full_queue_and_queue_timeout_shed_with_503():
+    app = build_app({"/api": {"backend": "http://fake-backend"}},
+                    max_concurrent=1, max_queue=1, queue_timeout=0.01)
+
+    async with LifespanManager(app):
+        client = httpx.AsyncClient(transport=ASGITransport(app=app), base_url="http://test")
+        running = asyncio.create_task(client.get("/api"))
+        await asyncio.sleep(0.01)
+        queued = asyncio.create_task(client.get("/api"))
+        await asyncio.sleep(0)
+
+        full = await client.get("/api")
+        assert full.status_code == 503
+        assert full.headers["X-Concurrency-Remaining"] == "0"
+
+        assert (await queued).status_code == 503  # waited longer than queue_timeout
+        assert (await running).status_code == 200
+    assert app.queue.waiting == 0
+
+
+@pytest.mark.anyio
+async def test_high_priority_route_jumps_the_queue():
+    order = []
+
+    async def recording_backend(scope, receive, send):
+        order.append(scope["path"])
+        await asyncio.sleep(0.02)
+        await PlainTextResponse("OK")(scope, receive, send)
+
+    client = httpx.AsyncClient(transport=ASGITransport(app=recording_backend))
+    gateway = GatewayRouter(PathRouter({
+        "/api": {"backend": "http://api"},
+        "/auth": {"backend": "http://auth", "priority": "high"},
+    }), client=client)
+    app = ConcurrencyLimiterMiddleware(gateway, max_concurrent=1, max_queue=10,
+                                       path_router=gateway.path_router)
+
+    async with LifespanManager(app):
+        http = httpx.AsyncClient(transport=ASGITransport(app=app), base_url="http://test")
+        first = asyncio.create_task(http.get("/api/0"))
+        await asyncio.sleep(0.005)
+        low = [asyncio.create_task(http.get(f"/api/{i}")) for i in range(1, 3)]
+        await asyncio.sleep(0.005)
+        high = asyncio.create_task(http.get("/auth/login"))
+        await asyncio.gather(first, high, *low)
+
+    assert order[:2] == ["/api/0", "/auth/login"]
+
+
+@pytest.mark.anyio
+async def test_standing_queue_sheds_stale_waiters_and_serves_newest_first():
+    queue = AdmissionQueue(1, max_queue=10, queue_timeout=5, codel_target=0.01, codel_interval=0.05)
+    assert await queue.acquire()
+
+    stale = asyncio.ensure_future(queue.acquire())
+    await asyncio.sleep(0.05)
+    fresh = [asyncio.ensure_future(queue.acquire()) for _ in range(2)]
+    await asyncio.sleep(0)
+
+    # a standing queue (nothing admitted under target for a whole interval)
+    queue._min_sojourn = 0.05
+    queue._interval_end = 0
+    queue._track(time.monotonic(), 0.05)
+    assert queue.overloaded
+
+    # the stale waiter is shed; the newest fresh one is admitted (LIFO)
+    queue.release()
+    await asyncio.sleep(0.001)
+    assert stale.done() and stale.result() is False
+    assert fresh[1].done() and fresh[1].result() is True
+    assert not fresh[0].done()
+
+    queue.release()
+    assert await fresh[0] is True
+    queue.release()
+    assert queue.in_flight == 0 and queue.waiting == 0
+
+
+@pytest.mark.anyio
+async def test_cancelled_waiter_leaves_the_queue():
+    queue = AdmissionQueue(1, max_queue=1, queue_timeout=5)
+    assert await queue.acquire()
+    waiter = asyncio.ensure_future(queue.acquire())
+    await asyncio.sleep(0)
+    assert queue.waiting == 1
+
+    waiter.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await waiter
+    assert queue.waiting == 0
+    queue.release()
+    assert queue.in_flight == 0
+
+
+def test_priority_names():
+    assert priority_of(None) == PRIORITIES["normal"]
+    assert priority_of("critical") < priority_of("low")
+    with pytest.raises(ValueError):
+        priority_of("urgent")
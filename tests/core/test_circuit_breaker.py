@@ -67,3 +67,74 @@ async def test_circuit_breaker_resets_after_recovery():
         res = await client.get("/api")
         assert res.status_code == 200
         assert res.json() == {"status": "ok"}
+
+
+@pytest.mark.anyio
+async def test_half_open_circuit_admits_one_probe_at_a_time():
+    import asyncio
+
+    class SlowBackend:
+        def __init__(self):
+            self.calls = 0
+
+        async def __call__(self, scope, receive, send):
+            self.calls += 1
+            await asyncio.sleep(0.05)
+            await JSONResponse({"status": "ok"})(scope, receive, send)
+
+    backend = SlowBackend()
+    fake_client = httpx.AsyncClient(transport=ASGITransport(app=backend))
+    breaker = CircuitBreaker(failure_threshold=1, recovery_time=0.05)
+    app = GatewayRouter(PathRouter({"/api": {"backend": "http://fake-backend"}}),
+                        client=fake_client, circuit_breaker=breaker, retries=0)
+    breaker.record_failure("fake-backend")
+
+    async with LifespanManager(app):
+        client = httpx.AsyncClient(transport=ASGITransport(app=app), base_url="http://test")
+        await asyncio.sleep(0.06)
+        assert breaker.get_status() == {"fake-backend": "half_open"}
+
+        responses = await asyncio.gather(*(client.get("/api") for _ in range(5)))
+        assert sorted(r.status_code for r in responses) == [200, 502, 502, 502, 502]
+        assert backend.calls == 1
+        assert breaker.get_status() == {"fake-backend": "closed"}
+
+
+def test_half_open_failure_reopens_and_state_is_bounded():
+    import time
+    breaker = CircuitBreaker(failure_threshold=1, recovery_time=0.01,
+                             half_open_max_calls=2, max_backends=2)
+    breaker.record_failure("a")
+    assert not breaker.allow_request("a")
+    time.sleep(0.02)
+
+    assert breaker.allow_request("a") and breaker.allow_request("a")
+    assert not breaker.allow_request("a")
+    breaker.record_success("a")
+    breaker.record_failure("a")
+    assert breaker.get_status()["a"] == "open"
+
+    breaker.record_success("b")
+    breaker.record_success("c")
+    assert set(breaker.get_status()) == {"b", "c"}
+
+
+def test_sliding_window_breaker_trips_on_rates():
+    from app.core.circuit_breaker import SlidingWindowCircuitBreaker
+    breaker = SlidingWindowCircuitBreaker(failure_rate_threshold=0.5, minimum_calls=10,
+                                          slow_call_rate_threshold=0.8, slow_call_duration=0.5)
+
+    # alternating failures never trip the consecutive-failure breaker, but do trip this one
+    for i in range(9):
+        (breaker.record_failure if i % 2 else breaker.record_success)("flaky")
+    assert breaker.allow_request("flaky")  # below minimum_calls
+    breaker.record_failure("flaky")
+    assert not breaker.allow_request("flaky")
+
+    for _ in range(10):
+        breaker.record_success("slow", duration=0.7)
+    assert not breaker.allow_request("slow")
+
+    for _ in range(10):
+        breaker.record_success("fast", duration=0.01)
+    assert breaker.allow_request("fast")
@@ -0,0 +1,67 @@
+import pytest
+import httpx
+from httpx import ASGITransport
+from asgi_lifespan import LifespanManager
+from starlette.responses import PlainTextResponse
+from app.core.gateway_router import GatewayRouter
+from app.core.path_router import PathRouter
+from app.core.metrics import REQUEST_COUNT
+
+
+async def fake_backend(scope, receive, send):
+    await PlainTextResponse("OK")(scope, receive, send)
+
+
+ROUTE_TABLE = {
+    "/api": {"backend": "http://fake-backend"},
+    "/auth": {
+        "backend": "http://fake-backend:8080/ignored-base",
+        "retries": 5,
+        "timeout": 2.0,
+        "header_policy": {"set": {"x-api": "auth-service"}},
+    },
+}
+
+
+def test_routes_are_resolved_against_gateway_defaults():
+    path_router = PathRouter(route_table=ROUTE_TABLE)
+    gateway = GatewayRouter(path_router, timeout=7.0, retries=1, retry_delay=0.3)
+
+    api = path_router.resolve("/api/users")
+    assert (api.timeout, api.retries, api.retry_delay) == (7.0, 1, 0.3)
+    assert api.header_rewriter is gateway.default_header_rewriter
+
+    auth = path_router.resolve("/auth/login")
+    assert (auth.timeout, auth.retries, auth.retry_delay) == (2.0, 5, 0.3)
+    assert auth.backend_host == "fake-backend:8080"
+    assert auth.target_url("/auth/login", "a=1") == "http://fake-backend:8080/auth/login?a=1"
+    # the header policy is built once, not per request
+    assert path_router.resolve("/auth").header_rewriter is auth.header_rewriter
+
+
+def test_compiled_route_is_read_only():
+    route = PathRouter(route_table=ROUTE_TABLE).resolve("/api")
+    with pytest.raises(AttributeError):
+        route.retries = 10
+
+
+@pytest.mark.anyio
+async def test_reload_swaps_compiled_snapshot_and_metrics_use_route_prefix():
+    fake_client = httpx.AsyncClient(transport=ASGITransport(app=fake_backend),
+                                    base_url="http://fake-backend")
+    path_router = PathRouter(route_table={"/api": {"backend": "http://fake-backend"}})
+    app = GatewayRouter(path_router, client=fake_client)
+    before = path_router.resolve("/api")
+
+    await path_router.update_route_table({"/api": {"backend": "http://fake-backend", "retries": 0}})
+    after = path_router.resolve("/api")
+    assert after is not before
+    assert after.retries == 0
+
+    async with LifespanManager(app):
+        async with httpx.AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+            res = await client.get("/api/items/123")
+            assert res.status_code == 200
+
+    # labelled with the bounded route prefix, not the raw request path
+    assert REQUEST_COUNT.labels(method="GET", route="/api", status="200")._value.get() >= 1
@@ -0,0 +1,167 @@
+import gzip
+import json
+import pytest
+import asyncio
+import httpx
+from httpx import ASGITransport
+from asgi_lifespan import LifespanManager
+from starlette.responses import Response, StreamingResponse
+from app.core import compression
+from app.core.compression import CompressionPolicy
+from app.core.gateway_router import GatewayRouter
+from app.core.path_router import PathRouter
+
+DOCUMENT = {"items": [{"id": i, "name": f"item-{i}"} for i in range(200)]}
+PAYLOAD = json.dumps(DOCUMENT).encode()
+PRECOMPRESSED = gzip.compress(b"already compressed " * 200)
+
+
+async def backend(scope, receive, send):
+    path = scope["path"]
+    if path == "/api/small":
+        response = Response(b'{"ok": true}', media_type="application/json")
+    elif path == "/api/image":
+        response = Response(PAYLOAD, media_type="image/png")
+    elif path == "/api/precompressed":
+        response = Response(PRECOMPRESSED, media_type="text/plain",
+                            headers={"Content-Encoding": "gzip"})
+    elif path == "/api/stream":
+        async def chunks():
+            for i in range(50):
+                yield b"line %d of a streamed text body\n" % i
+        response = StreamingResponse(chunks(), media_type="text/plain")
+    else:
+        response = Response(PAYLOAD, media_type="application/json", headers={"Vary": "Origin"})
+    await response(scope, receive, send)
+
+
+def build_gateway(config=True):
+    client = httpx.AsyncClient(transport=ASGITransport(app=backend))
+    return GatewayRouter(PathRouter({
+        "/api": {"backend": "http://fake-backend", "compression": config},
+        "/plain": {"backend": "http://fake-backend"},
+    }), client=client)
+
+
+async def fetch_raw(client, path, **headers):
+    async with client.stream("GET", path, headers=headers) as res:
+        return res, b"".join([chunk async for chunk in res.aiter_raw()])
+
+
+@pytest.mark.anyio
+async def test_large_json_is_gzipped():
+    app = build_gateway()
+    async with LifespanManager(app):
+        client = httpx.AsyncClient(transport=ASGITransport(app=app), base_url="http://test")
+        res, raw = await fetch_raw(client, "/api/doc", **{"accept-encoding": "gzip"})
+        assert res.headers["content-encoding"] == "gzip"
+        assert res.headers["vary"] == "Origin, Accept-Encoding"
+        assert "content-length" not in res.headers or int(res.headers["content-length"]) == len(raw)
+        assert len(raw) < len(PAYLOAD) / 3
+        assert json.loads(gzip.decompress(raw)) == DOCUMENT
+
+        # no compression block, no compression
+        res, raw = await fetch_raw(client, "/plain/doc", **{"accept-encoding": "gzip"})
+        assert "content-encoding" not in res.headers and raw == PAYLOAD
+
+
+@pytest.mark.anyio
+async def test_bodies_that_are_left_alone():
+    app = build_gateway()
+    async with LifespanManager(app):
+        client = httpx.AsyncClient(transport=ASGITransport(app=app), base_url="http://test")
+        gz = {"accept-encoding": "gzip"}
+
+        res, raw = await fetch_raw(client, "/api/small", **gz)  # under min_size
+        assert "content-encoding" not in res.headers and raw == b'{"ok": true}'
+        res, raw = await fetch_raw(client, "/api/image", **gz)  # type not allowed
+        assert "content-encoding" not in res.headers and raw == PAYLOAD
+        res, raw = await fetch_raw(client, "/api/doc", **{"accept-encoding": "identity"})
+        assert "content-encoding" not in res.headers and raw == PAYLOAD
+        assert "Accept-Encoding" in res.headers["vary"]
+
+        # already encoded upstream: the same bytes, not recompressed
+        res, raw = await fetch_raw(client, "/api/precompressed", **gz)
+        assert res.headers["content-encoding"] == "gzip"
+        assert raw == PRECOMPRESSED
+
+
+@pytest.mark.anyio
+async def test_streamed_body_is_compressed_chunk_by_chunk():
+    app = build_gateway({"min_size": 0})
+    async with LifespanManager(app):
+        client = httpx.AsyncClient(transport=ASGITransport(app=app), base_url="http://test")
+        res, raw = await fetch_raw(client, "/api/stream", **{"accept-encoding": "gzip"})
+        assert res.headers["content-encoding"] == "gzip"
+        expected = b"".join(b"line %d of a streamed text body\n" % i for i in range(50))
+        assert gzip.decompress(raw) == expected
+
+
+@pytest.mark.anyio
+async def test_large_chunks_are_compressed_off_the_event_loop(monkeypatch):
+    offloaded = []
+    to_thread = asyncio.to_thread
+
+    async def counting_to_thread(fn, *args):
+        offloaded.append(len(args[0]))
+        return await to_thread(fn, *args)
+
+    monkeypatch.setattr(compression.asyncio, "to_thread", counting_to_thread)
+    app = build_gateway({"offload_size": 4096})
+    async with LifespanManager(app):
+        client = httpx.AsyncClient(transport=ASGITransport(app=app), base_url="http://test")
+        res = await client.get("/api/doc", headers={"accept-encoding": "gzip"})
+        assert res.json() == DOCUMENT
+    assert offloaded == [len(PAYLOAD)]
+
+
+def test_negotiation(monkeypatch):
+    policy = CompressionPolicy()
+
+    def negotiate(value):
+        return policy.negotiate({"headers": [(b"accept-encoding", value)]})
+
+    assert negotiate(b"gzip, deflate") == "gzip"
+    assert negotiate(b"br;q=0, gzip;q=0.5") == "gzip"
+    assert negotiate(b"gzip;q=0") is None
+    assert negotiate(b"*") in ("br", "gzip")
+    assert policy.negotiate({"headers": []}) is None
+
+    monkeypatch.setattr(compression, "brotli", None)
+    assert CompressionPolicy(encodings=["br"]).negotiate({"headers": [(b"accept-encoding", b"br")]}) is None
+    with pytest.raises(ValueError):
+        CompressionPolicy(encodings=["zstd"])
+
+
+class FakeBrotli:
+    # same streaming interface as the brotli package, backed by zlib
+    class Compressor:
+        def __init__(self, quality):
+            self._z = __import__("zlib").compressobj(quality)
+
+        def process(self, data):
+            return self._z.compress(data)
+
+        def finish(self):
+            return self._z.flush()
+
+
+@pytest.mark.anyio
+async def test_brotli_is_preferred_when_installed(monkeypatch):
+    import zlib
+    monkeypatch.setattr(compression, "brotli", FakeBrotli)
+    policy = CompressionPolicy()
+    sent = []
+
+    async def send(message):
+        sent.append(message)
+
+    wrapped = compression.CompressingSend(
+        send, policy, policy.negotiate({"headers": [(b"accept-encoding", b"gzip, br")]}))
+    await wrapped({"type": "http.response.start", "status": 200,
+                   "headers": [(b"content-type", b"application/json")]})
+    await wrapped({"type": "http.response.body", "body": PAYLOAD[:2000], "more_body": True})
+    await wrapped({"type": "http.response.body", "body": PAYLOAD[2000:]})
+
+    assert (b"content-encoding", b"br") in sent[0]["headers"]
+    assert zlib.decompress(b"".join(m["body"] for m in sent[1:])) == PAYLOAD
@@ -0,0 +1,80 @@
+import time
+import pytest
+import asyncio
+import httpx
+from httpx import ASGITransport
+from asgi_lifespan import LifespanManager
+from starlette.responses import JSONResponse
+from app.core.gateway_router import GatewayRouter
+from app.core.path_router import PathRouter
+
+
+class SlowBackend:
+    def __init__(self, delay: float):
+        self.delay = delay
+        self.calls = 0
+
+    async def __call__(self, scope, receive, send):
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        headers = dict(scope["headers"])
+        await JSONResponse({
+            "deadline_ms": headers.get(b"x-request-timeout-ms", b"").decode()
+        })(scope, receive, send)
+
+
+def build_gateway(backend, route_config):
+    client = httpx.AsyncClient(transport=ASGITransport(app=backend))
+    route_table = {"/api": {"backend": "http://fake-backend", **route_config}}
+    return GatewayRouter(PathRouter(route_table), client=client, retry_delay=0)
+
+
+@pytest.mark.anyio
+async def test_total_deadline_bounds_retries():
+    backend = SlowBackend(delay=0.2)
+    app = build_gateway(backend, {"timeout": 0.1, "retries": 5, "deadline": 0.25})
+
+    async with LifespanManager(app):
+        client = httpx.AsyncClient(transport=ASGITransport(app=app), base_url="http://test")
+        started = time.monotonic()
+        res = await client.get("/api")
+        elapsed = time.monotonic() - started
+
+    assert res.status_code == 504
+    assert "deadline exceeded" in res.text
+    # 6 attempts x 0.1s without the deadline
+    assert elapsed < 0.4
+    assert backend.calls <= 3
+
+
+@pytest.mark.anyio
+async def test_inbound_deadline_header_is_honoured_and_forwarded():
+    backend = SlowBackend(delay=0.2)
+    app = build_gateway(backend, {"timeout": 5.0, "retries": 2})
+
+    async with LifespanManager(app):
+        client = httpx.AsyncClient(transport=ASGITransport(app=app), base_url="http://test")
+        started = time.monotonic()
+        res = await client.get("/api", headers={"x-request-timeout-ms": "50"})
+        assert res.status_code == 504
+        assert time.monotonic() - started < 0.15
+
+        # nothing left: the upstream is never called
+        calls = backend.calls
+        assert (await client.get("/api", headers={"x-request-timeout-ms": "0"})).status_code == 504
+        assert backend.calls == calls
+
+        backend.delay = 0
+        res = await client.get("/api", headers={"x-request-timeout-ms": "1500"})
+        assert res.status_code == 200
+        assert 1000 < int(res.json()["deadline_ms"]) <= 1500
+
+
+@pytest.mark.anyio
+async def test_no_deadline_header_without_a_deadline():
+    backend = SlowBackend(delay=0)
+    app = build_gateway(backend, {})
+
+    async with LifespanManager(app):
+        client = httpx.AsyncClient(transport=ASGITransport(app=app), base_url="http://test")
+        assert (await client.get("/api")).json() == {"deadline_ms": ""}
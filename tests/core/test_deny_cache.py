@@ -0,0 +1,43 @@
+import pytest
+import asyncio
+from unittest.mock import AsyncMock
+from app.core.deny_cache import DenyCache
+from app.core.redis_rate_limiter import RedisRateLimiter
+from app.core.metrics import DENY_CACHE_HITS
+
+
+@pytest.mark.anyio
+async def test_denied_identity_is_rejected_locally_until_retry_after():
+    mock_redis = AsyncMock()
+    # [allowed, remaining, retry_after_ms]
+    mock_redis.evalsha = AsyncMock(side_effect=[[0, 0, 50], [1, 0, 0]])
+    limiter = RedisRateLimiter(mock_redis, limit=1, window_ms=1000)
+    hits_before = DENY_CACHE_HITS._value.get()
+
+    first = await limiter.acquire("flooder")
+    assert not first.allowed
+
+    for _ in range(10):
+        decision = await limiter.acquire("flooder")
+        assert not decision.allowed
+        assert decision.retry_after == 1
+
+    assert mock_redis.evalsha.await_count == 1
+    assert DENY_CACHE_HITS._value.get() - hits_before == 10
+
+    await asyncio.sleep(0.06)
+    assert (await limiter.acquire("flooder")).allowed
+    assert mock_redis.evalsha.await_count == 2
+
+
+def test_deny_cache_is_bounded_lru():
+    cache = DenyCache(max_entries=2)
+    cache.deny("a", 10)
+    cache.deny("b", 10)
+    assert cache.retry_after("a") is not None  # "a" is now most recent
+    cache.deny("c", 10)
+
+    assert len(cache) == 2
+    assert cache.retry_after("b") is None
+    assert cache.retry_after("a") is not None
+    assert cache.retry_after("c") is not None
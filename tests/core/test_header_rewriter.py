@@ -55,3 +55,44 @@ async def test_gateway_rewrites_and_forwards_headers():
 
             # This client-defined header should still go through
             assert backend_headers.get("x-custom") == "my-value"
+
+
+async def echo_raw_headers_backend(scope, receive, send):
+    headers = [[k.decode(), v.decode()] for k, v in scope["headers"]]
+    response = JSONResponse(headers)
+    response.raw_headers += [(b"set-cookie", b"a=1"), (b"set-cookie", b"b=2")]
+    await response(scope, receive, send)
+
+
+@pytest.mark.anyio
+async def test_duplicates_are_kept_and_hop_by_hop_headers_stripped():
+    fake_client = httpx.AsyncClient(transport=ASGITransport(app=echo_raw_headers_backend))
+    app = GatewayRouter(PathRouter({"/api": {
+        "backend": "http://fake-backend",
+        "header_policy": {"remove": ["x-internal"], "set": {"x-gateway": "gw"}, "append": {"x-team": "core"}},
+    }}), client=fake_client)
+
+    async with LifespanManager(app):
+        async with httpx.AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+            res = await client.get("/api", headers=[
+                ("Forwarded", "for=10.0.0.1"), ("Forwarded", "for=10.0.0.2"),
+                ("Connection", "x-hop"), ("X-Hop", "1"), ("Keep-Alive", "timeout=5"),
+                ("X-Internal", "secret"), ("X-Gateway", "spoofed"), ("X-Team", "mine"),
+                ("X-Forwarded-For", "203.0.113.7"),
+            ])
+            sent = res.json()
+            names = [name for name, _ in sent]
+
+            assert [v for k, v in sent if k == "forwarded"] == ["for=10.0.0.1", "for=10.0.0.2"]
+            for dropped in ("x-hop", "keep-alive", "x-internal"):
+                assert dropped not in names
+            assert [v for k, v in sent if k == "connection"] == ["keep-alive"]  # httpx's own
+            assert [v for k, v in sent if k == "x-gateway"] == ["gw"]
+            assert [v for k, v in sent if k == "x-team"] == ["mine"]
+            assert [v for k, v in sent if k == "x-forwarded-for"] == ["203.0.113.7, 127.0.0.1"]
+            assert [v for k, v in sent if k == "x-forwarded-proto"] == ["http"]
+            assert [v for k, v in sent if k == "x-forwarded-host"] == ["test"]
+            assert [v for k, v in sent if k == "host"] == ["fake-backend"]
+
+            # repeated response headers reach the client one by one too
+            assert res.headers.get_list("set-cookie") == ["a=1", "b=2"]
@@ -0,0 +1,109 @@
+import time
+import pytest
+import asyncio
+import httpx
+from collections import Counter
+from httpx import ASGITransport
+from asgi_lifespan import LifespanManager
+from starlette.responses import JSONResponse, PlainTextResponse
+from app.core.gateway_router import GatewayRouter
+from app.core.admin_router import AdminRouter
+from app.core.mount_admin_first import MountAdminFirst
+from app.core.path_router import PathRouter
+from app.core.circuit_breaker import CircuitBreaker
+from app.core.health_checker import HealthChecker
+from app.core.metrics import UPSTREAM_EJECTIONS
+
+
+def make_upstreams(down=(), sick=()):
+    # "down" hosts fail everything, "sick" hosts only fail their health path
+    calls = Counter()
+
+    async def upstreams(scope, receive, send):
+        host = dict(scope["headers"])[b"host"].decode()
+        calls[host, scope["path"]] += 1
+        if host in down or (host in sick and scope["path"] == "/health"):
+            await PlainTextResponse("down", status_code=503)(scope, receive, send)
+            return
+        await JSONResponse({"host": host})(scope, receive, send)
+
+    return httpx.AsyncClient(transport=ASGITransport(app=upstreams)), calls
+
+
+def build_gateway(route_table, client, **checker_options):
+    path_router = PathRouter(route_table)
+    gateway = GatewayRouter(
+        path_router,
+        client=client,
+        retries=0,
+        circuit_breaker=CircuitBreaker(failure_threshold=100),
+        health_checker=HealthChecker(path_router, client, sweep_interval=0.01, **checker_options),
+    )
+    return gateway, MountAdminFirst(AdminRouter(gateway), gateway)
+
+
+@pytest.mark.anyio
+async def test_failed_health_checks_take_upstream_out_of_rotation():
+    client, calls = make_upstreams(sick={"a"})
+    gateway, app = build_gateway({"/api": {
+        "backend": ["http://a", "http://b"],
+        "health_check": {"path": "/health", "interval": 0.02, "unhealthy_threshold": 2},
+    }}, client)
+
+    async with LifespanManager(app):
+        http = httpx.AsyncClient(transport=ASGITransport(app=app), base_url="http://test")
+        await asyncio.sleep(0.2)
+
+        assert calls["a", "/health"] >= 2
+        assert (await http.get("/__circuit")).json()["a"] == "unhealthy"
+        for _ in range(10):
+            assert (await http.get("/api/x")).json() == {"host": "b"}
+        assert calls["a", "/api/x"] == 0
+
+    # probes stop with the gateway
+    probes = calls["a", "/health"]
+    await asyncio.sleep(0.05)
+    assert calls["a", "/health"] == probes
+
+
+@pytest.mark.anyio
+async def test_consecutive_5xx_ejects_upstream():
+    client, calls = make_upstreams(down={"a"})
+    gateway, app = build_gateway(
+        {"/api": {"backend": ["http://a", "http://b"], "balancer": "round_robin"}},
+        client,
+        consecutive_5xx=2,
+    )
+    before = UPSTREAM_EJECTIONS.labels(upstream="a", reason="consecutive_5xx")._value.get()
+
+    async with LifespanManager(app):
+        http = httpx.AsyncClient(transport=ASGITransport(app=app), base_url="http://test")
+        statuses = [(await http.get("/api")).status_code for _ in range(20)]
+
+        assert statuses.count(502) == 2
+        assert calls["a", "/api"] == 2
+        assert (await http.get("/__circuit")).json()["a"] == "ejected"
+
+    assert UPSTREAM_EJECTIONS.labels(upstream="a", reason="consecutive_5xx")._value.get() \
+        - before == 1
+
+
+@pytest.mark.anyio
+async def test_latency_outlier_is_ejected_and_all_down_falls_back():
+    client, _ = make_upstreams()
+    gateway, app = build_gateway(
+        {"/api": {"backend": ["http://a", "http://b", "http://c"]}}, client)
+    a, b, c = gateway.path_router.resolve("/api").endpoints
+
+    async with LifespanManager(app):
+        a.observe(0.01)
+        b.observe(0.012)
+        c.observe(0.5)
+        await asyncio.sleep(0.05)
+        assert c.state(time.monotonic()) == "ejected"
+        assert a.healthy and b.healthy and a.ejected_until == 0
+
+        # with every upstream out, requests still go somewhere (panic mode)
+        a.healthy = b.healthy = False
+        http = httpx.AsyncClient(transport=ASGITransport(app=app), base_url="http://test")
+        assert (await http.get("/api")).status_code == 200
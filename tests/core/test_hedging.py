@@ -0,0 +1,85 @@
+import time
+import pytest
+import asyncio
+import httpx
+from collections import Counter
+from httpx import ASGITransport
+from asgi_lifespan import LifespanManager
+from starlette.responses import JSONResponse
+from app.core.gateway_router import GatewayRouter
+from app.core.path_router import PathRouter
+from app.core.hedging import HedgePolicy
+from app.core.metrics import HEDGES
+
+
+def make_upstreams(slow_for=0.3):
+    calls = Counter()
+
+    async def upstreams(scope, receive, send):
+        host = dict(scope["headers"])[b"host"].decode()
+        calls[host, scope["method"]] += 1
+        if host == "slow":
+            await asyncio.sleep(slow_for)
+        await JSONResponse({"host": host})(scope, receive, send)
+
+    return httpx.AsyncClient(transport=ASGITransport(app=upstreams)), calls
+
+
+def build_gateway(hedge):
+    client, calls = make_upstreams()
+    route_table = {"/api": {
+        "backend": ["http://slow", "http://fast"],
+        "balancer": "round_robin",
+        "hedge": hedge,
+    }}
+    return GatewayRouter(PathRouter(route_table), client=client), calls
+
+
+@pytest.mark.anyio
+async def test_slow_attempt_is_hedged_to_another_endpoint():
+    app, calls = build_gateway({"delay": 0.02})
+    sent = HEDGES.labels(route="/api", outcome="sent")
+    won = HEDGES.labels(route="/api", outcome="won")
+    sent_before, won_before = sent._value.get(), won._value.get()
+
+    async with LifespanManager(app):
+        client = httpx.AsyncClient(transport=ASGITransport(app=app), base_url="http://test")
+        started = time.monotonic()
+        res = await client.get("/api")  # round-robin sends this one to "slow" first
+        elapsed = time.monotonic() - started
+
+        assert res.json() == {"host": "fast"}
+        assert elapsed < 0.2
+        assert calls["slow", "GET"] == 1 and calls["fast", "GET"] == 1
+
+        # non-idempotent requests are never duplicated
+        await client.post("/api", content=b"x")
+        assert calls["slow", "POST"] + calls["fast", "POST"] == 1
+
+    assert sent._value.get() - sent_before == 1
+    assert won._value.get() - won_before == 1
+    assert all(e.in_flight == 0 for e in app.compiler.endpoints.values())
+
+
+@pytest.mark.anyio
+async def test_hedging_stops_when_budget_is_spent():
+    app, calls = build_gateway({"delay": 0.02, "budget_ratio": 0, "min_per_second": 0})
+
+    async with LifespanManager(app):
+        client = httpx.AsyncClient(transport=ASGITransport(app=app), base_url="http://test")
+        res = await client.get("/api")
+
+    assert res.json() == {"host": "slow"}
+    assert calls["fast", "GET"] == 0
+
+
+def test_percentile_delay_follows_observed_latency():
+    hedge = HedgePolicy(delay="p95", min_samples=20)
+    assert hedge.delay() is None  # no data, no hedging
+
+    for i in range(100):
+        hedge.observe(i / 100)
+    assert 0.9 <= hedge.delay() <= 0.99
+
+    with pytest.raises(ValueError):
+        HedgePolicy(delay="fast")
@@ -1,4 +1,5 @@
 import pytest
+import asyncio
 import httpx
 from httpx import ASGITransport
 from asgi_lifespan import LifespanManager
@@ -46,3 +47,40 @@ async def test_rate_limit_blocks_excessive_requests():
         assert res.headers["RateLimit-Remaining"] == "0"
         assert "Retry-After" in res.headers
         assert "Too Many Requests" in res.text
+
+
+@pytest.mark.anyio
+async def test_window_is_in_milliseconds():
+    limiter = InMemoryRateLimiter(limit=2, window_ms=100, sweep_interval=0)
+
+    assert (await limiter.acquire("client")).allowed
+    assert (await limiter.acquire("client")).allowed
+    assert not (await limiter.acquire("client")).allowed
+
+    # one token drips back every window / limit = 50ms
+    await asyncio.sleep(0.06)
+    assert (await limiter.acquire("client")).allowed
+
+
+@pytest.mark.anyio
+async def test_memory_is_bounded_under_high_cardinality_flood():
+    limiter = InMemoryRateLimiter(limit=5, window_ms=60000, max_entries=1000,
+                                  shards=8, sweep_interval=0)
+
+    for i in range(50_000):
+        await limiter.acquire(f"10.{i // 65536}.{i // 256 % 256}.{i % 256}:/api")
+
+    assert len(limiter) <= 1000
+
+
+@pytest.mark.anyio
+async def test_sweeper_drops_expired_buckets_incrementally():
+    limiter = InMemoryRateLimiter(limit=10, window_ms=20, sweep_interval=0.01, sweep_batch=50)
+
+    for i in range(200):
+        await limiter.acquire(f"client-{i}")
+    assert len(limiter) == 200
+
+    await asyncio.sleep(0.1)
+    assert len(limiter) == 0
+    await limiter.aclose()
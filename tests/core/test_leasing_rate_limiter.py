@@ -0,0 +1,63 @@
+import pytest
+import asyncio
+import fakeredis
+from app.core.redis_rate_limiter import RedisRateLimiter
+from app.core.leasing_rate_limiter import LeasingRateLimiter
+
+
+class CountingRedis(fakeredis.FakeAsyncRedis):
+    calls = 0
+
+    async def evalsha(self, *args, **kwargs):
+        self.calls += 1
+        return await super().evalsha(*args, **kwargs)
+
+
+@pytest.mark.anyio
+async def test_hot_key_costs_one_redis_call_per_lease():
+    redis = CountingRedis(decode_responses=True)
+    limiter = LeasingRateLimiter(RedisRateLimiter(redis, limit=100, window_ms=60000),
+                                 lease_size=10, low_water=0)
+
+    for _ in range(30):
+        assert (await limiter.acquire("client")).allowed
+
+    # three leases of ten, plus at most one background prefetch for the next
+    assert redis.calls <= 4
+    await limiter.aclose()
+
+
+@pytest.mark.anyio
+async def test_global_limit_is_still_enforced_across_leases():
+    redis = fakeredis.FakeAsyncRedis(decode_responses=True)
+    remote = RedisRateLimiter(redis, limit=15, window_ms=60000)
+    first = LeasingRateLimiter(remote, lease_size=10)
+    second = LeasingRateLimiter(remote, lease_size=10)
+
+    allowed = 0
+    for _ in range(20):
+        for limiter in (first, second):
+            if (await limiter.acquire("client")).allowed:
+                allowed += 1
+        await asyncio.sleep(0)  # let background refills run
+
+    assert allowed == 15
+    decision = await first.acquire("client")
+    assert not decision.allowed and decision.retry_after > 0
+
+
+@pytest.mark.anyio
+async def test_unused_tokens_are_returned_when_lease_expires():
+    redis = fakeredis.FakeAsyncRedis(decode_responses=True)
+    remote = RedisRateLimiter(redis, limit=20, window_ms=60000)
+    limiter = LeasingRateLimiter(remote, lease_size=10, low_water=0, lease_ttl_ms=10)
+
+    await limiter.acquire("client")
+    assert await remote.remaining("client") == 10
+
+    await asyncio.sleep(0.02)
+    await limiter.acquire("client")  # expired lease is dropped and a new one taken
+    await limiter.aclose()
+
+    # only the two spent tokens stay consumed
+    assert await remote.remaining("client") == 18
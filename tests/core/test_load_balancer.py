@@ -0,0 +1,110 @@
+import pytest
+import httpx
+from collections import Counter
+from httpx import ASGITransport
+from asgi_lifespan import LifespanManager
+from starlette.responses import JSONResponse, PlainTextResponse
+from app.core.gateway_router import GatewayRouter
+from app.core.path_router import PathRouter
+from app.core.load_balancer import (
+    Endpoint, RoundRobinBalancer, LeastOutstandingBalancer, P2CBalancer,
+    ConsistentHashBalancer, build_balancer
+)
+
+
+def make_upstreams(failing=()):
+    # one ASGI app standing in for several upstreams, told apart by Host
+    async def upstreams(scope, receive, send):
+        host = dict(scope["headers"])[b"host"].decode()
+        if host in failing:
+            await PlainTextResponse("down", status_code=503)(scope, receive, send)
+            return
+        await JSONResponse({"host": host})(scope, receive, send)
+    return httpx.AsyncClient(transport=ASGITransport(app=upstreams))
+
+
+@pytest.mark.anyio
+async def test_weighted_round_robin_across_upstreams():
+    route_table = {"/api": {
+        "backend": ["http://a", {"url": "http://b", "weight": 2}],
+        "balancer": "round_robin",
+    }}
+    app = GatewayRouter(PathRouter(route_table), client=make_upstreams())
+
+    async with LifespanManager(app):
+        client = httpx.AsyncClient(transport=ASGITransport(app=app), base_url="http://test")
+        hosts = [(await client.get("/api/x")).json()["host"] for _ in range(6)]
+
+    assert Counter(hosts) == {"a": 2, "b": 4}
+    assert all(e.in_flight == 0 for e in app.compiler.endpoints.values())
+
+
+@pytest.mark.anyio
+async def test_retry_moves_to_another_upstream():
+    route_table = {"/api": {
+        "backend": ["http://a", "http://b"],
+        "balancer": "round_robin",
+        "retries": 1,
+        "retry_delay": 0,
+    }}
+    app = GatewayRouter(PathRouter(route_table), client=make_upstreams(failing={"a"}))
+
+    async with LifespanManager(app):
+        client = httpx.AsyncClient(transport=ASGITransport(app=app), base_url="http://test")
+        for _ in range(4):
+            res = await client.get("/api")
+            assert res.status_code == 200
+            assert res.json() == {"host": "b"}
+
+
+@pytest.mark.anyio
+async def test_consistent_hash_keeps_affinity():
+    route_table = {"/api": {
+        "backend": ["http://a", "http://b", "http://c"],
+        "balancer": {"type": "consistent_hash", "header": "x-user"},
+    }}
+    app = GatewayRouter(PathRouter(route_table), client=make_upstreams())
+
+    async with LifespanManager(app):
+        client = httpx.AsyncClient(transport=ASGITransport(app=app), base_url="http://test")
+        owners = {}
+        for user in range(30):
+            hosts = {(await client.get("/api", headers={"x-user": str(user)})).json()["host"]
+                     for _ in range(3)}
+            assert len(hosts) == 1
+            owners[user] = hosts.pop()
+
+    assert set(owners.values()) == {"a", "b", "c"}
+
+
+def test_consistent_hash_only_remaps_removed_endpoint():
+    a, b, c = Endpoint("http://a"), Endpoint("http://b"), Endpoint("http://c")
+    ring = ConsistentHashBalancer([a, b, c], [1, 1, 1], header="x-user")
+    scopes = [{"headers": [(b"x-user", str(i).encode())]} for i in range(300)]
+
+    before = [ring.pick(scope) for scope in scopes]
+    after = [ring.pick(scope, exclude={c}) for scope in scopes]
+    assert all(x is y for x, y in zip(before, after) if x is not c)
+    assert c not in after
+
+
+def test_load_aware_balancers():
+    idle, busy = Endpoint("http://idle"), Endpoint("http://busy")
+    busy.in_flight = 5
+    least = LeastOutstandingBalancer([idle, busy], [1, 1])
+    assert all(least.pick({}) is idle for _ in range(20))
+
+    fast, slow = Endpoint("http://fast"), Endpoint("http://slow")
+    fast.observe(0.01)
+    slow.observe(0.5)
+    p2c = P2CBalancer([fast, slow], [1, 1])
+    assert all(p2c.pick({}) is fast for _ in range(20))
+    assert p2c.pick({}, exclude={fast}) is slow
+    assert p2c.pick({}, exclude={fast, slow}) is None
+
+
+def test_build_balancer_rejects_unknown_type():
+    endpoints = [Endpoint("http://a")]
+    assert isinstance(build_balancer("round_robin", endpoints, [1]), RoundRobinBalancer)
+    with pytest.raises(ValueError):
+        build_balancer("random", endpoints, [1])
@@ -6,7 +6,7 @@ from httpx import ASGITransport
 from app.core.gateway_router import GatewayRouter
 from asgi_lifespan import LifespanManager
 from starlette.responses import JSONResponse, PlainTextResponse
-from app.core.trace import TraceMiddleware, trace_id_var
+from app.core.trace import TraceMiddleware, trace_id_var, new_trace_id
 from app.core.path_router import PathRouter
 
 
@@ -93,3 +93,30 @@ async def test_trace_id_appears_in_logs(caplog):
     trace_id = res.headers.get("X-Trace-ID")
     assert trace_id is not None
     assert f"Log triggered by trace ID: {trace_id}" in caplog.text
+
+
+def test_generated_trace_ids_are_unique_32_hex():
+    ids = {new_trace_id() for _ in range(10_000)}
+    assert len(ids) == 10_000
+    assert all(len(i) == 32 and int(i, 16) >= 0 for i in ids)
+
+
+@pytest.mark.anyio
+async def test_trace_header_is_set_once_on_streamed_responses():
+    async def streaming_backend(scope, receive, send):
+        await send({"type": "http.response.start", "status": 200,
+                    "headers": [(b"x-trace-id", b"from-upstream")]})
+        for chunk in (b"a", b"b", b"c"):
+            await send({"type": "http.response.body", "body": chunk, "more_body": True})
+        await send({"type": "http.response.body", "body": b""})
+
+    app = TraceMiddleware(streaming_backend)
+    async with httpx.AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+        res = await client.get("/", headers={"X-Trace-ID": "abc"})
+        assert res.text == "abc"
+        assert res.headers.get_list("X-Trace-ID") == ["abc"]
+
+        # oversized ids from clients are replaced
+        res = await client.get("/", headers={"X-Trace-ID": "x" * 500})
+        assert len(res.headers["X-Trace-ID"]) == 32
+    assert trace_id_var.get() is None
@@ -0,0 +1,83 @@
+import pytest
+import httpx
+from httpx import ASGITransport
+from asgi_lifespan import LifespanManager
+from starlette.responses import JSONResponse
+from app.core.gateway_router import GatewayRouter
+from app.core.path_router import PathRouter
+from app.core.rate_limit_policy import RateLimitPolicy
+from app.core.inmemory_rate_limiter import InMemoryRateLimiter
+from app.core.rate_limit_middleware import RateLimitMiddleware
+
+
+async def fake_backend(scope, receive, send):
+    await JSONResponse({"status": "ok"})(scope, receive, send)
+
+
+def build_gateway(route_table):
+    backend = httpx.AsyncClient(transport=ASGITransport(app=fake_backend), base_url="http://fake")
+    path_router = PathRouter(route_table=route_table)
+    gateway = GatewayRouter(path_router, client=backend)
+    limiter = InMemoryRateLimiter(limit=100, window_ms=60000)
+    return RateLimitMiddleware(gateway, limiter, path_router=path_router), path_router
+
+
+@pytest.mark.anyio
+async def test_route_policies_pick_limit_and_key():
+    app, _ = build_gateway({
+        "/search": {"backend": "http://fake", "rate_limit": {"limit": 2, "window_ms": 60000}},
+        "/keys": {
+            "backend": "http://fake",
+            "rate_limit": {"limit": 1, "window_ms": 60000, "key": "header:x-api-key"},
+        },
+        "/public": {"backend": "http://fake", "rate_limit": False},
+        "/api": {"backend": "http://fake"},
+    })
+
+    async with LifespanManager(app):
+        client = httpx.AsyncClient(transport=ASGITransport(app=app), base_url="http://test")
+
+        # every path under a route shares the route's bucket
+        assert (await client.get("/search/a")).status_code == 200
+        assert (await client.get("/search/b")).status_code == 200
+        res = await client.get("/search/c")
+        assert res.status_code == 429
+        assert res.headers["RateLimit-Limit"] == "2"
+
+        # keyed by API key rather than client address
+        assert (await client.get("/keys", headers={"x-api-key": "a"})).status_code == 200
+        assert (await client.get("/keys", headers={"x-api-key": "b"})).status_code == 200
+        assert (await client.get("/keys", headers={"x-api-key": "a"})).status_code == 429
+
+        for _ in range(5):
+            res = await client.get("/public")
+            assert res.status_code == 200
+            assert "ratelimit-limit" not in res.headers
+
+        assert (await client.get("/api/x")).headers["RateLimit-Limit"] == "100"
+
+
+@pytest.mark.anyio
+async def test_policies_follow_route_reload():
+    app, path_router = build_gateway({"/api": {"backend": "http://fake"}})
+
+    async with LifespanManager(app):
+        client = httpx.AsyncClient(transport=ASGITransport(app=app), base_url="http://test")
+        assert (await client.get("/api")).headers["RateLimit-Limit"] == "100"
+
+        await path_router.update_route_table({
+            "/api": {"backend": "http://fake", "rate_limit": {"limit": 7, "key": "route"}},
+        })
+        assert (await client.get("/api")).headers["RateLimit-Limit"] == "7"
+
+
+def test_policy_identities():
+    scope = {"client": ("10.0.0.1", 1234), "headers": [(b"x-tenant", b"acme")]}
+
+    assert RateLimitPolicy(5).identity(scope, "/api") == "rl:/api:ip:10.0.0.1"
+    assert RateLimitPolicy(5, key="route").identity(scope, "/api") == "rl:/api"
+    assert RateLimitPolicy(5, key="header:X-Tenant").identity(scope, "/api") == "rl:/api:key:acme"
+    assert RateLimitPolicy(5, key="header:x-missing").identity(scope, "/api") == "rl:/api:ip:10.0.0.1"
+
+    with pytest.raises(ValueError):
+        RateLimitPolicy(5, key="cookie")
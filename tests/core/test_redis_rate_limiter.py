@@ -37,11 +37,10 @@ async def test_redis_rate_limiter_blocks_after_limit():
 
     # Patch the redis.evalsha method to simulate token bucket logic
     mock_redis = AsyncMock()
-    # Simulate 3 successful tokens then reject
-    responses = [0, 0, 0, 1]
+    # Simulate 3 successful tokens then reject: [allowed, remaining, retry_after_ms]
+    responses = [[1, 2, 0], [1, 1, 0], [1, 0, 0], [0, 0, 3000]]
     mock_redis.evalsha = AsyncMock(side_effect=responses)
     mock_redis.script_load = AsyncMock(return_value="mocked-sha")
-    mock_redis.zcard = AsyncMock(return_value=3)
 
     # Gateway with rate limit
     limiter = RedisRateLimiter(mock_redis, limit=3, window_ms=10000)
@@ -65,4 +64,34 @@ async def test_redis_rate_limiter_blocks_after_limit():
             assert res.text == "Too Many Requests"
             assert res.headers["ratelimit-limit"] == "3"
             assert res.headers["ratelimit-remaining"] == "0"
-            assert "retry-after" in res.headers
+            assert res.headers["retry-after"] == "3"
+
+    # exactly one Redis round trip per request
+    assert mock_redis.evalsha.await_count == 4
+    mock_redis.script_load.assert_not_awaited()
+
+
+@pytest.mark.anyio
+async def test_gcra_script_against_fakeredis():
+    fake_redis = fakeredis.FakeAsyncRedis(decode_responses=True)
+    limiter = RedisRateLimiter(fake_redis, limit=3, window_ms=10000)
+
+    decisions = [await limiter.acquire("1.2.3.4:/api") for _ in range(4)]
+
+    assert [d.allowed for d in decisions] == [True, True, True, False]
+    assert [d.remaining for d in decisions] == [2, 1, 0, 0]
+    assert 0 < decisions[-1].retry_after <= 4
+    assert await limiter.remaining("1.2.3.4:/api") == 0
+    # one O(1) string per identity, not a sorted-set member per request
+    assert await fake_redis.type("1.2.3.4:/api") == "string"
+    assert await fake_redis.pttl("1.2.3.4:/api") > 0
+
+
+@pytest.mark.anyio
+async def test_script_is_reloaded_after_noscript():
+    fake_redis = fakeredis.FakeAsyncRedis(decode_responses=True)
+    limiter = RedisRateLimiter(fake_redis, limit=2, window_ms=1000)
+    await fake_redis.script_flush()
+
+    decision = await limiter.acquire("client")
+    assert decision.allowed and decision.remaining == 1
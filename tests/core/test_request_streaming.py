@@ -0,0 +1,139 @@
+import pytest
+import httpx
+import asyncio
+from httpx import ASGITransport
+from asgi_lifespan import LifespanManager
+from starlette.responses import JSONResponse
+from app.core.gateway_router import GatewayRouter
+from app.core.path_router import PathRouter
+from app.core.metrics import ACTIVE_REQUESTS, REQUEST_COUNT
+
+
+class RecordingBackend:
+    """
+    Reads the request body chunk by chunk and fails the first `fail_times` calls.
+    """
+    def __init__(self, fail_times: int = 0):
+        self.fail_times = fail_times
+        self.calls = 0
+        self.first_chunk = asyncio.Event()
+
+    async def __call__(self, scope, receive, send):
+        self.calls += 1
+        size = 0
+        more_body = True
+        while more_body:
+            message = await receive()
+            size += len(message.get("body", b""))
+            if size:
+                self.first_chunk.set()
+            more_body = message.get("more_body", False)
+        status = 500 if self.calls <= self.fail_times else 200
+        await JSONResponse({"size": size}, status_code=status)(scope, receive, send)
+
+
+def build_app(backend, route_config):
+    backend_url = "http://fake-backend"
+    fake_client = httpx.AsyncClient(transport=ASGITransport(app=backend), base_url=backend_url)
+    path_router = PathRouter(route_table={"/upload": {"backend": backend_url, **route_config}})
+    return GatewayRouter(path_router, client=fake_client, retry_delay=0)
+
+
+@pytest.mark.anyio
+async def test_small_body_is_buffered_and_replayed_on_retry():
+    backend = RecordingBackend(fail_times=1)
+    app = build_app(backend, {"retries": 2, "retry_body_limit": 1024})
+
+    async with LifespanManager(app):
+        async with httpx.AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+            res = await client.put("/upload", content=b"x" * 512)
+
+    assert res.status_code == 200
+    assert res.json() == {"size": 512}
+    assert backend.calls == 2
+
+
+@pytest.mark.anyio
+async def test_body_over_limit_falls_back_to_single_attempt():
+    backend = RecordingBackend(fail_times=1)
+    app = build_app(backend, {"retries": 2, "retry_body_limit": 1024})
+
+    async def body():
+        for _ in range(4):
+            yield b"y" * 1000
+
+    async with LifespanManager(app):
+        async with httpx.AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+            res = await client.put("/upload", content=body())
+
+    assert res.status_code == 502
+    assert backend.calls == 1
+
+
+@pytest.mark.anyio
+async def test_first_chunk_reaches_upstream_before_upload_finishes():
+    backend = RecordingBackend()
+    app = build_app(backend, {"retries": 0})
+
+    async def body():
+        yield b"first"
+        # only continues once the upstream has seen the first chunk
+        await asyncio.wait_for(backend.first_chunk.wait(), timeout=1)
+        yield b"second"
+
+    async with LifespanManager(app):
+        async with httpx.AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+            res = await client.post("/upload", content=body())
+
+    assert res.status_code == 200
+    assert res.json() == {"size": len(b"firstsecond")}
+
+
+def upload_scope():
+    # no Content-Length or Transfer-Encoding, as an HTTP/2 server may send it
+    return {"type": "http", "method": "POST", "path": "/upload", "query_string": b"", "headers": []}
+
+
+@pytest.mark.anyio
+async def test_body_without_length_headers_is_still_capped():
+    backend = RecordingBackend(fail_times=1)
+    app = build_app(backend, {"retries": 2, "retry_body_limit": 1024})
+    chunks = [b"z" * 1000] * 3
+    messages = []
+
+    async def receive():
+        chunk = chunks.pop(0)
+        return {"type": "http.request", "body": chunk, "more_body": bool(chunks)}
+
+    async def send(message):
+        messages.append(message)
+
+    await app(upload_scope(), receive, send)
+
+    assert messages[0]["status"] == 502
+    assert b"not retried" in messages[1]["body"]
+    assert backend.calls == 1
+
+
+@pytest.mark.anyio
+async def test_client_disconnect_mid_upload_aborts_proxy_call():
+    backend = RecordingBackend()
+    app = build_app(backend, {"retries": 0})
+    incoming = [
+        {"type": "http.request", "body": b"part", "more_body": True},
+        {"type": "http.disconnect"},
+    ]
+    sent = []
+
+    async def receive():
+        return incoming.pop(0)
+
+    async def send(message):
+        sent.append(message)
+
+    active_before = ACTIVE_REQUESTS._value.get()
+    await app(upload_scope(), receive, send)
+
+    assert sent == []
+    assert ACTIVE_REQUESTS._value.get() == active_before
+    assert REQUEST_COUNT.labels(method="POST", route="/upload", status="499")._value.get() >= 1
@@ -0,0 +1,174 @@
+import time
+import pytest
+import asyncio
+import httpx
+from email.utils import formatdate
+from httpx import ASGITransport
+from asgi_lifespan import LifespanManager
+from starlette.responses import PlainTextResponse
+from app.core.admin_router import AdminRouter
+from app.core.gateway_router import GatewayRouter
+from app.core.mount_admin_first import MountAdminFirst
+from app.core.path_router import PathRouter
+from app.core.response_cache import ResponseCache, CachePolicy
+
+
+class VersionedBackend:
+    """Answers with a version number that goes up on every call."""
+
+    def __init__(self, headers: dict[str, str], status: int = 200):
+        self.headers = headers
+        self.status = status
+        self.calls = 0
+
+    async def __call__(self, scope, receive, send):
+        self.calls += 1
+        request_headers = dict(scope["headers"])
+        language = request_headers.get(b"accept-language", b"").decode()
+        body = f"v{self.calls} {language}".strip()
+        await PlainTextResponse(body, status_code=self.status, headers=self.headers)(scope, receive, send)
+
+
+def build_app(backend, route_config, response_cache=None):
+    client = httpx.AsyncClient(transport=ASGITransport(app=backend))
+    gateway = GatewayRouter(PathRouter({
+        "/api": {"backend": "http://fake-backend", **route_config},
+        "/plain": {"backend": "http://fake-backend"},
+    }), client=client, retries=0, response_cache=response_cache)
+    return gateway, MountAdminFirst(AdminRouter(gateway), gateway)
+
+
+@pytest.mark.anyio
+async def test_fresh_responses_are_served_from_cache():
+    backend = VersionedBackend({"Cache-Control": "max-age=60"})
+    gateway, app = build_app(backend, {"cache": True})
+
+    async with LifespanManager(app):
+        client = httpx.AsyncClient(transport=ASGITransport(app=app), base_url="http://test")
+        first = await client.get("/api/items?page=1")
+        second = await client.get("/api/items?page=1")
+        assert (first.text, first.headers["x-cache"]) == ("v1", "MISS")
+        assert (second.text, second.headers["x-cache"]) == ("v1", "HIT")
+        assert second.headers["age"] == "0"
+        assert backend.calls == 1
+
+        assert (await client.get("/api/items?page=2")).text == "v2"
+        # clients can bypass or refresh the cache
+        assert (await client.get("/api/items?page=1", headers={"cache-control": "no-store"})).text == "v3"
+        assert (await client.get("/api/items?page=1", headers={"cache-control": "no-cache"})).text == "v4"
+        assert (await client.get("/api/items?page=1")).text == "v4"
+        # routes without a cache block, and other methods, always go upstream
+        assert (await client.get("/plain")).text == "v5"
+        assert (await client.get("/plain")).text == "v6"
+        assert (await client.post("/api/items?page=1")).text == "v7"
+
+        stats = (await client.get("/__cache")).json()
+        assert stats["entries"] == 2
+        assert stats["hit"] == 2 and stats["bypass"] == 1
+
+
+@pytest.mark.anyio
+async def test_uncacheable_responses_are_not_stored():
+    for headers in ({"Cache-Control": "no-store"}, {"Cache-Control": "private, max-age=60"},
+                    {"Cache-Control": "max-age=60", "Set-Cookie": "a=b"}, {"Vary": "*"}, {}):
+        backend = VersionedBackend(headers)
+        gateway, app = build_app(backend, {"cache": True})
+        async with LifespanManager(app):
+            client = httpx.AsyncClient(transport=ASGITransport(app=app), base_url="http://test")
+            await client.get("/api")
+            assert (await client.get("/api")).text == "v2", headers
+
+    # a route ttl applies when the upstream says nothing
+    backend = VersionedBackend({})
+    gateway, app = build_app(backend, {"cache": {"ttl": 60}})
+    async with LifespanManager(app):
+        client = httpx.AsyncClient(transport=ASGITransport(app=app), base_url="http://test")
+        await client.get("/api")
+        assert (await client.get("/api")).text == "v1"
+
+
+@pytest.mark.anyio
+async def test_expires_and_vary():
+    backend = VersionedBackend({
+        "Date": formatdate(usegmt=True),
+        "Expires": formatdate(time.time() + 60, usegmt=True),
+        "Vary": "Accept-Language",
+    })
+    gateway, app = build_app(backend, {"cache": True})
+
+    async with LifespanManager(app):
+        client = httpx.AsyncClient(transport=ASGITransport(app=app), base_url="http://test")
+        assert (await client.get("/api", headers={"accept-language": "en"})).text == "v1 en"
+        assert (await client.get("/api", headers={"accept-language": "fr"})).text == "v2 fr"
+        assert (await client.get("/api", headers={"accept-language": "en"})).text == "v1 en"
+        assert (await client.get("/api", headers={"accept-language": "fr"})).text == "v2 fr"
+        assert backend.calls == 2
+
+
+@pytest.mark.anyio
+async def test_stale_while_revalidate_refreshes_in_the_background():
+    backend = VersionedBackend({"Cache-Control": "max-age=0, stale-while-revalidate=30"})
+    gateway, app = build_app(backend, {"cache": True})
+
+    async with LifespanManager(app):
+        client = httpx.AsyncClient(transport=ASGITransport(app=app), base_url="http://test")
+        assert (await client.get("/api")).text == "v1"
+
+        stale = await asyncio.gather(*(client.get("/api") for _ in range(3)))
+        assert [(r.text, r.headers["x-cache"]) for r in stale] == [("v1", "STALE")] * 3
+        await asyncio.sleep(0.05)
+        assert backend.calls == 2  # one refresh for all three
+        assert (await client.get("/api")).text == "v2"
+
+
+@pytest.mark.anyio
+async def test_stale_if_error_hides_upstream_failures():
+    backend = VersionedBackend({"Cache-Control": "max-age=0"})
+    gateway, app = build_app(backend, {"cache": {"stale_if_error": 30}})
+
+    async with LifespanManager(app):
+        client = httpx.AsyncClient(transport=ASGITransport(app=app), base_url="http://test")
+        assert (await client.get("/api")).text == "v1"
+        backend.status = 503
+        res = await client.get("/api")
+        assert (res.status_code, res.text, res.headers["x-cache"]) == (200, "v1", "STALE")
+        assert backend.calls == 2
+
+        # without a stored response the failure goes through
+        assert (await client.get("/api/other")).status_code == 502
+
+
+@pytest.mark.anyio
+async def test_admin_purge_by_route_prefix():
+    backend = VersionedBackend({"Cache-Control": "max-age=60"})
+    gateway, app = build_app(backend, {"cache": True})
+
+    async with LifespanManager(app):
+        client = httpx.AsyncClient(transport=ASGITransport(app=app), base_url="http://test")
+        await client.get("/api/a")
+        await client.get("/api/b")
+        assert (await client.get("/__cache")).json()["bytes"] > 0
+
+        res = await client.post("/__cache/purge?prefix=/api")
+        assert res.json() == {"purged": 2, "prefix": "/api"}
+        assert (await client.get("/api/a")).headers["x-cache"] == "MISS"
+        assert (await client.post("/__cache/purge")).json()["purged"] == 1
+        assert (await client.get("/__cache")).json()["bytes"] == 0
+
+
+def test_byte_budget_evicts_least_recently_used():
+    cache = ResponseCache(max_bytes=1500)  # three 200-byte bodies with overhead
+    policy = CachePolicy()
+    headers = httpx.Headers({"cache-control": "max-age=60"})
+    scope = {"headers": []}
+    for target in ("/a", "/b", "/c"):
+        assert cache.store("/api", target, scope, policy, 200, headers, [], b"x" * 200)
+    assert cache.get("/api", "/a", scope) is not None  # /a is now the most recent
+
+    cache.store("/api", "/d", scope, policy, 200, headers, [], b"x" * 200)
+    assert cache.size <= 1500
+    assert cache.get("/api", "/b", scope) is None
+    assert all(cache.get("/api", t, scope) for t in ("/a", "/c", "/d"))
+
+    # a single response over the budget is never stored
+    assert cache.store("/api", "/big", scope, policy, 200, headers, [], b"x" * 2000) is None
@@ -0,0 +1,147 @@
+import pytest
+import httpx
+import asyncio
+from app.core.gateway_router import GatewayRouter
+from app.core.path_router import PathRouter
+
+
+class ChunkStream(httpx.AsyncByteStream):
+    def __init__(self, chunks):
+        self.chunks = chunks
+        self.closed = False
+
+    async def __aiter__(self):
+        async for chunk in self.chunks:
+            yield chunk
+
+    async def aclose(self):
+        self.closed = True
+
+
+class StreamingTransport(httpx.AsyncBaseTransport):
+    """
+    Upstream that hands back its body lazily, unlike httpx.ASGITransport.
+    """
+    def __init__(self, chunks, headers=None):
+        self.stream = ChunkStream(chunks)
+        self.headers = headers or {}
+
+    async def handle_async_request(self, request):
+        return httpx.Response(200, headers=self.headers, stream=self.stream)
+
+
+def build_gateway(transport, route_config=None):
+    backend_url = "http://fake-backend"
+    client = httpx.AsyncClient(transport=transport, base_url=backend_url)
+    route_table = {"/stream": {"backend": backend_url, "retries": 0, **(route_config or {})}}
+    return GatewayRouter(PathRouter(route_table=route_table), client=client)
+
+
+def http_scope():
+    return {"type": "http", "method": "GET", "path": "/stream", "query_string": b"", "headers": []}
+
+
+def receive_until(disconnected: asyncio.Event):
+    # Like a real server: one request message, then block until the client leaves
+    request_sent = False
+
+    async def receive():
+        nonlocal request_sent
+        if not request_sent:
+            request_sent = True
+            return {"type": "http.request", "body": b"", "more_body": False}
+        await disconnected.wait()
+        return {"type": "http.disconnect"}
+
+    return receive
+
+
+@pytest.mark.anyio
+async def test_first_chunk_is_sent_before_upstream_finishes():
+    first_chunk_sent = asyncio.Event()
+
+    async def chunks():
+        yield b"first,"
+        await asyncio.wait_for(first_chunk_sent.wait(), timeout=1)
+        yield b"second"
+
+    gateway = build_gateway(StreamingTransport(chunks()))
+    receive = receive_until(asyncio.Event())
+    messages = []
+
+    async def send(message):
+        messages.append(message)
+        if message.get("body"):
+            first_chunk_sent.set()
+
+    await gateway(http_scope(), receive, send)
+
+    assert messages[0]["type"] == "http.response.start"
+    assert [m["body"] for m in messages[1:]] == [b"first,", b"second", b""]
+    assert all(m["more_body"] for m in messages[1:-1])
+    assert messages[-1]["more_body"] is False
+
+
+@pytest.mark.anyio
+async def test_client_disconnect_releases_upstream_stream():
+    disconnected = asyncio.Event()
+
+    async def endless_chunks():
+        while True:
+            yield b"data: tick\n\n"
+            await asyncio.sleep(0.01)
+
+    transport = StreamingTransport(endless_chunks())
+    gateway = build_gateway(transport)
+    receive = receive_until(disconnected)
+
+    async def send(message):
+        if message.get("body"):
+            disconnected.set()
+
+    await asyncio.wait_for(gateway(http_scope(), receive, send), timeout=1)
+    assert transport.stream.closed
+
+
+@pytest.mark.anyio
+async def test_small_responses_can_be_buffered_per_route():
+    async def chunks():
+        yield b"hello "
+        yield b"world"
+
+    transport = StreamingTransport(chunks(), headers={"content-length": "11", "connection": "keep-alive"})
+    gateway = build_gateway(transport, {"response_buffer_limit": 1024})
+    receive = receive_until(asyncio.Event())
+    messages = []
+
+    async def send(message):
+        messages.append(message)
+
+    await gateway(http_scope(), receive, send)
+
+    assert len(messages) == 2
+    assert messages[1]["body"] == b"hello world"
+    assert (b"content-length", b"11") in messages[0]["headers"]
+    assert all(name != b"connection" for name, _ in messages[0]["headers"])
+
+
+@pytest.mark.anyio
+async def test_upstream_failure_mid_stream_ends_response_without_raising():
+    async def broken_chunks():
+        yield b"partial"
+        raise httpx.ReadError("connection reset by upstream")
+
+    transport = StreamingTransport(broken_chunks(), headers={"transfer-encoding": "chunked"})
+    gateway = build_gateway(transport)
+    receive = receive_until(asyncio.Event())
+    messages = []
+
+    async def send(message):
+        messages.append(message)
+
+    await asyncio.wait_for(gateway(http_scope(), receive, send), timeout=1)
+
+    assert all(name != b"transfer-encoding" for name, _ in messages[0]["headers"])
+    assert [m["body"] for m in messages[1:]] == [b"partial"]
+    assert messages[-1]["more_body"] is True
+    assert transport.stream.closed
@@ -57,3 +57,79 @@ async def test_retries_exhausted_then_fail():
         res = await client.get("/test")
         assert res.status_code == 502
         assert "Upstream error" in res.text
+
+
+def build_gateway(backend, route_config=None, **options):
+    fake_client = httpx.AsyncClient(transport=ASGITransport(app=backend))
+    route_table = {"/test": {"backend": "http://fake-backend", "retry_delay": 0,
+                             **(route_config or {})}}
+    return GatewayRouter(PathRouter(route_table=route_table), client=fake_client, **options)
+
+
+@pytest.mark.anyio
+async def test_non_idempotent_methods_are_not_retried_by_default():
+    backend = FlakyBackend(fail_times=1)
+    app = build_gateway(backend)
+
+    async with LifespanManager(app):
+        client = httpx.AsyncClient(transport=ASGITransport(app=app), base_url="http://test")
+        res = await client.post("/test", content=b"order")
+        assert res.status_code == 502
+        assert backend.call_count == 1
+
+    backend = FlakyBackend(fail_times=1)
+    app = build_gateway(backend, {"retry_policy": {"methods": ["POST"]}})
+    async with LifespanManager(app):
+        client = httpx.AsyncClient(transport=ASGITransport(app=app), base_url="http://test")
+        assert (await client.post("/test", content=b"order")).status_code == 200
+        assert backend.call_count == 2
+
+
+@pytest.mark.anyio
+async def test_only_configured_statuses_are_retried():
+    backend = FlakyBackend(fail_times=1)
+    app = build_gateway(backend, {"retry_policy": {"statuses": [503]}})
+
+    async with LifespanManager(app):
+        client = httpx.AsyncClient(transport=ASGITransport(app=app), base_url="http://test")
+        assert (await client.get("/test")).status_code == 502
+        assert backend.call_count == 1
+
+
+@pytest.mark.anyio
+async def test_retry_budget_caps_retries():
+    from app.core.retry_policy import RetryBudget
+    from app.core.metrics import RETRIES
+
+    backend = FlakyBackend(fail_times=100)
+    # the request deposits exactly one retry and nothing refills the bucket
+    budget = RetryBudget(ratio=1, min_per_second=0)
+    app = build_gateway(backend, {"retries": 5}, retry_budget=budget)
+    granted = RETRIES.labels(route="/test", decision="granted")
+    denied = RETRIES.labels(route="/test", decision="denied")
+    granted_before, denied_before = granted._value.get(), denied._value.get()
+
+    async with LifespanManager(app):
+        client = httpx.AsyncClient(transport=ASGITransport(app=app), base_url="http://test")
+        res = await client.get("/test")
+        assert res.status_code == 502
+        assert "after 1 retries (retry budget exhausted)" in res.text
+        assert backend.call_count == 2
+
+    assert granted._value.get() - granted_before == 1
+    assert denied._value.get() - denied_before == 1
+
+
+def test_decorrelated_jitter_backoff_is_bounded():
+    from app.core.retry_policy import RetryPolicy, RetryState
+
+    policy = RetryPolicy(base_delay=0.1, max_delay=1.0)
+    delays = [RetryState(policy, 5).next_delay() for _ in range(50)]
+    assert all(0.1 <= d <= 0.3 for d in delays)
+    assert len(set(delays)) > 1
+
+    state = RetryState(policy, 20)
+    assert all(0.1 <= state.next_delay() <= 1.0 for _ in range(20))
+
+    with pytest.raises(ValueError):
+        RetryPolicy(exceptions=["socket"])
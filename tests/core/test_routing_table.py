@@ -0,0 +1,72 @@
+import pytest
+from app.core.path_router import PathRouter
+
+
+ROUTE_TABLE = {
+    "/api": {"backend": "http://api-v1"},
+    "/api-v2": {"backend": "http://api-v2"},
+    "/api/users": {"backend": "http://users"},
+    "/": {"backend": "http://fallback"},
+}
+
+
+def test_longest_prefix_wins_regardless_of_order():
+    router = PathRouter(route_table=ROUTE_TABLE)
+
+    assert router.match("/api/users/42")[0] == "http://users"
+    assert router.match("/api/orders")[0] == "http://api-v1"
+    assert router.match("/api")[0] == "http://api-v1"
+    assert router.match("/api-v2/items")[0] == "http://api-v2"
+
+
+def test_prefix_only_matches_whole_segments():
+    router = PathRouter(route_table={"/api": {"backend": "http://api-v1"}})
+
+    assert router.match("/api/")[0] == "http://api-v1"
+    assert router.match("/apix") == (None, None)
+    assert router.match("/other") == (None, None)
+
+
+def test_root_route_is_the_fallback():
+    router = PathRouter(route_table=ROUTE_TABLE)
+    backend, config = router.match("/unknown/path")
+    assert backend == "http://fallback"
+    assert config == {"backend": "http://fallback"}
+
+
+def test_string_route_value_is_shorthand_for_backend():
+    router = PathRouter(route_table={"/api": "http://backend1.local"})
+    assert router.match("/api/x") == ("http://backend1.local", {"backend": "http://backend1.local"})
+
+
+def test_prefixes_normalizing_to_the_same_route_are_rejected():
+    with pytest.raises(ValueError):
+        PathRouter(route_table={"/api": {"backend": "http://a"}, "/api/": {"backend": "http://b"}})
+
+
+def test_gateway_exposes_route_cache_size():
+    from app.core.gateway_router import GatewayRouter
+    gateway = GatewayRouter(route_cache_size=8)
+    assert gateway.path_router.cache_size == 8
+
+
+def test_lru_cache_is_bounded():
+    router = PathRouter(route_table=ROUTE_TABLE, cache_size=2)
+
+    for i in range(10):
+        assert router.match(f"/api/items/{i}")[0] == "http://api-v1"
+
+    assert len(router._cache) == 2
+    assert list(router._cache) == ["/api/items/8", "/api/items/9"]
+
+
+@pytest.mark.anyio
+async def test_update_route_table_recompiles_and_clears_cache():
+    router = PathRouter(route_table=ROUTE_TABLE, cache_size=16)
+    assert router.match("/api/orders")[0] == "http://api-v1"
+
+    await router.update_route_table({"/api/orders": {"backend": "http://orders"}})
+
+    assert router.match("/api/orders/1")[0] == "http://orders"
+    assert router.match("/api/users") == (None, None)
+    assert router.last_reload > 0
@@ -0,0 +1,56 @@
+import pytest
+import asyncio
+import multiprocessing
+from app.core.shm_rate_limiter import SharedMemoryRateLimiter
+
+
+def hammer(path: str, attempts: int, results) -> None:
+    async def run():
+        limiter = SharedMemoryRateLimiter(limit=50, window_ms=60000, path=path, slots=1024)
+        allowed = 0
+        for _ in range(attempts):
+            if (await limiter.acquire("10.0.0.1:/api")).allowed:
+                allowed += 1
+        limiter.close()
+        return allowed
+
+    results.put(asyncio.run(run()))
+
+
+def test_workers_share_one_limit(tmp_path):
+    path = str(tmp_path / "ratelimit")
+    ctx = multiprocessing.get_context("spawn")
+    results = ctx.Queue()
+    workers = [ctx.Process(target=hammer, args=(path, 40, results)) for _ in range(4)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join(timeout=30)
+
+    # 4 workers x 40 attempts against a limit of 50 shared on the host
+    assert sum(results.get(timeout=5) for _ in workers) == 50
+
+
+@pytest.mark.anyio
+async def test_decisions_and_slot_reuse(tmp_path):
+    path = str(tmp_path / "ratelimit")
+    limiter = SharedMemoryRateLimiter(limit=2, window_ms=50, path=path, slots=4, max_probe=2)
+    other = SharedMemoryRateLimiter(limit=2, window_ms=50, path=path, slots=4, max_probe=2)
+
+    assert (await limiter.acquire("a")).remaining == 1
+    assert (await other.acquire("a")).remaining == 0
+    denied = await limiter.acquire("a")
+    assert not denied.allowed and denied.retry_after == 1
+
+    # many identities in a tiny table never fail; stale slots are reused
+    for i in range(50):
+        assert (await limiter.acquire(f"client-{i}")).allowed
+
+    await asyncio.sleep(0.06)
+    assert await limiter.remaining("a") == 2
+
+    with pytest.raises(ValueError):
+        SharedMemoryRateLimiter(limit=2, path=path, slots=8)
+
+    limiter.close()
+    other.close()
@@ -0,0 +1,124 @@
+import pytest
+import asyncio
+import httpx
+from httpx import ASGITransport
+from asgi_lifespan import LifespanManager
+from starlette.responses import PlainTextResponse
+from app.core.gateway_router import GatewayRouter
+from app.core.metrics import registry
+from app.core.path_router import PathRouter
+from app.core.singleflight import SingleFlight
+
+
+class SlowBackend:
+    def __init__(self, delay: float = 0.05):
+        self.delay = delay
+        self.calls = 0
+
+    async def __call__(self, scope, receive, send):
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        await PlainTextResponse(f"call {self.calls}")(scope, receive, send)
+
+
+def build_gateway(backend, coalesce=True):
+    client = httpx.AsyncClient(transport=ASGITransport(app=backend))
+    return GatewayRouter(PathRouter({
+        "/api": {"backend": "http://fake-backend", "coalesce": coalesce},
+    }), client=client)
+
+
+def coalesced() -> float:
+    return registry.get_sample_value("gateway_coalesced_requests_total", {"route": "/api"}) or 0
+
+
+@pytest.mark.anyio
+async def test_identical_concurrent_gets_share_one_upstream_call():
+    backend = SlowBackend()
+    app = build_gateway(backend)
+    before = coalesced()
+
+    async with LifespanManager(app):
+        client = httpx.AsyncClient(transport=ASGITransport(app=app), base_url="http://test")
+        results = await asyncio.gather(*(client.get("/api/hot?x=1") for _ in range(20)))
+        assert [(r.status_code, r.text) for r in results] == [(200, "call 1")] * 20
+        assert backend.calls == 1
+        assert coalesced() == before + 19
+        assert len(app.singleflight) == 0
+
+        # once it is done, the next request makes a new call
+        assert (await client.get("/api/hot?x=1")).text == "call 2"
+
+
+@pytest.mark.anyio
+async def test_requests_that_differ_are_not_coalesced():
+    backend = SlowBackend()
+    app = build_gateway(backend, {"headers": ["accept"]})
+
+    async with LifespanManager(app):
+        client = httpx.AsyncClient(transport=ASGITransport(app=app), base_url="http://test")
+        await asyncio.gather(
+            client.get("/api/a"),
+            client.get("/api/b"),
+            client.get("/api/a", headers={"accept": "text/html"}),
+            client.get("/api/a", headers={"authorization": "Bearer other-user"}),
+            client.get("/api/a", headers={"cookie": "session=other-user"}),
+            client.post("/api/a"),
+            client.request("GET", "/api/a", content=b"with a body"),
+        )
+        assert backend.calls == 7
+
+
+@pytest.mark.anyio
+async def test_waiter_giving_up_does_not_cancel_the_shared_call():
+    backend = SlowBackend(delay=0.1)
+    app = build_gateway(backend)
+
+    async with LifespanManager(app):
+        client = httpx.AsyncClient(transport=ASGITransport(app=app), base_url="http://test")
+        first = asyncio.create_task(client.get("/api"))
+        await asyncio.sleep(0.01)
+        impatient = await client.get("/api", headers={"x-request-timeout-ms": "20"})
+        assert impatient.status_code == 504
+
+        res = await first
+        assert (res.status_code, res.text) == (200, "call 1")
+        assert backend.calls == 1
+
+
+@pytest.mark.anyio
+async def test_large_responses_fall_back_to_separate_calls():
+    backend = SlowBackend()
+    app = build_gateway(backend, {"max_body": 4})
+
+    async with LifespanManager(app):
+        client = httpx.AsyncClient(transport=ASGITransport(app=app), base_url="http://test")
+        results = await asyncio.gather(*(client.get("/api") for _ in range(3)))
+        assert all(r.status_code == 200 and r.text.startswith("call") for r in results)
+        assert backend.calls == 4  # the shared attempt, then one each
+
+
+@pytest.mark.anyio
+async def test_singleflight_shares_results_and_errors():
+    flight = SingleFlight()
+    calls = []
+
+    async def work():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return "done"
+
+    leader = asyncio.ensure_future(flight.do("k", work))
+    follower = asyncio.ensure_future(flight.do("k", work))
+    await asyncio.sleep(0)
+    leader.cancel()
+    assert await follower == ("done", True)
+    assert len(calls) == 1
+
+    async def fail():
+        await asyncio.sleep(0.01)
+        raise RuntimeError("upstream broke")
+
+    results = await asyncio.gather(flight.do("e", fail), flight.do("e", fail), return_exceptions=True)
+    assert all(isinstance(r, RuntimeError) for r in results)
+    assert len(flight) == 0
@@ -0,0 +1,159 @@
+import pytest
+import asyncio
+import importlib.util
+import httpx
+from httpx import ASGITransport
+from asgi_lifespan import LifespanManager
+from starlette.responses import PlainTextResponse
+from app.core.gateway_router import GatewayRouter
+from app.core.metrics import registry
+from app.core.path_router import PathRouter
+from app.core.upstream_pool import PoolConfig
+
+
+class TinyHTTPServer:
+    """A keep-alive HTTP/1.1 server on a real socket, counting connections."""
+
+    def __init__(self, delay: float = 0, path: str = None):
+        self.delay = delay
+        self.path = path
+        self.connections = 0
+        self.requests = 0
+
+    async def handle(self, reader, writer):
+        self.connections += 1
+        try:
+            while True:
+                head = await reader.readuntil(b"\r\n\r\n")
+                self.requests += 1
+                await asyncio.sleep(self.delay)
+                body = b"" if head.startswith(b"HEAD") else b"OK"
+                writer.write(b"HTTP/1.1 200 OK\r\nContent-Length: 2\r\n\r\n" + body)
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    async def __aenter__(self):
+        if self.path:
+            self.server = await asyncio.start_unix_server(self.handle, self.path)
+            self.origin = f"unix:{self.path}"
+        else:
+            self.server = await asyncio.start_server(self.handle, "127.0.0.1", 0)
+            self.origin = "http://127.0.0.1:%d" % self.server.sockets[0].getsockname()[1]
+        return self
+
+    async def __aexit__(self, *exc):
+        self.server.close()
+
+
+async def default_backend(scope, receive, send):
+    await PlainTextResponse("default")(scope, receive, send)
+
+
+def build_gateway(route_table):
+    client = httpx.AsyncClient(transport=ASGITransport(app=default_backend))
+    return GatewayRouter(PathRouter(route_table), client=client)
+
+
+def wait_samples(origin: str) -> float:
+    return registry.get_sample_value(
+        "gateway_upstream_pool_wait_seconds_count", {"upstream": origin}) or 0
+
+
+@pytest.mark.anyio
+async def test_connections_are_prewarmed_and_reused():
+    async with TinyHTTPServer() as server:
+        gateway = build_gateway({
+            "/pooled": {"backend": server.origin, "pool": {"max_connections": 4, "prewarm": 2}},
+            "/shared": {"backend": "http://fake-backend"},
+        })
+        async with LifespanManager(gateway):
+            assert server.connections == 2
+
+            client = httpx.AsyncClient(transport=ASGITransport(app=gateway), base_url="http://test")
+            res = await client.get("/pooled/x")
+            assert res.status_code == 200
+            assert res.text == "OK"
+            assert server.connections == 2  # served from a warm connection
+            assert (await client.get("/shared")).text == "default"
+
+            pooled, shared = (gateway.path_router.resolve(p).endpoints[0] for p in ("/pooled", "/shared"))
+            assert gateway.pools.client_for(pooled) is not gateway.client
+            assert gateway.pools.client_for(shared) is gateway.client
+
+
+@pytest.mark.anyio
+async def test_pool_limit_queues_requests_and_records_wait():
+    async with TinyHTTPServer(delay=0.05) as server:
+        gateway = build_gateway({"/api": {"backend": server.origin, "pool": {"max_connections": 1}}})
+        before = wait_samples(server.origin)
+
+        async with LifespanManager(gateway):
+            client = httpx.AsyncClient(transport=ASGITransport(app=gateway), base_url="http://test")
+            results = await asyncio.gather(*(client.get("/api") for _ in range(3)))
+
+        assert all(r.status_code == 200 for r in results)
+        assert server.connections == 1
+        assert wait_samples(server.origin) == before + 3
+        waited = registry.get_sample_value(
+            "gateway_upstream_pool_wait_seconds_sum", {"upstream": server.origin})
+        assert waited >= 0.1  # the 2nd and 3rd requests queued behind the 1st
+
+
+@pytest.mark.anyio
+async def test_reload_with_same_settings_keeps_the_client():
+    gateway = build_gateway({"/api": {"backend": "http://upstream", "pool": {"max_connections": 5}}})
+    endpoint = gateway.path_router.resolve("/api").endpoints[0]
+    client = gateway.pools.client_for(endpoint)
+
+    same = {"/api": {"backend": "http://upstream", "pool": {"max_connections": 5}}}
+    await gateway.path_router.update_route_table(same)
+    assert gateway.pools.client_for(endpoint) is client
+
+    resized = {"/api": {"backend": "http://upstream", "pool": {"max_connections": 9}}}
+    await gateway.path_router.update_route_table(resized)
+    assert gateway.pools.client_for(endpoint) is not client
+    await gateway.pools.aclose()
+
+
+def test_pool_config_validation(monkeypatch):
+    with pytest.raises(ValueError):
+        PoolConfig(max_connections=2, prewarm=3)
+
+    monkeypatch.setattr(importlib.util, "find_spec", lambda name: None)
+    with pytest.raises(ValueError, match="h2"):
+        PathRouter({"/api": {"backend": "http://upstream", "pool": {"http2": True}}})
+
+
+@pytest.mark.anyio
+async def test_unix_socket_and_in_process_asgi_backends(tmp_path):
+    async with TinyHTTPServer(path=str(tmp_path / "sidecar.sock")) as server:
+        gateway = build_gateway({
+            "/sidecar": {"backend": server.origin},
+            "/users": {"backend": "asgi:tests.fixtures.mock_backends:fake_users_backend"},
+        })
+        async with LifespanManager(gateway):
+            client = httpx.AsyncClient(transport=ASGITransport(app=gateway), base_url="http://test")
+            res = await client.get("/sidecar/x")
+            assert res.status_code == 200
+            assert res.text == "OK"
+            assert server.requests == 1
+
+            res = await client.get("/users")
+            assert res.json() == {"status": "ok", "source": "users"}
+
+            sidecar, users = (gateway.path_router.resolve(p).endpoints[0] for p in ("/sidecar", "/users"))
+            assert sidecar.host == server.origin  # breaker/metrics identity
+            clients = {gateway.client, gateway.pools.client_for(sidecar), gateway.pools.client_for(users)}
+            assert len(clients) == 3
+
+
+def test_bad_local_backends_fail_at_load():
+    with pytest.raises(ValueError, match="Cannot load"):
+        PathRouter({"/x": {"backend": "asgi:tests.fixtures.mock_backends:missing"}})
+    with pytest.raises(ValueError, match="module:app"):
+        PathRouter({"/x": {"backend": "asgi:tests.fixtures.mock_backends"}})
+    with pytest.raises(ValueError, match="no address"):
+        PathRouter({"/x": {"backend": "unix:"}})